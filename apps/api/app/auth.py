@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import httpx
 from jose import jwt
 from jose.exceptions import JWTError
 
 from .config import get_settings
+from .http_pool import get_http_client
 
 
 async def require_user_id_from_authorization_header(authorization: str | None) -> str:
@@ -26,8 +26,7 @@ async def require_user_id_from_authorization_header(authorization: str | None) -
         "apikey": settings.next_public_supabase_anon_key,
         "authorization": f"Bearer {token}",
     }
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.get(url, headers=headers)
+    resp = await get_http_client().get(url, headers=headers, timeout=15)
     if resp.status_code != 200:
         raise PermissionError("Invalid token")
 
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
+
+from .body_store import BodyStore
+from .config import get_settings
+from .crypto_utils import decrypt_text
+from .gmail_client import extract_body_text, get_message_full, get_message_metadata, list_messages_page
+from .google_oauth import refresh_access_token
+from .ingestion import IngestionPipeline, inbox_query
+from .llm_usage import daily_budget_usd, spent_today_usd
+from .metrics import track_sync
+from .processing import process_ingested_for_account
+from .resilience import GMAIL_QUOTA_UNITS, TokenBucket
+from .supabase_rest import SupabaseRest
+
+
+BACKFILL_COLUMNS = (
+    "id,user_id,google_email,refresh_token_encrypted,"
+    "backfill_status,backfill_query,backfill_page_token,backfill_listed,backfill_next_at"
+)
+# pending: not started; running: listing pages; promoting: listed, bodies still being fetched.
+# Then done, or failed (with backfill_error) once a promote batch could not move any row.
+ACTIVE_STATUSES = ("pending", "running", "promoting")
+
+# Backfill's own per-account Gmail budget, on top of the per-user bucket every Gmail call draws
+# from: a backfill can never use more than BACKFILL_QUOTA_UNITS_PER_SECOND of it. Only accounts
+# this process is backfilling right now have one (backfill_account drops it when it returns).
+_pacers: dict[str, TokenBucket] = {}
+
+
+async def _pace(account_id: str, cost: float) -> None:
+    rate = get_settings().backfill_quota_units_per_second
+    if rate <= 0:
+        return
+    bucket = _pacers.get(account_id)
+    if bucket is None:
+        bucket = _pacers[account_id] = TokenBucket(rate)
+    wait = bucket.reserve(cost)
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+async def start_backfill(*, supabase: SupabaseRest, acc: dict[str, Any], now: datetime) -> bool:
+    """Queue a BACKFILL_DAYS history backfill for a newly connected account (once per account)."""
+    days = get_settings().backfill_days
+    if days <= 0 or acc.get("backfill_status") is not None:
+        return False
+    await supabase.update(
+        "gmail_accounts",
+        {
+            "backfill_status": "pending",
+            # Fixed now: page tokens are only valid for the query they were issued for.
+            "backfill_query": inbox_query(after=now - timedelta(days=days), before=now),
+            "backfill_page_token": None,
+            "backfill_listed": 0,
+            "backfill_next_at": now.isoformat(),
+            "backfill_error": None,
+        },
+        filters={"id": f"eq.{acc['id']}"},
+    )
+    return True
+
+
+async def claim_backfills(*, supabase: SupabaseRest, now: datetime, limit: int) -> list[dict[str, Any]]:
+    """Lease due backfills for POLL_LEASE_S by moving `backfill_next_at` forward (compare-and-set)."""
+    rows = await supabase.select(
+        "gmail_accounts",
+        columns=BACKFILL_COLUMNS,
+        filters={
+            "status": "eq.active",
+            "backfill_status": f"in.({','.join(ACTIVE_STATUSES)})",
+            "backfill_next_at": f"lte.{now.isoformat()}",
+        },
+        order="backfill_next_at.asc",
+        limit=limit,
+    )
+    lease_until = (now + timedelta(seconds=get_settings().poll_lease_s)).isoformat()
+    claimed: list[dict[str, Any]] = []
+    for acc in rows:
+        won = await supabase.update(
+            "gmail_accounts",
+            {"backfill_next_at": lease_until},
+            filters={"id": f"eq.{acc['id']}", "backfill_next_at": f"eq.{acc['backfill_next_at']}"},
+        )
+        if won:
+            claimed.append(acc)
+    return claimed
+
+
+class BackfillPipeline(IngestionPipeline):
+    """One page of a backfill: metadata-only rows with status `backfilled`, no processing.
+
+    A page at a time so the caller can checkpoint `next_page_token` once the page is stored.
+    """
+
+    takes_over_backfilled = False
+
+    def __init__(self, *, page_token: str | None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.page_token = page_token
+        self.next_page_token: str | None = None
+
+    async def list_pages(self, query: str) -> AsyncIterator[list[str]]:
+        await _pace(self.acc["id"], GMAIL_QUOTA_UNITS["messages.list"])
+        page, self.next_page_token = await list_messages_page(
+            access_token=self.access_token,
+            quota_key=self.acc["id"],
+            query=query,
+            max_results=self.page_size,
+            page_token=self.page_token,
+        )
+        self.listed += len(page)
+        yield [m["id"] for m in page if m.get("id")]
+
+    async def fetch_one(self, message_id: str) -> dict[str, Any]:
+        await _pace(self.acc["id"], GMAIL_QUOTA_UNITS["messages.get"])
+        return await get_message_metadata(access_token=self.access_token, quota_key=self.acc["id"], message_id=message_id)
+
+    async def parse(
+        self, messages: AsyncIterator[dict[str, Any]]
+    ) -> AsyncIterator[tuple[dict[str, Any], str | None]]:
+        async for msg in messages:
+            yield self.build_row(msg, status="backfilled"), None
+
+    async def process(self) -> None:
+        return None
+
+
+async def _over_budget_share(*, supabase: SupabaseRest, user_id: str) -> bool:
+    """True once today's LLM spend reaches backfill's share of the user's daily budget."""
+    rows = await supabase.select(
+        "context_packs", columns="llm_daily_budget_usd", filters={"user_id": f"eq.{user_id}"}, limit=1
+    )
+    budget = daily_budget_usd(rows[0].get("llm_daily_budget_usd") if rows else None)
+    if budget <= 0:
+        return False
+    spent = await spent_today_usd(supabase=supabase, user_id=user_id)
+    return spent >= budget * get_settings().backfill_budget_share
+
+
+async def promote_backfilled(
+    *,
+    supabase: SupabaseRest,
+    body_store: BodyStore,
+    acc: dict[str, Any],
+    access_token: str,
+    limit: int,
+) -> dict[str, Any]:
+    """Fetch bodies for the newest `limit` backfilled items and process exactly those, as history.
+
+    Only while the account has no fresh (`ingested`) mail waiting and the user's LLM spend is below
+    BACKFILL_BUDGET_SHARE of the daily budget, so backfill never delays or starves it.
+    The rows stay `backfilled` until processed, so live polls never pick them up; backfilled mail
+    is old news and gets no drafts or push notifications. A row whose body was stored by an
+    interrupted tick is not fetched again. `promoted` counts only rows that left `backfilled`; a
+    batch that moved none is reported as `error` (or `deferred`, if the budget ran out meanwhile).
+    """
+    live = await supabase.select(
+        "email_items",
+        columns="id",
+        filters={"gmail_account_id": f"eq.{acc['id']}", "status": "eq.ingested"},
+        limit=1,
+    )
+    if live or await _over_budget_share(supabase=supabase, user_id=acc["user_id"]):
+        return {"promoted": 0, "remaining": True, "deferred": True}
+
+    items = await supabase.select(
+        "email_items",
+        columns="id,gmail_message_id,body_hash",
+        filters={"gmail_account_id": f"eq.{acc['id']}", "status": "eq.backfilled"},
+        order="received_at.desc",
+        limit=limit,
+    )
+    if not items:
+        return {"promoted": 0, "remaining": False}
+
+    limiter = asyncio.Semaphore(max(1, get_settings().ingest_fetch_concurrency))
+
+    async def hydrate(item: dict[str, Any]) -> None:
+        if item.get("body_hash"):
+            return
+        async with limiter:
+            await _pace(acc["id"], GMAIL_QUOTA_UNITS["messages.get"])
+            full = await get_message_full(
+                access_token=access_token, quota_key=acc["id"], message_id=item["gmail_message_id"]
+            )
+        with track_sync("mime.parse"):
+            body_text = extract_body_text(full)
+        patch: dict[str, Any] = {}
+        try:
+            patch["body_hash"] = await body_store.put(body_text)
+        except Exception:
+            patch["body_text"] = body_text
+        await supabase.update("email_items", patch, filters={"id": f"eq.{item['id']}"})
+
+    await asyncio.gather(*(hydrate(item) for item in items))
+    ids = [str(item["id"]) for item in items]
+    proc = await process_ingested_for_account(
+        supabase=supabase,
+        user_id=acc["user_id"],
+        gmail_account_id=acc["id"],
+        backfilled_ids=ids,
+    )
+    # Only rows that actually left `backfilled` count; the rest are picked again next time.
+    stuck = await supabase.select(
+        "email_items",
+        columns="id",
+        filters={"id": f"in.({','.join(ids)})", "status": "eq.backfilled"},
+        limit=len(ids),
+    )
+    promoted = len(ids) - len(stuck)
+    result = {"promoted": promoted, "remaining": True, "counts": proc.get("counts") or {}}
+    if promoted == 0:
+        if await _over_budget_share(supabase=supabase, user_id=acc["user_id"]):
+            result["deferred"] = True
+        else:
+            result["error"] = "; ".join(proc.get("errors") or []) or "no backfilled items were processed"
+    elif not stuck:
+        result["remaining"] = len(items) >= limit
+    return result
+
+
+async def backfill_account(
+    *, supabase: SupabaseRest, body_store: BodyStore, acc: dict[str, Any], deadline: float
+) -> dict[str, Any]:
+    """Advance one claimed backfill until `deadline` (time.monotonic()), checkpointing every page."""
+    settings = get_settings()
+    status = acc.get("backfill_status") or "pending"
+    page_token = acc.get("backfill_page_token")
+    listed = int(acc.get("backfill_listed") or 0)
+    result: dict[str, Any] = {"gmail_account_id": acc["id"], "stored": 0, "promoted": 0, "errors": []}
+    error: str | None = None
+
+    try:
+        access_token = await refresh_access_token(refresh_token=decrypt_text(acc["refresh_token_encrypted"]))
+        while status in ("pending", "running") and time.monotonic() < deadline:
+            pipeline = BackfillPipeline(
+                supabase=supabase,
+                body_store=body_store,
+                push_dispatcher=None,
+                acc=acc,
+                access_token=access_token,
+                now=datetime.now(tz=timezone.utc),
+                page_token=page_token,
+                page_size=settings.backfill_page_size,
+            )
+            await pipeline.run(acc["backfill_query"])
+            result["stored"] += pipeline.inserted
+            result["errors"].extend(pipeline.errors)
+            listed += pipeline.listed
+            page_token = pipeline.next_page_token
+            status = "running" if page_token else "promoting"
+            await supabase.update(
+                "gmail_accounts",
+                {"backfill_status": status, "backfill_page_token": page_token, "backfill_listed": listed},
+                filters={"id": f"eq.{acc['id']}"},
+            )
+
+        while status == "promoting" and time.monotonic() < deadline:
+            promoted = await promote_backfilled(
+                supabase=supabase,
+                body_store=body_store,
+                acc=acc,
+                access_token=access_token,
+                limit=settings.backfill_promote_batch,
+            )
+            result["promoted"] += promoted["promoted"]
+            if promoted.get("deferred"):
+                break
+            if promoted.get("error"):
+                # A batch that moved nothing would be selected again forever: give up on this backfill.
+                status, error = "failed", promoted["error"]
+                result["errors"].append(error)
+                break
+            if not promoted["remaining"]:
+                status = "done"
+
+        # Release the lease: continue on the next tick.
+        await supabase.update(
+            "gmail_accounts",
+            {
+                "backfill_status": status,
+                "backfill_next_at": datetime.now(tz=timezone.utc).isoformat(),
+                "backfill_error": error[:500] if error else None,
+            },
+            filters={"id": f"eq.{acc['id']}"},
+        )
+    except Exception as e:
+        result["errors"].append(str(e))
+        retry_at = datetime.now(tz=timezone.utc) + timedelta(seconds=settings.poll_min_interval_s)
+        try:
+            await supabase.update(
+                "gmail_accounts",
+                {"backfill_next_at": retry_at.isoformat(), "backfill_error": str(e)[:500]},
+                filters={"id": f"eq.{acc['id']}"},
+            )
+        except Exception:
+            pass
+
+    finally:
+        _pacers.pop(acc["id"], None)
+
+    result["status"] = status
+    result["listed"] = listed
+    return result
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import hashlib
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import anyio
+
+from .compression import compress_text, decode_text_column, decompress_text, encode_text_column
+from .config import get_settings
+from .supabase_rest import SupabaseRest
+
+
+def body_hash(body_text: str) -> str:
+    return hashlib.sha256(body_text.encode("utf-8")).hexdigest()
+
+
+class BodyStore(ABC):
+    """Content-addressed storage for email bodies (keyed by sha256 of the UTF-8 text).
+
+    Bodies live outside the hot `email_items` row; identical bodies (bulk mail) are stored once.
+    """
+
+    @abstractmethod
+    async def put(self, body_text: str) -> str:
+        """Store `body_text` (a no-op if it is already stored); returns its hash."""
+
+    @abstractmethod
+    async def get_many(self, hashes: list[str]) -> dict[str, str]:
+        """{hash: body text} for the hashes that are stored."""
+
+    async def get(self, h: str) -> str | None:
+        return (await self.get_many([h])).get(h)
+
+
+class SupabaseBodyStore(BodyStore):
+    """Side table `email_bodies (hash primary key, body_text, codec)`; compressed bodies are base64."""
+
+    def __init__(self, *, supabase: SupabaseRest) -> None:
+        self._supabase = supabase
+
+    async def put(self, body_text: str) -> str:
+        h = body_hash(body_text)
+        codec, value = encode_text_column(body_text)
+        await self._supabase.insert(
+            "email_bodies",
+            {"hash": h, "body_text": value, "codec": codec, "size_bytes": len(body_text.encode("utf-8"))},
+            upsert=True,
+            ignore_duplicates=True,
+            on_conflict="hash",
+        )
+        return h
+
+    async def get_many(self, hashes: list[str]) -> dict[str, str]:
+        wanted = sorted({h for h in hashes if h})
+        if not wanted:
+            return {}
+        rows = await self._supabase.select(
+            "email_bodies",
+            columns="hash,body_text,codec",
+            filters={"hash": f"in.({','.join(wanted)})"},
+            limit=len(wanted),
+        )
+        return {r["hash"]: decode_text_column(r.get("codec"), r.get("body_text") or "") for r in rows if r.get("hash")}
+
+
+class LocalBodyStore(BodyStore):
+    """Blob directory: `<root>/<aa>/<hash>.blob` (first line: codec or "plain", then the payload).
+
+    Useful for single-node and offline setups.
+    """
+
+    def __init__(self, *, root: str | Path) -> None:
+        self._root = Path(root)
+
+    def _path(self, h: str) -> Path:
+        return self._root / h[:2] / f"{h}.blob"
+
+    async def put(self, body_text: str) -> str:
+        h = body_hash(body_text)
+        path = anyio.Path(self._path(h))
+        if not await path.exists():
+            codec, data = compress_text(body_text)
+            await path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per writer: concurrent puts of one body each write their own file, and the
+            # atomic replace means readers only ever see a complete blob.
+            tmp = path.with_name(f"{h}.{uuid.uuid4().hex}.tmp")
+            try:
+                await tmp.write_bytes((codec or "plain").encode("ascii") + b"\n" + data)
+                await tmp.replace(path)
+            except BaseException:
+                await tmp.unlink(missing_ok=True)
+                raise
+        return h
+
+    async def get_many(self, hashes: list[str]) -> dict[str, str]:
+        out: dict[str, str] = {}
+        for h in {h for h in hashes if h}:
+            path = anyio.Path(self._path(h))
+            if await path.exists():
+                header, _, data = (await path.read_bytes()).partition(b"\n")
+                codec = header.decode("ascii")
+                out[h] = decompress_text(None if codec == "plain" else codec, data)
+        return out
+
+
+def get_body_store(*, supabase: SupabaseRest) -> BodyStore:
+    settings = get_settings()
+    backend = (settings.body_store_backend or "supabase").strip().lower()
+    if backend == "supabase":
+        return SupabaseBodyStore(supabase=supabase)
+    if backend == "local":
+        if not settings.body_store_dir:
+            raise RuntimeError("Missing BODY_STORE_DIR (required when BODY_STORE_BACKEND=local)")
+        return LocalBodyStore(root=settings.body_store_dir)
+    raise RuntimeError(f"Unsupported BODY_STORE_BACKEND: {backend}")
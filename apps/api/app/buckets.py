@@ -39,6 +39,7 @@ DEFAULT_BUCKETS: list[dict[str, Any]] = [
             "llm_classify": True,
             "llm_summarize": True,
             "llm_draft": True,
+            "llm_escalate": True,
             "push": True,
         },
     },
@@ -192,6 +193,8 @@ DEFAULT_BUCKETS: list[dict[str, Any]] = [
             "llm_summarize": True,
             "llm_draft": False,
             "push": True,
+            "push_digest": True,
+            "llm_batch": True,
         },
     },
     {
@@ -232,6 +235,8 @@ DEFAULT_BUCKETS: list[dict[str, Any]] = [
             "llm_summarize": True,
             "llm_draft": False,
             "push": True,
+            "push_digest": True,
+            "llm_batch": True,
         },
     },
     {
@@ -286,6 +291,7 @@ DEFAULT_BUCKETS: list[dict[str, Any]] = [
             "push": True,
             "push_min_confidence": 0.85,
             "draft_min_confidence": 0.7,
+            "llm_batch": True,
         },
     },
 ]
@@ -307,20 +313,16 @@ def _domain_matches(*, domain: str, rule_domain: str) -> bool:
     return d == r or d.endswith("." + r)
 
 
-def bucket_matches(
-    *,
-    bucket: dict[str, Any],
-    from_email: str | None,
-    subject: str | None,
-    snippet: str | None,
-    body_text: str | None,
-) -> bool:
-    matchers = bucket.get("matchers") or {}
-
+def _message_fields(
+    *, from_email: str | None, subject: str | None, snippet: str | None, body_text: str | None
+) -> tuple[str, str, str]:
     fe = (from_email or "").strip().lower()
     domain = fe.split("@", 1)[1] if "@" in fe else ""
     hay = "\n".join([subject or "", snippet or "", body_text or ""]).lower()
+    return fe, domain, hay
 
+
+def _matches(matchers: dict[str, Any], *, fe: str, domain: str, hay: str) -> bool:
     exclude_sender_emails = set(_as_str_list(matchers.get("exclude_sender_emails")))
     exclude_sender_domains = _as_str_list(matchers.get("exclude_sender_domains"))
     exclude_keywords = _as_str_list(matchers.get("exclude_keywords"))
@@ -336,15 +338,28 @@ def bucket_matches(
     sender_domains = _as_str_list(matchers.get("sender_domains"))
     keywords = _as_str_list(matchers.get("keywords"))
 
-    sender_match = bool(fe and fe in sender_emails) or bool(
-        domain and any(_domain_matches(domain=domain, rule_domain=d) for d in sender_domains)
-    )
-    keyword_match = any(kw.lower() in hay for kw in keywords if kw)
-
     if not sender_emails and not sender_domains and not keywords:
         return False
 
-    return sender_match or keyword_match
+    # Sender rules are cheap; keyword scans (one substring search of the whole message per
+    # keyword) dominate routing cost, so only run them when the sender did not already match.
+    if fe and fe in sender_emails:
+        return True
+    if domain and any(_domain_matches(domain=domain, rule_domain=d) for d in sender_domains):
+        return True
+    return any(kw.lower() in hay for kw in keywords if kw)
+
+
+def bucket_matches(
+    *,
+    bucket: dict[str, Any],
+    from_email: str | None,
+    subject: str | None,
+    snippet: str | None,
+    body_text: str | None,
+) -> bool:
+    fe, domain, hay = _message_fields(from_email=from_email, subject=subject, snippet=snippet, body_text=body_text)
+    return _matches(bucket.get("matchers") or {}, fe=fe, domain=domain, hay=hay)
 
 
 def route_to_bucket(
@@ -357,6 +372,8 @@ def route_to_bucket(
 ) -> dict[str, Any] | None:
     """Returns the highest-priority matching bucket, else a fallback bucket (slug=other) if present."""
     fallback: dict[str, Any] | None = None
+    # Built once per message rather than once per bucket.
+    fe, domain, hay = _message_fields(from_email=from_email, subject=subject, snippet=snippet, body_text=body_text)
 
     for b in sorted(buckets, key=lambda x: int(x.get("priority") or 100)):
         if not bool(b.get("is_enabled", True)):
@@ -365,7 +382,7 @@ def route_to_bucket(
         if slug == "other":
             fallback = b
             continue
-        if bucket_matches(bucket=b, from_email=from_email, subject=subject, snippet=snippet, body_text=body_text):
+        if _matches(b.get("matchers") or {}, fe=fe, domain=domain, hay=hay):
             return b
 
     return fallback
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+from .config import get_settings
+
+
+# Seed dictionary of boilerplate that shows up in most business mail. A corpus-trained
+# dictionary (see `train_dictionary` / bench/compression.py) can be configured on top of it.
+DEFAULT_DICTIONARY = "\n".join(
+    [
+        "Unsubscribe | Manage preferences | View in browser | Privacy Policy | Terms of Service",
+        "You are receiving this email because you signed up",
+        "If you no longer wish to receive these emails, click here to unsubscribe.",
+        "This email and any attachments are confidential and intended solely for the addressee.",
+        "Please do not reply to this email. This mailbox is not monitored.",
+        "Sent from my iPhone",
+        "Get Outlook for iOS",
+        "-----Original Message-----",
+        "From: Sent: To: Cc: Subject: Re: Fwd:",
+        "wrote:",
+        "Thanks, Best regards, Kind regards, Best, Cheers,",
+        "Let me know if you have any questions.",
+        "Please find attached the invoice for your records.",
+        "Hi there, Hello, Dear, Thank you for reaching out.",
+        "https://www. http://www. mailto: .com .io",
+    ]
+).encode("utf-8")
+
+CODEC_ZLIB = "zlib"
+
+
+def _dict_id(d: bytes) -> str:
+    return hashlib.sha256(d).hexdigest()[:8]
+
+
+@lru_cache(maxsize=1)
+def _dictionaries() -> dict[str, bytes]:
+    """All dictionaries we can decode with, by id. The last entry is the one used to encode."""
+    out = {_dict_id(DEFAULT_DICTIONARY): DEFAULT_DICTIONARY}
+    path = get_settings().compression_dict_path
+    if path:
+        trained = Path(path).read_bytes()
+        out[_dict_id(trained)] = trained
+    return out
+
+
+def _active_dictionary() -> tuple[str, bytes]:
+    return list(_dictionaries().items())[-1]
+
+
+def compress_text(text: str, *, zdict: bytes | None = None) -> tuple[str | None, bytes]:
+    """Returns (codec, data). codec=None means `data` is plain UTF-8 (compression off or not worth it)."""
+    raw = text.encode("utf-8")
+    settings = get_settings()
+    if (settings.body_compression or "none").strip().lower() != CODEC_ZLIB or len(raw) < settings.compression_min_bytes:
+        return None, raw
+
+    if zdict is None:
+        dict_id, zdict = _active_dictionary()
+    else:
+        dict_id = _dict_id(zdict)
+    c = zlib.compressobj(level=6, zdict=zdict)
+    data = c.compress(raw) + c.flush()
+    if len(data) >= len(raw):
+        return None, raw
+    return f"{CODEC_ZLIB}:{dict_id}", data
+
+
+def decompress_text(codec: str | None, data: bytes) -> str:
+    if not codec:
+        return data.decode("utf-8")
+    name, _, dict_id = codec.partition(":")
+    if name != CODEC_ZLIB:
+        raise ValueError(f"Unsupported codec: {codec}")
+    zdict = _dictionaries().get(dict_id) if dict_id else None
+    if dict_id and zdict is None:
+        raise ValueError(f"Unknown compression dictionary: {dict_id}")
+    d = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return (d.decompress(data) + d.flush()).decode("utf-8")
+
+
+def encode_text_column(text: str) -> tuple[str | None, str]:
+    """(codec, value) for a text column: compressed payloads are base64 so they survive JSON/PostgREST."""
+    codec, data = compress_text(text)
+    if codec is None:
+        return None, text
+    return codec, base64.b64encode(data).decode("ascii")
+
+
+def decode_text_column(codec: str | None, value: str) -> str:
+    if not codec:
+        return value
+    return decompress_text(codec, base64.b64decode(value.encode("ascii")))
+
+
+def train_dictionary(samples: Iterable[str], *, max_bytes: int = 32 * 1024, min_docs: int = 3) -> bytes:
+    """Build a zlib preset dictionary from lines shared across many samples.
+
+    zlib only looks back 32KB, and matches closer to the data are cheaper, so the most valuable
+    lines (length x document frequency) go last.
+    """
+    doc_freq: Counter[str] = Counter()
+    for s in samples:
+        doc_freq.update({line.strip() for line in s.splitlines() if len(line.strip()) >= 8})
+
+    scored = sorted(
+        ((len(line) * n, line) for line, n in doc_freq.items() if n >= min_docs),
+        reverse=True,
+    )
+    chosen: list[bytes] = []
+    total = 0
+    for _, line in scored:
+        b = line.encode("utf-8") + b"\n"
+        if total + len(b) > max_bytes:
+            continue
+        chosen.append(b)
+        total += len(b)
+    return b"".join(reversed(chosen))
@@ -1,9 +1,26 @@
 from __future__ import annotations
 
-from functools import lru_cache
+import json
+from functools import cached_property, lru_cache
+from typing import Any
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+def _parse_host_rps(raw: str) -> dict[str, float]:
+    """HTTP_HOST_RPS_JSON -> {lowercased host: requests per second}; ValueError if malformed."""
+    if not raw:
+        return {}
+    parsed: Any = json.loads(raw)
+    if not isinstance(parsed, dict):
+        raise ValueError('HTTP_HOST_RPS_JSON must be a JSON object like {"host": requests_per_second}')
+    try:
+        return {str(k).lower(): float(v) for k, v in parsed.items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"HTTP_HOST_RPS_JSON rates must be numbers: {e}") from e
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -17,6 +34,10 @@ class Settings(BaseSettings):
 
     # API
     cron_secret: str = ""
+    # Optional bearer token for GET /metrics (empty = open, e.g. behind a private network)
+    metrics_token: str = ""
+    # Tracing: append OTLP/JSON spans to this file (empty = tracing off)
+    trace_export_path: str = ""
     token_encryption_key_b64: str = ""
     web_base_url: str = "http://localhost:3000"
 
@@ -29,13 +50,100 @@ class Settings(BaseSettings):
     vapid_subject: str = ""
     vapid_public_key: str = ""
     vapid_private_key: str = ""
+    # More relevant items than this for one user in one cycle -> a single digest notification.
+    push_digest_threshold: int = 5
+
+    # Email body storage: "supabase" (email_bodies side table) or "local" (blob directory)
+    body_store_backend: str = "supabase"
+    body_store_dir: str = ""
+    # Stored-body compression: "none" (default) or "zlib", with an optional trained zlib dictionary.
+    # Reads decode either form, so it can be switched on or off at any time.
+    body_compression: str = "none"
+    compression_dict_path: str = ""
+    compression_min_bytes: int = 512
+
+    # Outbound HTTP (Gmail, Google OAuth, LLM, Supabase): retries with jittered exponential backoff
+    # and Retry-After, per-service circuit breakers (0 threshold = never open), client-side rate limits.
+    http_max_attempts: int = 4
+    http_backoff_base_s: float = 0.5
+    http_backoff_max_s: float = 20.0
+    circuit_failure_threshold: int = 5
+    circuit_reset_s: float = 30.0
+    # Gmail per-user quota units per second (0 = no limiter); JSON {"host": requests_per_second} for others.
+    gmail_quota_units_per_second: float = 250.0
+    http_host_rps_json: str = ""
+
+    # Adaptive polling: each account is polled about every POLL_TARGET_MESSAGES / (its arrival rate),
+    # clamped to [min, max] seconds. Run the cron every few minutes; each tick polls only due accounts.
+    poll_min_interval_s: float = 300.0
+    poll_max_interval_s: float = 21600.0
+    poll_target_messages: float = 3.0
+    # Cron ticks (POST /cron/poll-gmail?shard=i&shards=n) lease due accounts in batches, poll up to
+    # `cron_account_concurrency` at a time and keep claiming until none are due or the budget is spent.
+    cron_batch_size: int = 50
+    cron_account_concurrency: int = 4
+    cron_time_budget_s: float = 240.0
+    poll_lease_s: float = 600.0
+    # Messages fetched from Gmail ahead of the one being stored, per account poll.
+    ingest_fetch_concurrency: int = 4
+    # History backfill for newly connected accounts (POST /cron/backfill; 0 days = off): mail from the
+    # last `backfill_days` is listed page by page (resumable) and stored metadata-only, then bodies
+    # are fetched and processed `backfill_promote_batch` at a time while no fresh mail is waiting and
+    # today's LLM spend is below `backfill_budget_share` of the user's daily budget.
+    backfill_days: int = 30
+    backfill_page_size: int = 100
+    backfill_quota_units_per_second: float = 25.0
+    backfill_promote_batch: int = 10
+    backfill_budget_share: float = 0.25
+
+    # Gmail push: users.watch -> Pub/Sub topic ("projects/<project>/topics/<topic>"; empty = polling
+    # only) -> POST /webhooks/gmail?token=<gmail_push_token>. Watches are renewed by the cron once
+    # they expire within `gmail_watch_renew_before_s`; notifications for one account arriving within
+    # `gmail_push_debounce_s` are coalesced into one sync.
+    gmail_pubsub_topic: str = ""
+    gmail_push_token: str = ""
+    gmail_watch_renew_before_s: float = 86400.0
+    gmail_push_debounce_s: float = 5.0
 
     # LLM
     llm_provider: str = "openai"
     openai_api_key: str = ""
     openai_model: str = ""
+    # OpenAI-compatible endpoint (point at bench/mock_openai.py for offline runs)
+    openai_base_url: str = "https://api.openai.com/v1"
     gemini_api_key: str = ""
     gemini_model: str = ""
+    # Per-stage models (empty = the provider model above). A cheap classifier is re-run on
+    # `llm_escalation_model` when its confidence lands in [min, max]; buckets with
+    # `actions.llm_escalate` summarize/draft on it too. Buckets may pin `actions.llm_models`.
+    # All of these (and `llm_budget_model`) must be models of `llm_provider`; checked at startup.
+    llm_model_classify: str = ""
+    llm_model_summarize: str = ""
+    llm_model_draft: str = ""
+    llm_model_revise: str = ""
+    llm_escalation_model: str = ""
+    llm_escalate_min_confidence: float = 0.35
+    llm_escalate_max_confidence: float = 0.65
+    # Buckets with `actions.llm_batch` classify/summarize via the provider Batch API (OpenAI only);
+    # results are applied on a later poll. Off by default.
+    llm_batch_enabled: bool = False
+    # Per-user daily spend cap in USD (0 = unlimited); context_packs.llm_daily_budget_usd overrides it.
+    # Over budget, processing is classify-only and uses `llm_budget_model` if set.
+    llm_daily_budget_usd: float = 0.0
+    llm_budget_model: str = ""
+    # JSON {"model": [input_usd_per_mtok, output_usd_per_mtok]} merged over the built-in price table.
+    llm_prices_json: str = ""
+
+    # Malformed HTTP_HOST_RPS_JSON fails at startup instead of on every outbound call.
+    @field_validator("http_host_rps_json")
+    @classmethod
+    def _check_host_rps_json(cls, v: str) -> str:
+        _parse_host_rps(v)
+        return v
+
+    @cached_property
+    def http_host_rps(self) -> dict[str, float]:
+        return _parse_host_rps(self.http_host_rps_json)
 
 
 @lru_cache(maxsize=1)
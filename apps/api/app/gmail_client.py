@@ -6,9 +6,11 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
 
-import httpx
 from bs4 import BeautifulSoup
 
+from .metrics import instrumented
+from .resilience import GMAIL_QUOTA_UNITS, request
+
 
 GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1"
 
@@ -22,9 +24,18 @@ class GmailProfile:
     email_address: str
 
 
-async def get_profile(*, access_token: str) -> GmailProfile:
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(f"{GMAIL_API_BASE}/users/me/profile", headers=_auth_headers(access_token))
+@instrumented("gmail.profile", provider="gmail")
+async def get_profile(*, access_token: str, quota_key: str | None = None) -> GmailProfile:
+    # On connect the account is not known yet: the token stands in for it for this one call.
+    resp = await request(
+        "GET",
+        f"{GMAIL_API_BASE}/users/me/profile",
+        service="gmail",
+        quota_key=quota_key or access_token,
+        cost=GMAIL_QUOTA_UNITS["profile"],
+        headers=_auth_headers(access_token),
+        timeout=30,
+    )
     resp.raise_for_status()
     j = resp.json()
     email_address = j.get("emailAddress")
@@ -33,9 +44,11 @@ async def get_profile(*, access_token: str) -> GmailProfile:
     return GmailProfile(email_address=email_address)
 
 
+@instrumented("gmail.list", provider="gmail")
 async def list_messages_page(
     *,
     access_token: str,
+    quota_key: str,
     query: str,
     max_results: int = 50,
     page_token: str | None = None,
@@ -47,12 +60,16 @@ async def list_messages_page(
     if page_token:
         params["pageToken"] = page_token
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            f"{GMAIL_API_BASE}/users/me/messages",
-            headers=_auth_headers(access_token),
-            params=params,
-        )
+    resp = await request(
+        "GET",
+        f"{GMAIL_API_BASE}/users/me/messages",
+        service="gmail",
+        quota_key=quota_key,
+        cost=GMAIL_QUOTA_UNITS["messages.list"],
+        headers=_auth_headers(access_token),
+        params=params,
+        timeout=30,
+    )
     resp.raise_for_status()
     j = resp.json()
     messages = j.get("messages", []) or []
@@ -60,20 +77,74 @@ async def list_messages_page(
     return messages, next_token
 
 
-async def list_message_ids(*, access_token: str, after_epoch_seconds: int, max_results: int = 50) -> list[dict[str, str]]:
+async def list_message_ids(
+    *, access_token: str, quota_key: str, after_epoch_seconds: int, max_results: int = 50
+) -> list[dict[str, str]]:
     # Backward-compatible helper (single page).
-    msgs, _ = await list_messages_page(access_token=access_token, query=f"after:{after_epoch_seconds}", max_results=max_results)
+    msgs, _ = await list_messages_page(
+        access_token=access_token, quota_key=quota_key, query=f"after:{after_epoch_seconds}", max_results=max_results
+    )
     return msgs
 
 
-async def get_message_full(*, access_token: str, message_id: str) -> dict[str, Any]:
+@instrumented("gmail.fetch", provider="gmail")
+async def get_message_full(*, access_token: str, quota_key: str, message_id: str) -> dict[str, Any]:
     params = {"format": "full"}
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            f"{GMAIL_API_BASE}/users/me/messages/{message_id}",
-            headers=_auth_headers(access_token),
-            params=params,
-        )
+    resp = await request(
+        "GET",
+        f"{GMAIL_API_BASE}/users/me/messages/{message_id}",
+        service="gmail",
+        quota_key=quota_key,
+        cost=GMAIL_QUOTA_UNITS["messages.get"],
+        headers=_auth_headers(access_token),
+        params=params,
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# Headers the ingest row needs; format=metadata returns just these (no body parts to download).
+METADATA_HEADERS = ("From", "Subject", "Date", "Message-ID", "In-Reply-To", "References")
+
+
+@instrumented("gmail.fetch_metadata", provider="gmail")
+async def get_message_metadata(*, access_token: str, quota_key: str, message_id: str) -> dict[str, Any]:
+    params = [("format", "metadata"), *(("metadataHeaders", h) for h in METADATA_HEADERS)]
+    resp = await request(
+        "GET",
+        f"{GMAIL_API_BASE}/users/me/messages/{message_id}",
+        service="gmail",
+        quota_key=quota_key,
+        cost=GMAIL_QUOTA_UNITS["messages.get"],
+        headers=_auth_headers(access_token),
+        params=params,
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+@instrumented("gmail.watch", provider="gmail")
+async def watch_mailbox(
+    *, access_token: str, quota_key: str, topic_name: str, label_ids: list[str] | None = None
+) -> dict[str, Any]:
+    """Register (or renew) push notifications to a Pub/Sub topic. Returns {historyId, expiration}."""
+    body: dict[str, Any] = {"topicName": topic_name, "labelFilterBehavior": "include"}
+    if label_ids:
+        body["labelIds"] = label_ids
+    # Re-registering replaces the existing watch, so a retry is harmless.
+    resp = await request(
+        "POST",
+        f"{GMAIL_API_BASE}/users/me/watch",
+        service="gmail",
+        idempotent=True,
+        quota_key=quota_key,
+        cost=GMAIL_QUOTA_UNITS["watch"],
+        headers={**_auth_headers(access_token), "content-type": "application/json"},
+        json=body,
+        timeout=30,
+    )
     resp.raise_for_status()
     return resp.json()
 
@@ -104,30 +175,33 @@ def _walk_parts(part: dict[str, Any]) -> list[dict[str, Any]]:
     return out
 
 
+def _decode_parts(datas: list[str]) -> list[str]:
+    out: list[str] = []
+    for data in datas:
+        try:
+            out.append(_decode_b64url(data).decode("utf-8", errors="replace"))
+        except Exception:
+            continue
+    return out
+
+
 def extract_body_text(msg: dict[str, Any]) -> str:
     payload = msg.get("payload") or {}
     all_parts = _walk_parts(payload) if isinstance(payload, dict) else []
 
-    text_plain: list[str] = []
-    text_html: list[str] = []
-
+    # Only text parts are decoded (inline attachments can be megabytes), and HTML only when there
+    # is no text/plain alternative.
+    encoded: dict[str, list[str]] = {"text/plain": [], "text/html": []}
     for p in all_parts:
         mime = (p.get("mimeType") or "").lower()
-        body = p.get("body") or {}
-        data = body.get("data")
-        if not data or not isinstance(data, str):
-            continue
-        try:
-            decoded = _decode_b64url(data).decode("utf-8", errors="replace")
-        except Exception:
-            continue
-        if mime == "text/plain":
-            text_plain.append(decoded)
-        elif mime == "text/html":
-            text_html.append(decoded)
+        data = (p.get("body") or {}).get("data")
+        if mime in encoded and data and isinstance(data, str):
+            encoded[mime].append(data)
 
+    text_plain = _decode_parts(encoded["text/plain"])
     if text_plain:
         return "\n".join(text_plain).strip()
+    text_html = _decode_parts(encoded["text/html"])
     if text_html:
         soup = BeautifulSoup("\n".join(text_html), "html.parser")
         return soup.get_text("\n").strip()
@@ -184,9 +258,11 @@ def build_raw_reply(
     return "\r\n".join(lines)
 
 
+@instrumented("gmail.send", provider="gmail")
 async def send_message(
     *,
     access_token: str,
+    quota_key: str,
     thread_id: str | None,
     raw_rfc822: str,
 ) -> dict[str, Any]:
@@ -195,12 +271,17 @@ async def send_message(
     if thread_id:
         body["threadId"] = thread_id
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            f"{GMAIL_API_BASE}/users/me/messages/send",
-            headers={**_auth_headers(access_token), "content-type": "application/json"},
-            json=body,
-        )
+    # Not idempotent: only retried on 429 or when the connection never opened (no duplicate sends).
+    resp = await request(
+        "POST",
+        f"{GMAIL_API_BASE}/users/me/messages/send",
+        service="gmail",
+        quota_key=quota_key,
+        cost=GMAIL_QUOTA_UNITS["messages.send"],
+        headers={**_auth_headers(access_token), "content-type": "application/json"},
+        json=body,
+        timeout=30,
+    )
     resp.raise_for_status()
     return resp.json()
 
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from .config import get_settings
+from .crypto_utils import decrypt_text
+from .gmail_client import watch_mailbox
+from .google_oauth import refresh_access_token
+from .metrics import PUSH_NOTIFICATIONS
+from .supabase_rest import SupabaseRest
+
+
+@dataclass(frozen=True)
+class GmailNotification:
+    email_address: str
+    history_id: int
+    pubsub_message_id: str | None = None
+
+
+def decode_push(envelope: Any) -> GmailNotification:
+    """Pub/Sub push body -> the Gmail payload (`{"emailAddress", "historyId"}`, base64 in message.data)."""
+    message = envelope.get("message") if isinstance(envelope, dict) else None
+    if not isinstance(message, dict) or not isinstance(message.get("data"), str):
+        raise ValueError("Not a Pub/Sub push message")
+    try:
+        payload = json.loads(base64.b64decode(message["data"]))
+        email_address = str(payload["emailAddress"]).strip()
+        history_id = int(payload["historyId"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed Gmail notification: {e}") from e
+    if not email_address:
+        raise ValueError("Gmail notification without emailAddress")
+    return GmailNotification(
+        email_address=email_address,
+        history_id=history_id,
+        pubsub_message_id=message.get("messageId") or message.get("message_id"),
+    )
+
+
+async def register_watch(
+    *, supabase: SupabaseRest, acc: dict[str, Any], access_token: str | None = None
+) -> dict[str, Any]:
+    """users.watch for one gmail_accounts row (new or renewal); records the expiry on the row."""
+    if access_token is None:
+        access_token = await refresh_access_token(refresh_token=decrypt_text(acc["refresh_token_encrypted"]))
+    res = await watch_mailbox(
+        access_token=access_token,
+        quota_key=acc["id"],
+        topic_name=get_settings().gmail_pubsub_topic,
+        label_ids=["INBOX"],
+    )
+    patch: dict[str, Any] = {
+        "watch_expires_at": datetime.fromtimestamp(int(res["expiration"]) / 1000, tz=timezone.utc).isoformat(),
+        "watch_error": None,
+    }
+    # Only a first registration sets the sync cursor: moving it on renewal would drop notifications
+    # that are still in flight for mail we have not synced yet.
+    if acc.get("watch_history_id") is None and res.get("historyId"):
+        patch["watch_history_id"] = int(res["historyId"])
+    await supabase.update("gmail_accounts", patch, filters={"id": f"eq.{acc['id']}"})
+    return patch
+
+
+async def renew_watches(*, supabase: SupabaseRest, limit: int = 200) -> dict[str, int]:
+    """Register watches that are missing or expire within GMAIL_WATCH_RENEW_BEFORE_S. Best-effort."""
+    settings = get_settings()
+    if not settings.gmail_pubsub_topic:
+        return {"renewed": 0, "failed": 0}
+
+    cutoff = (datetime.now(tz=timezone.utc) + timedelta(seconds=settings.gmail_watch_renew_before_s)).isoformat()
+    accounts = await supabase.select(
+        "gmail_accounts",
+        columns="id,refresh_token_encrypted,watch_history_id,watch_expires_at",
+        filters={"status": "eq.active", "or": f'(watch_expires_at.is.null,watch_expires_at.lt."{cutoff}")'},
+        order="watch_expires_at.asc.nullsfirst",
+        limit=limit,
+    )
+    renewed = failed = 0
+    for acc in accounts:
+        try:
+            await register_watch(supabase=supabase, acc=acc)
+            renewed += 1
+        except Exception as e:
+            failed += 1
+            try:
+                await supabase.update(
+                    "gmail_accounts", {"watch_error": str(e)[:500]}, filters={"id": f"eq.{acc['id']}"}
+                )
+            except Exception:
+                pass
+    return {"renewed": renewed, "failed": failed}
+
+
+class PushSyncDebouncer:
+    """Coalesces Gmail notification storms into one sync per mailbox.
+
+    The first notification for a mailbox schedules a sync after `delay_s`; notifications arriving
+    before it starts are folded into it (only the newest historyId is kept). Ones arriving while it
+    runs schedule exactly one follow-up sync. Other replicas dedupe through the stored
+    `watch_history_id`, so a notification delivered twice is synced once.
+    """
+
+    def __init__(self, *, run: Callable[[str, int], Awaitable[Any]], delay_s: float | None = None) -> None:
+        self._run = run
+        self._delay_s = delay_s
+        self._latest: dict[str, int] = {}
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+
+    def notify(self, email_address: str, history_id: int) -> bool:
+        """Returns False when the notification was folded into a pending or running sync."""
+        key = email_address.lower()
+        self._latest[key] = max(history_id, self._latest.get(key, 0))
+        if key in self._tasks:
+            PUSH_NOTIFICATIONS.inc(outcome="coalesced")
+            return False
+        self._tasks[key] = asyncio.create_task(self._loop(key, email_address))
+        PUSH_NOTIFICATIONS.inc(outcome="scheduled")
+        return True
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def _loop(self, key: str, email_address: str) -> None:
+        delay_s = self._delay_s if self._delay_s is not None else get_settings().gmail_push_debounce_s
+        try:
+            while key in self._latest:
+                await asyncio.sleep(delay_s)
+                history_id = self._latest.pop(key)
+                try:
+                    await self._run(email_address, history_id)
+                except Exception:
+                    # Scheduled polling is the safety net.
+                    PUSH_NOTIFICATIONS.inc(outcome="sync_failed")
+        finally:
+            self._tasks.pop(key, None)
+
+    async def aclose(self) -> None:
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._latest.clear()
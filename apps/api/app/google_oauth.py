@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import hashlib
+import time
 from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
 from urllib.parse import urlencode
 
 import httpx
 
 from .config import get_settings
+from .metrics import instrumented
+from .resilience import request
 
 
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
 GMAIL_SCOPES = [
     # Read messages
     "https://www.googleapis.com/auth/gmail.readonly",
@@ -45,6 +52,7 @@ class GoogleTokenResponse:
     expires_in: int | None
 
 
+@instrumented("google.token_exchange", provider="google")
 async def exchange_code_for_tokens(*, code: str) -> GoogleTokenResponse:
     settings = get_settings()
     if not settings.google_client_id:
@@ -61,8 +69,8 @@ async def exchange_code_for_tokens(*, code: str) -> GoogleTokenResponse:
         "redirect_uri": settings.google_redirect_uri,
         "grant_type": "authorization_code",
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post("https://oauth2.googleapis.com/token", data=data)
+    # Authorization codes are single-use: not idempotent.
+    resp = await request("POST", GOOGLE_TOKEN_URL, service="google", idempotent=False, data=data, timeout=30)
     resp.raise_for_status()
     j = resp.json()
     return GoogleTokenResponse(
@@ -74,7 +82,29 @@ async def exchange_code_for_tokens(*, code: str) -> GoogleTokenResponse:
     )
 
 
-async def refresh_access_token(*, refresh_token: str) -> str:
+# Access tokens by refresh-token digest -> (token, time.monotonic() expiry). Google issues them for
+# an hour; reusing one saves a round trip on every poll and send. Refreshed this long before expiry:
+ACCESS_TOKEN_MARGIN_S = 300.0
+_MAX_CACHED_TOKENS = 10_000
+_access_tokens: dict[str, tuple[str, float]] = {}
+
+
+def _token_key(refresh_token: str) -> str:
+    # Never keep the refresh token itself around.
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+def invalidate_access_token(*, refresh_token: str) -> None:
+    """Forget the cached access token (Google rejected it), so the next call refreshes."""
+    _access_tokens.pop(_token_key(refresh_token), None)
+
+
+def reset_access_tokens() -> None:
+    _access_tokens.clear()
+
+
+@instrumented("google.token_refresh", provider="google")
+async def _refresh(*, refresh_token: str) -> tuple[str, float]:
     settings = get_settings()
     if not settings.google_client_id:
         raise RuntimeError("Missing GOOGLE_CLIENT_ID")
@@ -87,12 +117,43 @@ async def refresh_access_token(*, refresh_token: str) -> str:
         "refresh_token": refresh_token,
         "grant_type": "refresh_token",
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post("https://oauth2.googleapis.com/token", data=data)
+    resp = await request("POST", GOOGLE_TOKEN_URL, service="google", idempotent=True, data=data, timeout=30)
     resp.raise_for_status()
     j = resp.json()
     token = j.get("access_token")
     if not token:
         raise RuntimeError("Failed to refresh access token")
+    return token, float(j.get("expires_in") or 0)
+
+
+async def refresh_access_token(*, refresh_token: str) -> str:
+    """A valid access token for `refresh_token`: cached until shortly before it expires."""
+    key = _token_key(refresh_token)
+    cached = _access_tokens.get(key)
+    now = time.monotonic()
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    token, expires_in = await _refresh(refresh_token=refresh_token)
+    if expires_in > ACCESS_TOKEN_MARGIN_S:
+        if len(_access_tokens) >= _MAX_CACHED_TOKENS:
+            for k in [k for k, (_, exp) in _access_tokens.items() if exp <= now]:
+                del _access_tokens[k]
+        if len(_access_tokens) < _MAX_CACHED_TOKENS:
+            _access_tokens[key] = (token, time.monotonic() + expires_in - ACCESS_TOKEN_MARGIN_S)
     return token
 
+
+T = TypeVar("T")
+
+
+async def call_with_access_token(*, refresh_token: str, call: Callable[[str], Awaitable[T]]) -> T:
+    """`call(access_token)`; if Google answers 401 (a revoked cached token), refresh once and retry."""
+    access_token = await refresh_access_token(refresh_token=refresh_token)
+    try:
+        return await call(access_token)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 401:
+            raise
+    invalidate_access_token(refresh_token=refresh_token)
+    return await call(await refresh_access_token(refresh_token=refresh_token))
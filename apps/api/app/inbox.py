@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any
+
+from .supabase_rest import SupabaseRest
+
+
+INBOX_COLUMNS = "id,from_email,subject,snippet,received_at,is_relevant,status,bucket_id"
+
+# View -> statuses it shows (None = every status).
+VIEW_STATUSES: dict[str, tuple[str, ...] | None] = {
+    "needs_review": ("needs_review", "failed"),
+    "sent": ("sent",),
+    "all": None,
+}
+
+
+def encode_cursor(*, received_at: str, item_id: str) -> str:
+    raw = json.dumps({"r": received_at, "id": item_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    padded = cursor + "=" * ((4 - (len(cursor) % 4)) % 4)
+    try:
+        j = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        received_at, item_id = j["r"], j["id"]
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    # Both values end up inside a PostgREST filter expression; only accept well-formed ones.
+    try:
+        datetime.fromisoformat(str(received_at).replace("Z", "+00:00"))
+        uuid.UUID(str(item_id))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+    return str(received_at), str(item_id)
+
+
+async def fetch_inbox_page(
+    *,
+    supabase: SupabaseRest,
+    user_id: str,
+    view: str,
+    bucket_id: str | None,
+    cursor: str | None,
+    limit: int,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """Keyset page over (received_at desc, id desc). Returns (rows, next_cursor).
+
+    received_at is never null (migration 0019), so every row has a place in the keyset.
+    """
+    filters: dict[str, str] = {"user_id": f"eq.{user_id}"}
+    statuses = VIEW_STATUSES[view]
+    if statuses:
+        filters["status"] = f"in.({','.join(statuses)})"
+    if bucket_id:
+        filters["bucket_id"] = "is.null" if bucket_id == "none" else f"eq.{bucket_id}"
+    if cursor:
+        received_at, item_id = decode_cursor(cursor)
+        filters["or"] = f'(received_at.lt."{received_at}",and(received_at.eq."{received_at}",id.lt.{item_id}))'
+
+    # Fetch one extra row to know whether another page exists.
+    rows = await supabase.select(
+        "email_items",
+        columns=INBOX_COLUMNS,
+        filters=filters,
+        order="received_at.desc,id.desc",
+        limit=limit + 1,
+    )
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(received_at=last["received_at"], item_id=last["id"])
+
+
+async def fetch_inbox_counts(*, supabase: SupabaseRest, user_id: str, view: str) -> dict[str, dict[str, int]]:
+    rows = await supabase.rpc("inbox_counts", {"p_user_id": user_id}) or []
+
+    views = {v: 0 for v in VIEW_STATUSES}
+    by_bucket: dict[str, int] = {}
+    statuses = VIEW_STATUSES[view]
+    for r in rows:
+        status = r.get("status")
+        n = int(r.get("n") or 0)
+        for v, vs in VIEW_STATUSES.items():
+            if vs is None or status in vs:
+                views[v] += n
+        if statuses is None or status in statuses:
+            key = r.get("bucket_id") or "none"
+            by_bucket[key] = by_bucket.get(key, 0) + n
+    return {"views": views, "by_bucket": by_bucket}
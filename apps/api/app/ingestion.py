@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from .body_store import BodyStore
+from .config import get_settings
+from .gmail_client import (
+    _extract_headers,
+    extract_body_text,
+    get_message_full,
+    list_messages_page,
+    parse_from_email,
+    parse_received_at,
+)
+from .metrics import track_sync
+from .processing import process_ingested_for_account
+from .push_dispatch import PushDispatcher
+from .supabase_rest import SupabaseRest, SupabaseRestError
+from .tracing import start_span
+
+
+# Messages persisted between two `progress` reports.
+PROGRESS_EVERY = 25
+
+
+def inbox_query(*, after: datetime, before: datetime | None = None) -> str:
+    """Gmail search for ingestible mail received in (after, before)."""
+    terms = ["in:inbox", f"after:{int(after.timestamp())}"]
+    if before is not None:
+        terms.append(f"before:{int(before.timestamp())}")
+    return " ".join([*terms, "-category:social", "-category:forums"])
+
+
+class IngestionPipeline:
+    """Gmail -> email_items for one account: list -> dedupe -> fetch -> parse -> persist -> process.
+
+    Stages are async generators chained in `run()`, so each pulls from the previous one only as fast
+    as it consumes: at most `fetch_concurrency` messages are in flight ahead of the persist stage,
+    and fetching the next messages overlaps parsing and storing the current one. Every stage is a
+    method; override one in a subclass to swap it (e.g. a history-based lister).
+
+    Mail a backfill already stored (`backfilled`, possibly still metadata-only) is taken over when a
+    live poll lists it: the row gets its body and becomes `ingested`, so it is drafted and pushed.
+    """
+
+    takes_over_backfilled = True
+
+    def __init__(
+        self,
+        *,
+        supabase: SupabaseRest,
+        body_store: BodyStore,
+        push_dispatcher: PushDispatcher | None,
+        acc: dict[str, Any],
+        access_token: str,
+        now: datetime,
+        max_fetch: int = 200,
+        page_size: int = 50,
+        fetch_concurrency: int | None = None,
+        max_process: int = 25,
+        progress: Callable[[dict[str, Any]], Awaitable[Any]] | None = None,
+    ) -> None:
+        self.supabase = supabase
+        self.body_store = body_store
+        self.push_dispatcher = push_dispatcher
+        self.acc = acc
+        self.access_token = access_token
+        self.now = now
+        self.max_fetch = max_fetch
+        self.page_size = page_size
+        self.fetch_concurrency = max(
+            1, fetch_concurrency if fetch_concurrency is not None else get_settings().ingest_fetch_concurrency
+        )
+        self.max_process = max_process
+        self.progress = progress
+
+        self.listed = 0
+        self.known = 0
+        self.fetched = 0
+        self.inserted = 0
+        self.backfilled: set[str] = set()
+        self.processed_counts: dict[str, Any] = {}
+        self.errors: list[str] = []
+
+    async def run(self, query: str) -> None:
+        """Ingest everything `query` matches (up to `max_fetch`), then process the new items."""
+        async for _ in self.persist(self.parse(self.fetch(self.dedupe(self.list_pages(query))))):
+            if self.fetched % PROGRESS_EVERY == 0:
+                await self.report()
+        await self.report()
+        await self.process()
+
+    def counts(self) -> dict[str, Any]:
+        return {"fetched": self.fetched, "inserted": self.inserted, "known": self.known, **self.processed_counts}
+
+    async def report(self) -> None:
+        """Hand the running counts to `progress` (best-effort)."""
+        if self.progress is None:
+            return
+        try:
+            await self.progress(self.counts())
+        except Exception:
+            pass
+
+    async def list_pages(self, query: str) -> AsyncIterator[list[str]]:
+        page_token: str | None = None
+        while self.listed < self.max_fetch:
+            page, page_token = await list_messages_page(
+                access_token=self.access_token,
+                quota_key=self.acc["id"],
+                query=query,
+                max_results=self.page_size,
+                page_token=page_token,
+            )
+            if not page:
+                return
+            self.listed += len(page)
+            yield [m["id"] for m in page if m.get("id")]
+            if not page_token:
+                return
+
+    async def dedupe(self, pages: AsyncIterator[list[str]]) -> AsyncIterator[str]:
+        """Drops ids already in email_items (the `after:` window overlaps the previous poll)."""
+        async for ids in pages:
+            known: set[str] = set()
+            if ids:
+                try:
+                    rows = await self.supabase.select(
+                        "email_items",
+                        columns="gmail_message_id,status",
+                        filters={
+                            "gmail_account_id": f"eq.{self.acc['id']}",
+                            "gmail_message_id": f"in.({','.join(ids)})",
+                        },
+                        limit=len(ids),
+                    )
+                    for r in rows:
+                        if self.takes_over_backfilled and r.get("status") == "backfilled":
+                            self.backfilled.add(r["gmail_message_id"])
+                        else:
+                            known.add(r["gmail_message_id"])
+                except SupabaseRestError:
+                    # The upsert below ignores duplicates anyway; this only saves the fetch.
+                    pass
+            self.known += len(known)
+            for message_id in ids:
+                if message_id not in known:
+                    yield message_id
+
+    async def fetch(self, ids: AsyncIterator[str]) -> AsyncIterator[dict[str, Any]]:
+        """format=full for each id, up to `fetch_concurrency` ahead; yields in listing order."""
+        pending: deque[asyncio.Task[dict[str, Any]]] = deque()
+        try:
+            async for message_id in ids:
+                pending.append(asyncio.create_task(self.fetch_one(message_id)))
+                if len(pending) >= self.fetch_concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def fetch_one(self, message_id: str) -> dict[str, Any]:
+        return await get_message_full(access_token=self.access_token, quota_key=self.acc["id"], message_id=message_id)
+
+    def build_row(self, msg: dict[str, Any], *, status: str = "ingested") -> dict[str, Any]:
+        """email_items row (without the body) from a format=full or format=metadata message."""
+        headers = _extract_headers(msg)
+        received_at_dt = parse_received_at(msg)
+        return {
+            "user_id": self.acc["user_id"],
+            "gmail_account_id": self.acc["id"],
+            "gmail_message_id": msg.get("id"),
+            "thread_id": msg.get("threadId"),
+            "from_email": parse_from_email(headers.get("from")),
+            "subject": headers.get("subject"),
+            "snippet": msg.get("snippet"),
+            "received_at": (received_at_dt or self.now).isoformat(),
+            "status": status,
+            # Threading headers, so replies need no second Gmail read.
+            "header_message_id": headers.get("message-id"),
+            "header_in_reply_to": headers.get("in-reply-to"),
+            "header_references": headers.get("references"),
+        }
+
+    async def parse(
+        self, messages: AsyncIterator[dict[str, Any]]
+    ) -> AsyncIterator[tuple[dict[str, Any], str | None]]:
+        """-> (email_items row without the body, body text)."""
+        async for full in messages:
+            with track_sync("mime.parse"):
+                body_text = extract_body_text(full)
+            yield self.build_row(full), body_text
+
+    async def persist(
+        self, parsed: AsyncIterator[tuple[dict[str, Any], str | None]]
+    ) -> AsyncIterator[dict[str, Any] | None]:
+        """Stores each row; yields the inserted email_items row (None for a duplicate or error)."""
+        async for row, body_text in parsed:
+            self.fetched += 1
+            with start_span(
+                "gmail.ingest_message",
+                attributes={"gmail_account_id": self.acc["id"], "gmail_message_id": row["gmail_message_id"]},
+            ) as msg_span:
+                # Body goes to the content-addressed store; keep it inline only if that fails.
+                # Metadata-only rows (None) get their body when they are promoted for processing.
+                if body_text is not None:
+                    try:
+                        row["body_hash"] = await self.body_store.put(body_text)
+                    except Exception:
+                        row["body_text"] = body_text
+
+                inserted: dict[str, Any] | None = None
+                try:
+                    res = await self.supabase.insert(
+                        "email_items",
+                        row,
+                        upsert=True,
+                        ignore_duplicates=True,
+                        on_conflict="gmail_account_id,gmail_message_id",
+                    )
+                    if not (isinstance(res, list) and res) and row["gmail_message_id"] in self.backfilled:
+                        res = await self.take_over(row)
+                    if isinstance(res, list) and res:
+                        self.inserted += len(res)
+                        inserted = res[0]
+                        msg_span.set_attribute("email_item_id", inserted.get("id"))
+                except SupabaseRestError as e:
+                    # likely unique conflict or schema issue; record and continue
+                    self.errors.append(str(e))
+            yield inserted
+
+    async def take_over(self, row: dict[str, Any]) -> list[dict[str, Any]]:
+        """Makes the backfilled row for this message live, unless backfill has processed it meanwhile."""
+        patch = {k: row[k] for k in ("status", "body_hash", "body_text") if k in row}
+        return await self.supabase.update(
+            "email_items",
+            patch,
+            filters={
+                "gmail_account_id": f"eq.{self.acc['id']}",
+                "gmail_message_id": f"eq.{row['gmail_message_id']}",
+                "status": "eq.backfilled",
+            },
+        )
+
+    async def process(self) -> None:
+        """AI + push for the newly ingested items. Best-effort."""
+        try:
+            proc = await process_ingested_for_account(
+                supabase=self.supabase,
+                user_id=self.acc["user_id"],
+                gmail_account_id=self.acc["id"],
+                max_items=self.max_process,
+                push_dispatcher=self.push_dispatcher,
+            )
+            self.processed_counts = proc.get("counts") or {}
+            self.errors.extend(proc.get("errors") or [])
+        except Exception as e:
+            self.errors.append(f"processing error: {e}")
@@ -7,14 +7,22 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any, Literal
 
-import httpx
 from jsonschema import Draft7Validator
 
 from .config import get_settings
+from .llm_usage import LLMUsage, record_usage
+from .metrics import track
+from .resilience import request
+from .tracing import set_attributes
 
 
 SchemaName = Literal["classification", "summary", "draft", "revise"]
 
+# Schema -> pipeline stage (metrics label, usage accounting).
+_STAGES: dict[str, str] = {"classification": "classify", "summary": "summarize", "draft": "draft", "revise": "revise"}
+
+TEMPERATURES: dict[str, float] = {"classification": 0.0, "summary": 0.2, "draft": 0.4, "revise": 0.3}
+
 
 class LLMError(RuntimeError):
     pass
@@ -126,14 +134,48 @@ def _format_context(ctx: ContextPack) -> str:
     )
 
 
-async def _llm_text(*, system: str, user: str, temperature: float = 0.2) -> str:
+def openai_base_url() -> str:
+    return (get_settings().openai_base_url or "https://api.openai.com/v1").rstrip("/")
+
+
+def resolve_model(model: str | None, *, provider: str) -> str:
+    """`model` if routed explicitly, else the configured default for `provider`."""
+    settings = get_settings()
+    if model:
+        return model
+    if provider == "gemini":
+        return settings.gemini_model or "gemini-1.5-flash"
+    return settings.openai_model or "gpt-4o-mini"
+
+
+def _record_usage(usage: LLMUsage) -> None:
+    set_attributes(
+        **{
+            "llm.model": usage.model,
+            "llm.prompt_tokens": usage.prompt_tokens,
+            "llm.completion_tokens": usage.completion_tokens,
+            "llm.cached_tokens": usage.cached_tokens,
+            "llm.cost_usd": usage.cost_usd,
+        }
+    )
+    record_usage(usage)
+
+
+async def _llm_text(
+    *,
+    system: str,
+    user: str,
+    temperature: float = 0.2,
+    stage: str = "llm",
+    model: str | None = None,
+) -> str:
     settings = get_settings()
     provider = (settings.llm_provider or "openai").strip().lower()
 
     if provider == "openai":
         if not settings.openai_api_key:
             raise LLMError("Missing OPENAI_API_KEY")
-        model = settings.openai_model or "gpt-4o-mini"
+        model = resolve_model(model, provider="openai")
         headers = {
             "authorization": f"Bearer {settings.openai_api_key}",
             "content-type": "application/json",
@@ -146,17 +188,37 @@ async def _llm_text(*, system: str, user: str, temperature: float = 0.2) -> str:
                 {"role": "user", "content": user},
             ],
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-        if resp.status_code >= 400:
-            raise LLMError(f"OpenAI error: {resp.status_code} {resp.text}")
-        j = resp.json()
+        async with track(f"llm.{stage}", provider="openai"):
+            # Completions have no side effects, so 5xx/timeouts are retried like reads.
+            resp = await request(
+                "POST",
+                f"{openai_base_url()}/chat/completions",
+                service="openai",
+                idempotent=True,
+                headers=headers,
+                json=payload,
+                timeout=60,
+            )
+            if resp.status_code >= 400:
+                raise LLMError(f"OpenAI error: {resp.status_code} {resp.text}")
+            j = resp.json()
+            usage = j.get("usage") or {}
+            _record_usage(
+                LLMUsage(
+                    stage=stage,
+                    provider="openai",
+                    model=model,
+                    prompt_tokens=int(usage.get("prompt_tokens") or 0),
+                    completion_tokens=int(usage.get("completion_tokens") or 0),
+                    cached_tokens=int((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0),
+                )
+            )
         return (j.get("choices") or [{}])[0].get("message", {}).get("content") or ""
 
     if provider == "gemini":
         if not settings.gemini_api_key:
             raise LLMError("Missing GEMINI_API_KEY")
-        model = settings.gemini_model or "gemini-1.5-flash"
+        model = resolve_model(model, provider="gemini")
         # Keep it simple and portable: bake system instructions into the user prompt.
         prompt = system.strip() + "\n\n" + user.strip()
         url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
@@ -169,11 +231,22 @@ async def _llm_text(*, system: str, user: str, temperature: float = 0.2) -> str:
                 "responseMimeType": "application/json",
             },
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(url, params=params, json=payload)
-        if resp.status_code >= 400:
-            raise LLMError(f"Gemini error: {resp.status_code} {resp.text}")
-        j = resp.json()
+        async with track(f"llm.{stage}", provider="gemini"):
+            resp = await request("POST", url, service="gemini", idempotent=True, params=params, json=payload, timeout=60)
+            if resp.status_code >= 400:
+                raise LLMError(f"Gemini error: {resp.status_code} {resp.text}")
+            j = resp.json()
+            usage = j.get("usageMetadata") or {}
+            _record_usage(
+                LLMUsage(
+                    stage=stage,
+                    provider="gemini",
+                    model=model,
+                    prompt_tokens=int(usage.get("promptTokenCount") or 0),
+                    completion_tokens=int(usage.get("candidatesTokenCount") or 0),
+                    cached_tokens=int(usage.get("cachedContentTokenCount") or 0),
+                )
+            )
         candidates = j.get("candidates") or []
         if not candidates:
             raise LLMError("Gemini returned no candidates")
@@ -184,16 +257,41 @@ async def _llm_text(*, system: str, user: str, temperature: float = 0.2) -> str:
     raise LLMError(f"Unsupported LLM_PROVIDER: {provider}")
 
 
-async def _llm_json(*, name: SchemaName, system: str, user: str, temperature: float = 0.2) -> dict[str, Any]:
-    schema = _load_schema(name)
-    validator = _validator(name)
-
-    base_user = (
+def json_user_prompt(name: SchemaName, user: str) -> str:
+    """User prompt with the output schema appended (shared by the sync and batch paths)."""
+    return (
         user.strip()
         + "\n\nReturn ONLY valid JSON matching this schema (no markdown fences, no extra keys):\n"
-        + json.dumps(schema, ensure_ascii=False)
+        + json.dumps(_load_schema(name), ensure_ascii=False)
     )
 
+
+def json_request(name: SchemaName, user: str) -> tuple[str, str, float]:
+    """(system, user, temperature) exactly as the synchronous path would send them."""
+    return _system_prompt(), json_user_prompt(name, user), TEMPERATURES[name]
+
+
+def parse_json_output(name: SchemaName, text: str) -> dict[str, Any]:
+    """Extract and schema-validate a model's JSON answer. Raises ValueError if it doesn't conform."""
+    data = _extract_json(text)
+    if not isinstance(data, dict):
+        raise ValueError("Expected JSON object")
+    errors = sorted(_validator(name).iter_errors(data), key=lambda e: e.path)
+    if errors:
+        raise ValueError("; ".join(e.message for e in errors[:3]))
+    return data
+
+
+async def _llm_json(
+    *,
+    name: SchemaName,
+    system: str,
+    user: str,
+    temperature: float = 0.2,
+    model: str | None = None,
+) -> dict[str, Any]:
+    base_user = json_user_prompt(name, user)
+
     last_err: Exception | None = None
     for attempt in range(2):
         prompt = base_user
@@ -204,15 +302,9 @@ async def _llm_json(*, name: SchemaName, system: str, user: str, temperature: fl
                 + _truncate(str(last_err), 600)
             )
 
-        text = await _llm_text(system=system, user=prompt, temperature=temperature)
+        text = await _llm_text(system=system, user=prompt, temperature=temperature, stage=_STAGES[name], model=model)
         try:
-            data = _extract_json(text)
-            if not isinstance(data, dict):
-                raise ValueError("Expected JSON object")
-            errors = sorted(validator.iter_errors(data), key=lambda e: e.path)
-            if errors:
-                raise ValueError("; ".join(e.message for e in errors[:3]))
-            return data
+            return parse_json_output(name, text)
         except Exception as e:
             last_err = e
             continue
@@ -220,6 +312,19 @@ async def _llm_json(*, name: SchemaName, system: str, user: str, temperature: fl
     raise LLMError(f"Invalid JSON output for {name}: {last_err}")
 
 
+def _format_thread_context(thread_context: list[dict[str, Any]] | None, *, max_chars: int) -> list[str]:
+    """Earlier messages in the same thread, oldest first, rendered as prompt lines."""
+    if not thread_context:
+        return []
+    lines = ["", "Earlier messages in this thread (oldest first):"]
+    per_msg = max(200, max_chars // max(1, len(thread_context)))
+    for m in thread_context:
+        lines.append(f"- from: {_truncate(m.get('from_email'), 200)}")
+        lines.append(f"  subject: {_truncate(m.get('subject'), 300)}")
+        lines.append("  body: " + _truncate(m.get("body_text") or m.get("snippet"), per_msg))
+    return lines
+
+
 def _system_prompt() -> str:
     return "\n".join(
         [
@@ -231,15 +336,16 @@ def _system_prompt() -> str:
     )
 
 
-async def classify_email(
+def classify_prompt(
     *,
     ctx: ContextPack,
     from_email: str | None,
     subject: str | None,
     snippet: str | None,
     body_text: str | None,
-) -> dict[str, Any]:
-    user = "\n".join(
+    thread_context: list[dict[str, Any]] | None = None,
+) -> str:
+    return "\n".join(
         [
             "Classify whether this email is business-relevant for the user's brand.",
             "Treat newsletters, automated notifications, and irrelevant promos as not relevant unless they match the context keywords.",
@@ -253,19 +359,43 @@ async def classify_email(
             f"snippet: {_truncate(snippet, 500)}",
             "body:",
             _truncate(body_text, 8000),
+            *_format_thread_context(thread_context, max_chars=3000),
         ]
     )
-    return await _llm_json(name="classification", system=_system_prompt(), user=user, temperature=0.0)
 
 
-async def summarize_email(
+async def classify_email(
     *,
     ctx: ContextPack,
     from_email: str | None,
     subject: str | None,
+    snippet: str | None,
     body_text: str | None,
+    thread_context: list[dict[str, Any]] | None = None,
+    model: str | None = None,
 ) -> dict[str, Any]:
-    user = "\n".join(
+    user = classify_prompt(
+        ctx=ctx,
+        from_email=from_email,
+        subject=subject,
+        snippet=snippet,
+        body_text=body_text,
+        thread_context=thread_context,
+    )
+    return await _llm_json(
+        name="classification", system=_system_prompt(), user=user, temperature=TEMPERATURES["classification"], model=model
+    )
+
+
+def summarize_prompt(
+    *,
+    ctx: ContextPack,
+    from_email: str | None,
+    subject: str | None,
+    body_text: str | None,
+    thread_context: list[dict[str, Any]] | None = None,
+) -> str:
+    return "\n".join(
         [
             "Summarize the email for the user.",
             "Output short bullets. Focus on what the sender wants and what the user should do next.",
@@ -278,9 +408,28 @@ async def summarize_email(
             f"subject: {_truncate(subject, 300)}",
             "body:",
             _truncate(body_text, 12000),
+            *_format_thread_context(thread_context, max_chars=6000),
         ]
     )
-    return await _llm_json(name="summary", system=_system_prompt(), user=user, temperature=0.2)
+
+
+async def summarize_email(
+    *,
+    ctx: ContextPack,
+    from_email: str | None,
+    subject: str | None,
+    body_text: str | None,
+    thread_context: list[dict[str, Any]] | None = None,
+    model: str | None = None,
+) -> dict[str, Any]:
+    user = summarize_prompt(
+        ctx=ctx,
+        from_email=from_email,
+        subject=subject,
+        body_text=body_text,
+        thread_context=thread_context,
+    )
+    return await _llm_json(name="summary", system=_system_prompt(), user=user, temperature=TEMPERATURES["summary"], model=model)
 
 
 async def draft_reply(
@@ -290,6 +439,8 @@ async def draft_reply(
     subject: str | None,
     body_text: str | None,
     summary_json: dict[str, Any],
+    thread_context: list[dict[str, Any]] | None = None,
+    model: str | None = None,
 ) -> dict[str, Any]:
     tone = (ctx.tone or "").strip() or "concise, warm, professional"
     signature = (ctx.signature or "").strip()
@@ -316,6 +467,7 @@ async def draft_reply(
             f"subject: {_truncate(subject, 300)}",
             "body:",
             _truncate(body_text, 12000),
+            *_format_thread_context(thread_context, max_chars=6000),
             "",
             "Computed summary (JSON):",
             _json_dumps_compact(summary_json, max_chars=2500),
@@ -324,7 +476,7 @@ async def draft_reply(
             signature or "(none)",
         ]
     )
-    return await _llm_json(name="draft", system=_system_prompt(), user=user, temperature=0.4)
+    return await _llm_json(name="draft", system=_system_prompt(), user=user, temperature=TEMPERATURES["draft"], model=model)
 
 
 async def revise_draft(
@@ -332,6 +484,7 @@ async def revise_draft(
     ctx: ContextPack,
     current_draft_text: str,
     instruction: str,
+    model: str | None = None,
 ) -> dict[str, Any]:
     tone = (ctx.tone or "").strip() or "concise, warm, professional"
     signature = (ctx.signature or "").strip()
@@ -362,5 +515,5 @@ async def revise_draft(
             signature or "(none)",
         ]
     )
-    return await _llm_json(name="revise", system=_system_prompt(), user=user, temperature=0.3)
+    return await _llm_json(name="revise", system=_system_prompt(), user=user, temperature=TEMPERATURES["revise"], model=model)
 
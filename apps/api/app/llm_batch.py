@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from .config import get_settings
+from .llm import LLMError, SchemaName, json_request, openai_base_url, parse_json_output
+from .llm_usage import LLMUsage
+from .metrics import instrumented
+from .resilience import request
+
+
+# Batch statuses (OpenAI Batch API) that mean "not done yet".
+PENDING_STATUSES = frozenset({"validating", "in_progress", "finalizing", "cancelling"})
+
+
+class LLMBatchError(LLMError):
+    pass
+
+
+@dataclass
+class BatchResult:
+    text: str | None
+    usage: LLMUsage | None
+    error: str | None = None
+
+    def parse(self, name: SchemaName) -> dict[str, Any] | None:
+        """Schema-validated output, or None (missing/errored/invalid -> caller falls back to the sync path)."""
+        if self.text is None:
+            return None
+        try:
+            return parse_json_output(name, self.text)
+        except Exception:
+            return None
+
+
+def batch_line(*, custom_id: str, name: SchemaName, user: str, model: str) -> dict[str, Any]:
+    """One JSONL request line; same prompt, schema and temperature as the synchronous path.
+
+    `custom_id` is "<email_item_id>:<stage>"; results are matched back on it.
+    """
+    system, prompt, temperature = json_request(name, user)
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "temperature": temperature,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+        },
+    }
+
+
+def parse_batch_output(lines: list[dict[str, Any]]) -> dict[str, BatchResult]:
+    """Output/error file lines -> results by custom_id."""
+    out: dict[str, BatchResult] = {}
+    for line in lines:
+        custom_id = line.get("custom_id")
+        if not isinstance(custom_id, str):
+            continue
+        response = line.get("response") or {}
+        body = response.get("body") or {}
+        if line.get("error") or response.get("status_code", 200) >= 400:
+            out[custom_id] = BatchResult(text=None, usage=None, error=json.dumps(line.get("error") or body)[:500])
+            continue
+        usage = body.get("usage") or {}
+        text = ((body.get("choices") or [{}])[0].get("message") or {}).get("content") or ""
+        out[custom_id] = BatchResult(
+            text=text,
+            usage=LLMUsage(
+                stage=custom_id.rsplit(":", 1)[-1],
+                provider="openai",
+                model=str(body.get("model") or "unknown"),
+                prompt_tokens=int(usage.get("prompt_tokens") or 0),
+                completion_tokens=int(usage.get("completion_tokens") or 0),
+                cached_tokens=int((usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0),
+                batch=True,
+            ),
+        )
+    return out
+
+
+class OpenAIBatchClient:
+    """Minimal OpenAI Batch API client: upload JSONL, create the batch, poll, download results."""
+
+    def __init__(self) -> None:
+        settings = get_settings()
+        if not settings.openai_api_key:
+            raise LLMBatchError("Missing OPENAI_API_KEY")
+        self._base = openai_base_url()
+        self._headers = {"authorization": f"Bearer {settings.openai_api_key}"}
+
+    @instrumented("llm.batch_submit", provider="openai")
+    async def submit(self, lines: list[dict[str, Any]], *, metadata: dict[str, str] | None = None) -> str:
+        jsonl = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+        # A duplicate upload is harmless (an orphan file); a duplicate batch would be billed twice.
+        resp = await request(
+            "POST",
+            f"{self._base}/files",
+            service="openai",
+            idempotent=True,
+            headers=self._headers,
+            data={"purpose": "batch"},
+            files={"file": ("requests.jsonl", jsonl, "application/jsonl")},
+            timeout=120,
+        )
+        if resp.status_code >= 400:
+            raise LLMBatchError(f"Batch file upload failed: {resp.status_code} {resp.text}")
+        file_id = resp.json().get("id")
+
+        resp = await request(
+            "POST",
+            f"{self._base}/batches",
+            service="openai",
+            idempotent=False,
+            headers=self._headers,
+            json={
+                "input_file_id": file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h",
+                "metadata": metadata or {},
+            },
+        )
+        if resp.status_code >= 400:
+            raise LLMBatchError(f"Batch create failed: {resp.status_code} {resp.text}")
+        batch_id = resp.json().get("id")
+        if not batch_id:
+            raise LLMBatchError("Batch create returned no id")
+        return str(batch_id)
+
+    @instrumented("llm.batch_poll", provider="openai")
+    async def retrieve(self, batch_id: str) -> dict[str, Any]:
+        resp = await request("GET", f"{self._base}/batches/{batch_id}", service="openai", headers=self._headers)
+        if resp.status_code >= 400:
+            raise LLMBatchError(f"Batch retrieve failed: {resp.status_code} {resp.text}")
+        return resp.json()
+
+    @instrumented("llm.batch_download", provider="openai")
+    async def download(self, file_id: str) -> list[dict[str, Any]]:
+        resp = await request(
+            "GET", f"{self._base}/files/{file_id}/content", service="openai", headers=self._headers, timeout=120
+        )
+        if resp.status_code >= 400:
+            raise LLMBatchError(f"Batch output download failed: {resp.status_code} {resp.text}")
+        return [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+
+    async def results(self, batch: dict[str, Any]) -> dict[str, BatchResult]:
+        """Everything the provider produced for a finished batch (successes and per-request errors)."""
+        out: dict[str, BatchResult] = {}
+        for key in ("error_file_id", "output_file_id"):
+            file_id = batch.get(key)
+            if file_id:
+                out.update(parse_batch_output(await self.download(str(file_id))))
+        return out
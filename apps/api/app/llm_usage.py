@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Iterator
+
+from .config import get_settings
+from .metrics import LLM_COST, LLM_TOKENS
+from .supabase_rest import SupabaseRest, SupabaseRestError
+
+
+# USD per 1M tokens: (input, output). Matched by exact name, then longest prefix. Cached input
+# tokens are billed at CACHED_INPUT_DISCOUNT of the input price (both providers discount them).
+MODEL_PRICES_PER_MTOK: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+}
+CACHED_INPUT_DISCOUNT = 0.5
+# Batch API requests are billed at this fraction of the synchronous price.
+BATCH_DISCOUNT = 0.5
+
+
+@lru_cache(maxsize=1)
+def _prices() -> dict[str, tuple[float, float]]:
+    prices = dict(MODEL_PRICES_PER_MTOK)
+    raw = get_settings().llm_prices_json
+    if raw:
+        for model, pair in json.loads(raw).items():
+            prices[str(model)] = (float(pair[0]), float(pair[1]))
+    return prices
+
+
+def model_price(model: str) -> tuple[float, float] | None:
+    prices = _prices()
+    if model in prices:
+        return prices[model]
+    for name in sorted(prices, key=len, reverse=True):
+        if model.startswith(name):
+            return prices[name]
+    return None
+
+
+@dataclass
+class LLMUsage:
+    stage: str
+    provider: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    batch: bool = False
+
+    @property
+    def cost_usd(self) -> float:
+        price = model_price(self.model)
+        if price is None:
+            return 0.0
+        uncached = max(0, self.prompt_tokens - self.cached_tokens)
+        cost = (
+            uncached * price[0]
+            + self.cached_tokens * price[0] * CACHED_INPUT_DISCOUNT
+            + self.completion_tokens * price[1]
+        ) / 1_000_000
+        return cost * BATCH_DISCOUNT if self.batch else cost
+
+
+class UsageMeter:
+    """Aggregates LLM usage per (user, bucket, stage, provider, model) for one run.
+
+    `flush()` adds the totals onto the `llm_usage_daily` rollup with one RPC. `spent_usd()` covers
+    what this meter has seen so far, for budget checks mid-run.
+    """
+
+    def __init__(self, *, supabase: SupabaseRest) -> None:
+        self._supabase = supabase
+        self._rows: dict[tuple[str, str | None, str, str, str], dict[str, Any]] = {}
+        self._spent_by_user: dict[str, float] = {}
+
+    def add(self, usage: LLMUsage, *, user_id: str, bucket_id: str | None) -> None:
+        key = (user_id, bucket_id, usage.stage, usage.provider, usage.model)
+        row = self._rows.setdefault(
+            key,
+            {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost_usd": 0.0},
+        )
+        cost = usage.cost_usd
+        row["calls"] += 1
+        row["prompt_tokens"] += usage.prompt_tokens
+        row["completion_tokens"] += usage.completion_tokens
+        row["cached_tokens"] += usage.cached_tokens
+        row["cost_usd"] += cost
+        self._spent_by_user[user_id] = self._spent_by_user.get(user_id, 0.0) + cost
+
+    def spent_usd(self, user_id: str) -> float:
+        return self._spent_by_user.get(user_id, 0.0)
+
+    def totals(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        for row in self._rows.values():
+            for k in out:
+                out[k] += row[k]
+        out["cost_usd"] = round(out["cost_usd"], 6)
+        return out
+
+    async def flush(self) -> None:
+        """Best-effort: usage accounting must never fail a processing run."""
+        rows = self._rows
+        self._rows = {}
+        if not rows:
+            return
+        day = datetime.now(tz=timezone.utc).date().isoformat()
+        payload = [
+            {
+                "user_id": user_id,
+                "day": day,
+                "bucket_id": bucket_id,
+                "stage": stage,
+                "provider": provider,
+                "model": model,
+                **{**agg, "cost_usd": round(agg["cost_usd"], 6)},
+            }
+            for (user_id, bucket_id, stage, provider, model), agg in rows.items()
+        ]
+        try:
+            await self._supabase.rpc("record_llm_usage", {"p_rows": payload})
+        except SupabaseRestError:
+            pass
+
+
+class UsageScope:
+    def __init__(self, meter: UsageMeter, *, user_id: str, bucket_id: str | None) -> None:
+        self.meter = meter
+        self.user_id = user_id
+        self.bucket_id = bucket_id
+
+
+_scope: ContextVar[UsageScope | None] = ContextVar("llm_usage_scope", default=None)
+
+
+@contextmanager
+def usage_scope(meter: UsageMeter, *, user_id: str, bucket_id: str | None = None) -> Iterator[UsageScope]:
+    """Attribute LLM calls made inside the block to `user_id` (and `bucket_id`, which may be set later)."""
+    scope = UsageScope(meter, user_id=user_id, bucket_id=bucket_id)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def record_usage(usage: LLMUsage) -> None:
+    labels = {"stage": usage.stage, "provider": usage.provider, "model": usage.model}
+    LLM_TOKENS.inc(usage.prompt_tokens, kind="prompt", **labels)
+    LLM_TOKENS.inc(usage.completion_tokens, kind="completion", **labels)
+    LLM_TOKENS.inc(usage.cached_tokens, kind="cached", **labels)
+    LLM_COST.inc(usage.cost_usd, **labels)
+    scope = _scope.get()
+    if scope is not None:
+        scope.meter.add(usage, user_id=scope.user_id, bucket_id=scope.bucket_id)
+
+
+def daily_budget_usd(override: Any) -> float:
+    """Per-user budget from context_packs (if set), else the server default. 0 = unlimited."""
+    if override is not None:
+        try:
+            return max(0.0, float(override))
+        except (TypeError, ValueError):
+            pass
+    return max(0.0, get_settings().llm_daily_budget_usd)
+
+
+async def spent_today_usd(*, supabase: SupabaseRest, user_id: str) -> float:
+    day = datetime.now(tz=timezone.utc).date().isoformat()
+    rows = await supabase.select(
+        "llm_usage_daily",
+        columns="cost_usd",
+        filters={"user_id": f"eq.{user_id}", "day": f"eq.{day}"},
+        limit=1000,
+    )
+    return sum(float(r.get("cost_usd") or 0) for r in rows)
@@ -1,36 +1,87 @@
 from __future__ import annotations
 
+import asyncio
+import hmac
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, AsyncIterator
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Request
+import httpx
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response
 
 from .auth import require_user_id_from_authorization_header, require_user_id_from_oauth_state
+from .backfill import backfill_account, claim_backfills, start_backfill
 from .config import get_settings
+from .body_store import BodyStore, get_body_store
 from .crypto_utils import decrypt_text, encrypt_text
 from .gmail_client import (
     build_raw_reply,
-    extract_body_text,
-    get_message_full,
+    get_message_metadata,
     get_profile,
-    list_messages_page,
-    list_message_ids,
     parse_from_email,
-    parse_received_at,
     send_message,
     _extract_headers,
 )
-from .google_oauth import GMAIL_SCOPES, build_google_oauth_url, exchange_code_for_tokens, refresh_access_token
+from .http_pool import aclose_http_client
+from .ingestion import IngestionPipeline, inbox_query
+from .gmail_watch import PushSyncDebouncer, decode_push, register_watch, renew_watches
+from .google_oauth import (
+    GMAIL_SCOPES,
+    build_google_oauth_url,
+    call_with_access_token,
+    exchange_code_for_tokens,
+    invalidate_access_token,
+    refresh_access_token,
+)
+from .tracing import get_exporter, start_span
+from .metrics import PUSH_NOTIFICATIONS, REGISTRY, begin_stage_timings, stage_timings_ms
 from .llm import ContextPack, LLMError, revise_draft as llm_revise_draft
-from .models import ReviseRequest, ReviseResponse, SendReplyRequest, SendReplyResponse
+from .llm_usage import UsageMeter, usage_scope
+from .model_routing import check_model_settings, stage_model
+from .inbox import fetch_inbox_counts, fetch_inbox_page
+from .models import (
+    EmailBodyResponse,
+    InboxCounts,
+    InboxItem,
+    InboxPageResponse,
+    InboxView,
+    ReviseRequest,
+    ReviseResponse,
+    SendReplyRequest,
+    SendReplyResponse,
+)
 from .buckets import ensure_default_buckets, ensure_default_context_pack
-from .processing import process_ingested_for_account
+from .poll_runs import ManualPolls, create_run, find_running_run, summarize_run
+from .poll_schedule import (
+    SHARD_SPACE,
+    claim_due_accounts,
+    lease_account,
+    poll_owner,
+    release_lease,
+    schedule_after_poll,
+    worker_id,
+)
+from .push_dispatch import PushDispatcher
 from .supabase_rest import SupabaseRest, SupabaseRestError
 
 
-app = FastAPI(title="Inbox Copilot API")
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    check_model_settings()
+    yield
+    await push_syncs.aclose()
+    await manual_polls.aclose()
+    await aclose_http_client()
+    exporter = get_exporter()
+    if exporter is not None:
+        await asyncio.to_thread(exporter.flush)
+
+
+app = FastAPI(title="Inbox Copilot API", lifespan=lifespan)
 
 settings = get_settings()
 app.add_middleware(
@@ -51,6 +102,18 @@ async def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(
+    authorization: str | None = Header(default=None, alias="Authorization"),
+) -> PlainTextResponse:
+    """Prometheus text exposition of per-stage call latency, in-flight calls and errors."""
+
+    settings = get_settings()
+    if settings.metrics_token and authorization != f"Bearer {settings.metrics_token}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post("/setup/bootstrap")
 async def setup_bootstrap(
     authorization: str | None = Header(default=None, alias="Authorization"),
@@ -102,7 +165,7 @@ async def oauth_google_callback(code: str, state: str, supabase: SupabaseRest =
         else:
             scopes = GMAIL_SCOPES
 
-        await supabase.insert(
+        connected = await supabase.insert(
             "gmail_accounts",
             {
                 "user_id": user_id,
@@ -111,11 +174,22 @@ async def oauth_google_callback(code: str, state: str, supabase: SupabaseRest =
                 "scopes": scopes,
                 "status": "active",
                 "error_message": None,
+                "next_poll_at": datetime.now(tz=timezone.utc).isoformat(),
             },
             upsert=True,
             on_conflict="user_id,google_email",
         )
 
+        # Older mail arrives through /cron/backfill, behind live polling.
+        if connected:
+            await start_backfill(supabase=supabase, acc=connected[0], now=datetime.now(tz=timezone.utc))
+
+        # Push notifications from now on; if this fails the cron retries it (and polls meanwhile).
+        if settings.gmail_pubsub_topic and connected:
+            try:
+                await register_watch(supabase=supabase, acc=connected[0], access_token=token_res.access_token)
+            except Exception:
+                pass
 
         # Initialize defaults on first connect (buckets + context).
         await ensure_default_context_pack(supabase=supabase, user_id=user_id)
@@ -128,71 +202,68 @@ async def oauth_google_callback(code: str, state: str, supabase: SupabaseRest =
     return RedirectResponse(url=dest, status_code=302)
 
 
+ACCOUNT_COLUMNS = (
+    "id,user_id,google_email,refresh_token_encrypted,last_polled_at,status,arrival_rate_per_h,watch_expires_at"
+)
 
 
-@app.post("/poll/now")
-async def poll_now(
-    authorization: str | None = Header(default=None, alias="Authorization"),
-    supabase: SupabaseRest = Depends(get_supabase),
+async def _poll_account(
+    *,
+    supabase: SupabaseRest,
+    acc: dict[str, Any],
+    now: datetime,
+    trigger: str,
+    push_dispatcher: PushDispatcher | None,
+    body_store: BodyStore,
+    run_row_id: str | None = None,
+    lease_owner: str | None = None,
 ) -> dict[str, Any]:
-    """Manually trigger a poll for the signed-in user (no cron secret needed)."""
+    """Incremental poll of one account (mail since `last_polled_at`): ingest, then process it.
 
-    try:
-        user_id = await require_user_id_from_authorization_header(authorization)
-    except PermissionError as e:
-        raise HTTPException(status_code=401, detail=str(e)) from e
-
-    # Load active Gmail accounts for this user.
-    try:
-        accounts = await supabase.select(
-            "gmail_accounts",
-            columns="id,user_id,google_email,refresh_token_encrypted,last_polled_at,status",
-            filters={"user_id": f"eq.{user_id}", "status": "eq.active"},
-            limit=20,
-        )
-    except SupabaseRestError as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+    With `run_row_id` (a `running` processing_runs row created by /poll/now) progress is written to
+    that row as the poll advances and the row is completed at the end; otherwise a row is inserted.
+    Without `push_dispatcher`, pushes are sent when the account's processing finishes.
 
-    now = datetime.now(tz=timezone.utc)
-    total_new = 0
-    per_account: list[dict[str, Any]] = []
+    `lease_owner` is the cron worker that already leased the account. Other triggers lease it here
+    and skip it (`skipped`) while another poll holds it. Only our own lease is released, and only
+    once the account's next poll is scheduled.
+    """
+    gmail_account_id = acc["id"]
+    user_id = acc["user_id"]
 
-    for acc in accounts:
-        gmail_account_id = acc["id"]
+    if lease_owner is None:
+        lease_owner = poll_owner(trigger)
+        try:
+            leased = await lease_account(supabase=supabase, gmail_account_id=gmail_account_id, owner=lease_owner)
+        except SupabaseRestError as e:
+            leased, lease_error = False, str(e)
+        else:
+            lease_error = None
+        if not leased:
+            return await _skip_leased_account(
+                supabase=supabase, acc=acc, trigger=trigger, run_row_id=run_row_id, error=lease_error
+            )
 
+    with start_span(
+        "poll.account",
+        attributes={"gmail_account_id": gmail_account_id, "user_id": user_id, "trigger": trigger},
+    ) as account_span:
         started_at = datetime.now(tz=timezone.utc)
-        inserted = 0
+        timings = begin_stage_timings()
+        fetched = inserted = known = 0
         processed_counts: dict[str, Any] = {}
         errors: list[str] = []
+        failed = False
+        scheduled = False
 
-        # Small throttle to avoid rapid double-clicks hammering Gmail.
-        last_polled_at = acc.get("last_polled_at")
-        try:
-            last_dt = datetime.fromisoformat(last_polled_at.replace("Z", "+00:00")) if last_polled_at else None
-        except Exception:
-            last_dt = None
-
-        if last_dt and (now - last_dt).total_seconds() < 10:
-            per_account.append(
-                {
-                    "gmail_account_id": gmail_account_id,
-                    "user_id": user_id,
-                    "new": 0,
-                    "processed": 0,
-                    "relevant": 0,
-                    "pushed": 0,
-                    "failed": 0,
-                    "skipped": True,
-                    "skip_reason": "throttled",
-                    "errors": [],
-                }
-            )
-            continue
+        async def report(counts: dict[str, Any]) -> None:
+            await supabase.update("processing_runs", {"counts": counts}, filters={"id": f"eq.{run_row_id}"})
 
         try:
             refresh_token = decrypt_text(acc["refresh_token_encrypted"])
             access_token = await refresh_access_token(refresh_token=refresh_token)
 
+            last_polled_at = acc.get("last_polled_at")
             if last_polled_at:
                 try:
                     after_dt = datetime.fromisoformat(last_polled_at.replace("Z", "+00:00"))
@@ -201,307 +272,506 @@ async def poll_now(
             else:
                 after_dt = now - timedelta(hours=1)
 
-            q = " ".join(
-                [
-                    "in:inbox",
-                    f"after:{int(after_dt.timestamp())}",
-                    "-category:social",
-                    "-category:forums",
-                ]
+            q = inbox_query(after=after_dt)
+            pipeline = IngestionPipeline(
+                supabase=supabase,
+                body_store=body_store,
+                push_dispatcher=push_dispatcher,
+                acc=acc,
+                access_token=access_token,
+                now=now,
+                progress=report if run_row_id else None,
             )
-            page_token: str | None = None
-            fetched = 0
-            max_fetch = 200
-
-            while True:
-                page, page_token = await list_messages_page(
-                    access_token=access_token,
-                    query=q,
-                    max_results=50,
-                    page_token=page_token,
-                )
-                if not page:
-                    break
-
-                for msg in page:
-                    message_id = msg.get("id")
-                    if not message_id:
-                        continue
-
-                    full = await get_message_full(access_token=access_token, message_id=message_id)
-                    headers = _extract_headers(full)
-                    from_email = parse_from_email(headers.get("from"))
-                    subject = headers.get("subject")
-                    snippet = full.get("snippet")
-                    received_at_dt = parse_received_at(full)
-                    body_text = extract_body_text(full)
-
-                    row = {
-                        "user_id": user_id,
-                        "gmail_account_id": gmail_account_id,
-                        "gmail_message_id": full.get("id"),
-                        "thread_id": full.get("threadId"),
-                        "from_email": from_email,
-                        "subject": subject,
-                        "snippet": snippet,
-                        "body_text": body_text,
-                        "received_at": (received_at_dt or now).isoformat(),
-                        "status": "ingested",
-                    }
-
-                    try:
-                        res = await supabase.insert(
-                            "email_items",
-                            row,
-                            upsert=True,
-                            ignore_duplicates=True,
-                            on_conflict="gmail_account_id,gmail_message_id",
-                        )
-                        inserted += len(res) if isinstance(res, list) else 0
-                    except SupabaseRestError as e:
-                        errors.append(str(e))
-
-                fetched += len(page)
-                if not page_token or fetched >= max_fetch:
-                    break
-
-            # Process any newly ingested items (AI + push). Best-effort.
             try:
-                proc = await process_ingested_for_account(
-                    supabase=supabase,
-                    user_id=user_id,
-                    gmail_account_id=gmail_account_id,
-                    max_items=25,
-                )
-                processed_counts = proc.get("counts") or {}
-                errors.extend(proc.get("errors") or [])
-            except Exception as e:
-                errors.append(f"processing error: {e}")
+                await pipeline.run(q)
+            finally:
+                fetched, inserted, known = pipeline.fetched, pipeline.inserted, pipeline.known
+                processed_counts = pipeline.processed_counts
+                errors.extend(pipeline.errors)
 
+            schedule = await schedule_after_poll(supabase=supabase, acc=acc, now=now, arrived=inserted, ok=True)
             await supabase.update(
                 "gmail_accounts",
-                {"last_polled_at": now.isoformat(), "error_message": None},
+                {"last_polled_at": now.isoformat(), "error_message": None, **schedule},
                 filters={"id": f"eq.{gmail_account_id}"},
             )
+            scheduled = True
         except Exception as e:
             errors.append(str(e))
+            failed = True
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+                invalidate_access_token(refresh_token=decrypt_text(acc["refresh_token_encrypted"]))
             try:
+                schedule = await schedule_after_poll(supabase=supabase, acc=acc, now=now, arrived=inserted, ok=False)
                 await supabase.update(
                     "gmail_accounts",
-                    {"status": "active", "error_message": str(e)},
+                    {"status": "active", "error_message": str(e), **schedule},
                     filters={"id": f"eq.{gmail_account_id}"},
                 )
+                scheduled = True
+            except Exception:
+                pass
+        # Without a new next_poll_at the account is still due: keep the lease (it expires after
+        # POLL_LEASE_S) so it isn't claimed and polled again straight away.
+        if scheduled:
+            try:
+                await release_lease(supabase=supabase, gmail_account_id=gmail_account_id, owner=lease_owner)
             except Exception:
+                # It expires after POLL_LEASE_S anyway.
                 pass
 
         finished_at = datetime.now(tz=timezone.utc)
+        run = {
+            "finished_at": finished_at.isoformat(),
+            "status": "failed" if failed else "done",
+            "counts": {
+                "fetched": fetched,
+                "inserted": inserted,
+                "known": known,
+                **(processed_counts or {}),
+                "timings_ms": stage_timings_ms(timings),
+            },
+            "log_json": {"errors": errors},
+        }
         try:
-            await supabase.insert(
+            if run_row_id:
+                await supabase.update("processing_runs", run, filters={"id": f"eq.{run_row_id}"})
+            else:
+                await supabase.insert(
+                    "processing_runs",
+                    {
+                        "user_id": user_id,
+                        "gmail_account_id": gmail_account_id,
+                        "started_at": started_at.isoformat(),
+                        "trigger": trigger,
+                        **run,
+                    },
+                )
+        except Exception:
+            pass
+
+        account_span.set_attributes(**{"poll.inserted": inserted, "poll.errors": len(errors)})
+
+    return {
+        "gmail_account_id": gmail_account_id,
+        "user_id": user_id,
+        "new": inserted,
+        "processed": processed_counts.get("processed", 0) if processed_counts else 0,
+        "relevant": processed_counts.get("relevant", 0) if processed_counts else 0,
+        "push_queued": processed_counts.get("push_queued", 0) if processed_counts else 0,
+        "failed": processed_counts.get("failed", 0) if processed_counts else 0,
+        # The poll itself (token, Gmail, storage) failed, as opposed to some items' processing.
+        "poll_failed": failed,
+        "errors": errors,
+    }
+
+
+async def _skip_leased_account(
+    *, supabase: SupabaseRest, acc: dict[str, Any], trigger: str, run_row_id: str | None, error: str | None
+) -> dict[str, Any]:
+    """Result for an account another poll is working on; completes its /poll/now row if any."""
+    if run_row_id:
+        try:
+            await supabase.update(
                 "processing_runs",
                 {
-                    "user_id": user_id,
-                    "gmail_account_id": gmail_account_id,
-                    "started_at": started_at.isoformat(),
-                    "finished_at": finished_at.isoformat(),
-                    "counts": {"inserted": inserted, **(processed_counts or {})},
-                    "log_json": {"errors": errors},
+                    "finished_at": datetime.now(tz=timezone.utc).isoformat(),
+                    "status": "failed" if error else "done",
+                    "counts": {},
+                    "log_json": {"errors": [error] if error else [], "skipped": "leased"},
                 },
+                filters={"id": f"eq.{run_row_id}"},
             )
         except Exception:
             pass
+    return {
+        "gmail_account_id": acc["id"],
+        "user_id": acc["user_id"],
+        "new": 0,
+        "processed": 0,
+        "relevant": 0,
+        "push_queued": 0,
+        "failed": 0,
+        "poll_failed": error is not None,
+        "errors": [error] if error else [],
+        "skipped": True,
+    }
+
+
+async def _run_manual_poll(*, accounts: list[dict[str, Any]], run_rows: dict[str, str]) -> None:
+    supabase = SupabaseRest()
+    body_store = get_body_store(supabase=supabase)
+    for acc in accounts:
+        await _poll_account(
+            supabase=supabase,
+            acc=acc,
+            now=datetime.now(tz=timezone.utc),
+            trigger="manual",
+            push_dispatcher=None,
+            body_store=body_store,
+            run_row_id=run_rows.get(acc["id"]),
+        )
 
-        total_new += inserted
-        per_account.append(
-            {
-                "gmail_account_id": gmail_account_id,
-                "user_id": user_id,
-                "new": inserted,
-                "processed": processed_counts.get("processed", 0) if processed_counts else 0,
-                "relevant": processed_counts.get("relevant", 0) if processed_counts else 0,
-                "pushed": processed_counts.get("pushed", 0) if processed_counts else 0,
-                "failed": processed_counts.get("failed", 0) if processed_counts else 0,
-                "skipped": False,
-                "errors": errors,
-            }
+
+manual_polls = ManualPolls()
+
+
+@app.post("/poll/now", status_code=202)
+async def poll_now(
+    authorization: str | None = Header(default=None, alias="Authorization"),
+    supabase: SupabaseRest = Depends(get_supabase),
+) -> dict[str, Any]:
+    """Manually trigger a poll for the signed-in user (no cron secret needed).
+
+    Returns a `run_id` right away and polls in the background; follow it on GET /poll/runs/{run_id}.
+    A click while the user's previous poll is still running joins that run (`coalesced`).
+    """
+
+    try:
+        user_id = await require_user_id_from_authorization_header(authorization)
+    except PermissionError as e:
+        raise HTTPException(status_code=401, detail=str(e)) from e
+
+    claimed, in_flight = manual_polls.claim(user_id)
+    if not claimed:
+        return {"ok": True, "run_id": in_flight, "status": "running", "coalesced": True}
+
+    try:
+        now = datetime.now(tz=timezone.utc)
+        # Another replica may be polling for this user already.
+        in_flight = await find_running_run(supabase=supabase, user_id=user_id, now=now)
+        if in_flight:
+            manual_polls.release(user_id)
+            return {"ok": True, "run_id": in_flight, "status": "running", "coalesced": True}
+
+        accounts = await supabase.select(
+            "gmail_accounts",
+            columns=ACCOUNT_COLUMNS,
+            filters={"user_id": f"eq.{user_id}", "status": "eq.active"},
+            limit=20,
         )
 
-    return {"ok": True, "total_new": total_new, "per_account": per_account}
+        # Small throttle to avoid rapid double-clicks hammering Gmail.
+        due: list[dict[str, Any]] = []
+        for acc in accounts:
+            last_polled_at = acc.get("last_polled_at")
+            try:
+                last_dt = datetime.fromisoformat(last_polled_at.replace("Z", "+00:00")) if last_polled_at else None
+            except Exception:
+                last_dt = None
+            if not (last_dt and (now - last_dt).total_seconds() < 10):
+                due.append(acc)
+
+        if not due:
+            manual_polls.release(user_id)
+            return {
+                "ok": True,
+                "run_id": None,
+                "status": "throttled" if accounts else "done",
+                "accounts": 0,
+                "skipped": len(accounts),
+                "coalesced": False,
+            }
+
+        run_id, run_rows = await create_run(supabase=supabase, user_id=user_id, accounts=due, now=now)
+    except SupabaseRestError as e:
+        manual_polls.release(user_id)
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    except BaseException:
+        manual_polls.release(user_id)
+        raise
+
+    manual_polls.start(user_id, run_id, _run_manual_poll(accounts=due, run_rows=run_rows))
+    return {
+        "ok": True,
+        "run_id": run_id,
+        "status": "running",
+        "accounts": len(due),
+        "skipped": len(accounts) - len(due),
+        "coalesced": False,
+    }
+
+
+@app.get("/poll/runs/{run_id}")
+async def poll_run_progress(
+    run_id: uuid.UUID,
+    authorization: str | None = Header(default=None, alias="Authorization"),
+    supabase: SupabaseRest = Depends(get_supabase),
+) -> dict[str, Any]:
+    """Progress of a /poll/now run: status (running|done|failed) and fetched/inserted/processed/pushed."""
+    try:
+        user_id = await require_user_id_from_authorization_header(authorization)
+    except PermissionError as e:
+        raise HTTPException(status_code=401, detail=str(e)) from e
+
+    try:
+        rows = await supabase.select(
+            "processing_runs",
+            columns="gmail_account_id,status,started_at,finished_at,counts",
+            filters={"run_id": f"eq.{run_id}", "user_id": f"eq.{user_id}"},
+            limit=20,
+        )
+    except SupabaseRestError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if not rows:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return summarize_run(str(run_id), rows, now=datetime.now(tz=timezone.utc))
 
 
 @app.post("/cron/poll-gmail")
 async def cron_poll_gmail(
     request: Request,
+    shard: int = Query(default=0, ge=0),
+    shards: int = Query(default=1, ge=1, le=SHARD_SPACE),
     x_cron_secret: str | None = Header(default=None, alias="X-CRON-SECRET"),
     supabase: SupabaseRest = Depends(get_supabase),
 ) -> dict[str, Any]:
+    """Poll the due accounts of one shard (`?shard=i&shards=n`; default: everything).
+
+    Replicas lease accounts before polling them, so overlapping or repeated ticks never poll an
+    account twice. Claims repeat in batches until nothing is due or CRON_TIME_BUDGET_S is spent.
+    """
     settings = get_settings()
     if not settings.cron_secret:
         raise HTTPException(status_code=500, detail="Server missing CRON_SECRET")
     if x_cron_secret != settings.cron_secret:
         raise HTTPException(status_code=401, detail="Unauthorized")
+    if shard >= shards:
+        raise HTTPException(status_code=400, detail="shard must be less than shards")
 
-    # Load active accounts
-    try:
-        accounts = await supabase.select(
-            "gmail_accounts",
-            columns="id,user_id,google_email,refresh_token_encrypted,last_polled_at,status",
-            filters={"status": "eq.active"},
-            limit=200,
-        )
-    except SupabaseRestError as e:
-        raise HTTPException(status_code=500, detail=str(e)) from e
+    # Keep Gmail watches alive (once per tick, not per shard); with push enabled scheduled polling
+    # is the safety net for anything a notification missed.
+    watches: dict[str, Any] = {"renewed": 0, "failed": 0}
+    if shard == 0:
+        try:
+            watches = await renew_watches(supabase=supabase)
+        except Exception as e:
+            watches = {"renewed": 0, "failed": 0, "error": str(e)}
 
-    now = datetime.now(tz=timezone.utc)
     total_new = 0
     per_account: list[dict[str, Any]] = []
+    push_dispatcher = PushDispatcher(supabase=supabase)
+    body_store = get_body_store(supabase=supabase)
+    owner = worker_id(shard, shards)
+    limiter = asyncio.Semaphore(max(1, settings.cron_account_concurrency))
+    deadline = time.monotonic() + settings.cron_time_budget_s
+
+    async def poll(acc: dict[str, Any]) -> dict[str, Any]:
+        async with limiter:
+            return await _poll_account(
+                supabase=supabase,
+                acc=acc,
+                now=datetime.now(tz=timezone.utc),
+                trigger="cron",
+                push_dispatcher=push_dispatcher,
+                body_store=body_store,
+                lease_owner=owner,
+            )
 
-    for acc in accounts:
-        gmail_account_id = acc["id"]
-        user_id = acc["user_id"]
-
-        started_at = datetime.now(tz=timezone.utc)
-        inserted = 0
-        processed_counts: dict[str, Any] = {}
-        errors: list[str] = []
-
+    claimed = 0
+    polled: set[str] = set()
+    while time.monotonic() < deadline:
         try:
-            refresh_token = decrypt_text(acc["refresh_token_encrypted"])
-            access_token = await refresh_access_token(refresh_token=refresh_token)
+            batch = await claim_due_accounts(
+                supabase=supabase, shard=shard, shards=shards, limit=settings.cron_batch_size, owner=owner
+            )
+        except SupabaseRestError as e:
+            if not claimed:
+                raise HTTPException(status_code=500, detail=str(e)) from e
+            break
+        # An account polled earlier in this tick can come back if its lease was released while it
+        # is still due; it keeps our lease and waits for a later tick.
+        batch = [acc for acc in batch if acc["id"] not in polled]
+        if not batch:
+            break
+        polled.update(acc["id"] for acc in batch)
+        claimed += len(batch)
+        for result in await asyncio.gather(*(poll(acc) for acc in batch)):
+            total_new += result["new"]
+            per_account.append(result)
+
+    pushed = await push_dispatcher.flush()
+    return {
+        "ok": True,
+        "shard": f"{shard}/{shards}",
+        "due": claimed,
+        "total_new": total_new,
+        "pushed": pushed,
+        "watches": watches,
+        "per_account": per_account,
+    }
+
+
+@app.post("/cron/backfill")
+async def cron_backfill(
+    x_cron_secret: str | None = Header(default=None, alias="X-CRON-SECRET"),
+    supabase: SupabaseRest = Depends(get_supabase),
+) -> dict[str, Any]:
+    """Advance pending history backfills within CRON_TIME_BUDGET_S (schedule it like the poll cron).
 
-            last_polled_at = acc.get("last_polled_at")
-            if last_polled_at:
-                try:
-                    after_dt = datetime.fromisoformat(last_polled_at.replace("Z", "+00:00"))
-                except Exception:
-                    after_dt = now - timedelta(hours=1)
-            else:
-                after_dt = now - timedelta(hours=1)
+    Each account resumes from its checkpointed page token; accounts are leased, so overlapping ticks
+    never run the same backfill twice.
+    """
+    settings = get_settings()
+    if not settings.cron_secret:
+        raise HTTPException(status_code=500, detail="Server missing CRON_SECRET")
+    if x_cron_secret != settings.cron_secret:
+        raise HTTPException(status_code=401, detail="Unauthorized")
 
-            q = " ".join(
-                [
-                    "in:inbox",
-                    f"after:{int(after_dt.timestamp())}",
-                    "-category:social",
-                    "-category:forums",
-                ]
-            )
-            page_token: str | None = None
-            fetched = 0
-            max_fetch = 200
-
-            while True:
-                page, page_token = await list_messages_page(
-                    access_token=access_token,
-                    query=q,
-                    max_results=50,
-                    page_token=page_token,
-                )
-                if not page:
-                    break
-
-                for msg in page:
-                    message_id = msg.get("id")
-                    if not message_id:
-                        continue
-
-                    full = await get_message_full(access_token=access_token, message_id=message_id)
-                    headers = _extract_headers(full)
-                    from_email = parse_from_email(headers.get("from"))
-                    subject = headers.get("subject")
-                    snippet = full.get("snippet")
-                    received_at_dt = parse_received_at(full)
-                    body_text = extract_body_text(full)
-
-                    row = {
-                        "user_id": user_id,
-                        "gmail_account_id": gmail_account_id,
-                        "gmail_message_id": full.get("id"),
-                        "thread_id": full.get("threadId"),
-                        "from_email": from_email,
-                        "subject": subject,
-                        "snippet": snippet,
-                        "body_text": body_text,
-                        "received_at": (received_at_dt or now).isoformat(),
-                        "status": "ingested",
-                    }
-
-                    try:
-                        res = await supabase.insert(
-                            "email_items",
-                            row,
-                            upsert=True,
-                            ignore_duplicates=True,
-                            on_conflict="gmail_account_id,gmail_message_id",
-                        )
-                        inserted += len(res) if isinstance(res, list) else 0
-                    except SupabaseRestError as e:
-                        # likely unique conflict or schema issue; record and continue
-                        errors.append(str(e))
-
-                fetched += len(page)
-                if not page_token or fetched >= max_fetch:
-                    break
-
-            # Process any newly ingested items (AI + push). Best-effort.
-            try:
-                proc = await process_ingested_for_account(
-                    supabase=supabase,
-                    user_id=user_id,
-                    gmail_account_id=gmail_account_id,
-                    max_items=25,
-                )
-                processed_counts = proc.get("counts") or {}
-                errors.extend(proc.get("errors") or [])
-            except Exception as e:
-                errors.append(f"processing error: {e}")
+    deadline = time.monotonic() + settings.cron_time_budget_s
+    try:
+        accounts = await claim_backfills(
+            supabase=supabase, now=datetime.now(tz=timezone.utc), limit=settings.cron_batch_size
+        )
+    except SupabaseRestError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
-            await supabase.update(
-                "gmail_accounts",
-                {"last_polled_at": now.isoformat(), "error_message": None},
-                filters={"id": f"eq.{gmail_account_id}"},
-            )
-        except Exception as e:
-            errors.append(str(e))
+    body_store = get_body_store(supabase=supabase)
+    per_account: list[dict[str, Any]] = []
+    for acc in accounts:
+        if time.monotonic() >= deadline:
+            # Claimed but not started: hand it back for the next tick (else the lease just expires).
             try:
                 await supabase.update(
                     "gmail_accounts",
-                    {"status": "active", "error_message": str(e)},
-                    filters={"id": f"eq.{gmail_account_id}"},
+                    {"backfill_next_at": datetime.now(tz=timezone.utc).isoformat()},
+                    filters={"id": f"eq.{acc['id']}"},
                 )
             except Exception:
                 pass
-
-        finished_at = datetime.now(tz=timezone.utc)
-        try:
-            await supabase.insert(
-                "processing_runs",
-                {
-                    "user_id": user_id,
-                    "gmail_account_id": gmail_account_id,
-                    "started_at": started_at.isoformat(),
-                    "finished_at": finished_at.isoformat(),
-                    "counts": {"inserted": inserted, **(processed_counts or {})},
-                    "log_json": {"errors": errors},
-                },
+            continue
+        per_account.append(
+            await backfill_account(supabase=supabase, body_store=body_store, acc=acc, deadline=deadline)
+        )
+    return {"ok": True, "claimed": len(accounts), "per_account": per_account}
+
+
+async def _sync_pushed_mailbox(email_address: str, history_id: int) -> None:
+    """Targeted incremental poll for the account(s) behind one Gmail notification."""
+    supabase = SupabaseRest()
+    accounts = await supabase.select(
+        "gmail_accounts",
+        columns=ACCOUNT_COLUMNS + ",watch_history_id",
+        filters={"google_email": f"eq.{email_address}", "status": "eq.active"},
+        limit=20,
+    )
+    push_dispatcher = PushDispatcher(supabase=supabase)
+    body_store = get_body_store(supabase=supabase)
+    for acc in accounts:
+        # Pub/Sub delivers at least once and other replicas may have synced already.
+        synced = acc.get("watch_history_id")
+        if synced is not None and int(synced) >= history_id:
+            PUSH_NOTIFICATIONS.inc(outcome="stale")
+            continue
+        result = await _poll_account(
+            supabase=supabase,
+            acc=acc,
+            now=datetime.now(tz=timezone.utc),
+            trigger="push",
+            push_dispatcher=push_dispatcher,
+            body_store=body_store,
+        )
+        # A skipped account is mid-poll elsewhere; that poll may predate this notification. Errors
+        # from processing single items don't hold the watch back: the mail itself is stored.
+        if not result["poll_failed"] and not result.get("skipped"):
+            await supabase.update(
+                "gmail_accounts", {"watch_history_id": history_id}, filters={"id": f"eq.{acc['id']}"}
             )
-        except Exception:
-            pass
+    await push_dispatcher.flush()
 
-        total_new += inserted
-        per_account.append(
-            {
-                "gmail_account_id": gmail_account_id,
-                "user_id": user_id,
-                "new": inserted,
-                "processed": processed_counts.get("processed", 0) if processed_counts else 0,
-                "relevant": processed_counts.get("relevant", 0) if processed_counts else 0,
-                "pushed": processed_counts.get("pushed", 0) if processed_counts else 0,
-                "failed": processed_counts.get("failed", 0) if processed_counts else 0,
-                "errors": errors,
-            }
+
+push_syncs = PushSyncDebouncer(run=_sync_pushed_mailbox)
+
+
+@app.post("/webhooks/gmail", status_code=204)
+async def gmail_push_webhook(request: Request, token: str | None = None) -> Response:
+    """Pub/Sub push endpoint for Gmail watch notifications (`?token=` must match GMAIL_PUSH_TOKEN).
+
+    Acknowledges immediately and schedules a debounced sync of just that mailbox. Malformed messages
+    are acknowledged too, since Pub/Sub would otherwise redeliver them until they expire.
+    """
+    settings = get_settings()
+    if not settings.gmail_push_token:
+        raise HTTPException(status_code=500, detail="Server missing GMAIL_PUSH_TOKEN")
+    if not token or not hmac.compare_digest(token, settings.gmail_push_token):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    try:
+        notification = decode_push(await request.json())
+    except ValueError:
+        PUSH_NOTIFICATIONS.inc(outcome="invalid")
+        return Response(status_code=204)
+
+    push_syncs.notify(notification.email_address, notification.history_id)
+    return Response(status_code=204)
+
+
+@app.get("/inbox", response_model=InboxPageResponse)
+async def inbox_page(
+    view: InboxView = "needs_review",
+    bucket_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    include_counts: bool = True,
+    authorization: str | None = Header(default=None),
+    supabase: SupabaseRest = Depends(get_supabase),
+) -> InboxPageResponse:
+    """Keyset-paginated inbox (newest first). Pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        user_id = await require_user_id_from_authorization_header(authorization)
+    except PermissionError as e:
+        raise HTTPException(status_code=401, detail=str(e)) from e
+
+    try:
+        rows, next_cursor = await fetch_inbox_page(
+            supabase=supabase,
+            user_id=user_id,
+            view=view,
+            bucket_id=bucket_id,
+            cursor=cursor,
+            limit=limit,
         )
+        counts = await fetch_inbox_counts(supabase=supabase, user_id=user_id, view=view) if include_counts else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except SupabaseRestError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
-    return {"ok": True, "total_new": total_new, "per_account": per_account}
+    return InboxPageResponse(
+        items=[InboxItem(**r) for r in rows],
+        next_cursor=next_cursor,
+        counts=InboxCounts(**counts) if counts else None,
+    )
+
+
+@app.get("/email-items/{email_item_id}/body", response_model=EmailBodyResponse)
+async def email_item_body(
+    email_item_id: str,
+    authorization: str | None = Header(default=None),
+    supabase: SupabaseRest = Depends(get_supabase),
+) -> EmailBodyResponse:
+    try:
+        user_id = await require_user_id_from_authorization_header(authorization)
+    except PermissionError as e:
+        raise HTTPException(status_code=401, detail=str(e)) from e
+
+    try:
+        items = await supabase.select(
+            "email_items",
+            columns="id,body_hash,body_text",
+            filters={"id": f"eq.{email_item_id}", "user_id": f"eq.{user_id}"},
+            limit=1,
+        )
+        if not items:
+            raise HTTPException(status_code=404, detail="Email item not found")
+        item = items[0]
+        body_text = item.get("body_text")
+        if body_text is None and item.get("body_hash"):
+            body_text = await get_body_store(supabase=supabase).get(item["body_hash"])
+    except SupabaseRestError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    return EmailBodyResponse(body_text=body_text or "")
 
 
 @app.post("/ai/revise", response_model=ReviseResponse)
@@ -526,13 +796,23 @@ async def ai_revise(
     try:
         owned = await supabase.select(
             "email_items",
-            columns="id",
+            columns="id,bucket_id",
             filters={"id": f"eq.{body.email_item_id}", "user_id": f"eq.{user_id}"},
             limit=1,
         )
         if not owned:
             raise HTTPException(status_code=404, detail="Email item not found")
 
+        bucket_actions: dict[str, Any] = {}
+        if owned[0].get("bucket_id"):
+            bucket_rows = await supabase.select(
+                "email_buckets",
+                columns="actions",
+                filters={"id": f"eq.{owned[0]['bucket_id']}"},
+                limit=1,
+            )
+            bucket_actions = (bucket_rows[0].get("actions") if bucket_rows else None) or {}
+
         ctx_rows = await supabase.select(
             "context_packs",
             columns="brand_name,brand_blurb,products_info_json,policies_json,tone,signature,keywords_array",
@@ -554,36 +834,32 @@ async def ai_revise(
     except SupabaseRestError as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+    # Revisions are an explicit user action: accounted for, but not subject to the daily budget.
+    meter = UsageMeter(supabase=supabase)
     try:
-        res = await llm_revise_draft(
-            ctx=ctx,
-            current_draft_text=body.current_draft_text,
-            instruction=body.instruction,
-        )
+        with usage_scope(meter, user_id=user_id, bucket_id=owned[0].get("bucket_id")):
+            res = await llm_revise_draft(
+                ctx=ctx,
+                current_draft_text=body.current_draft_text,
+                instruction=body.instruction,
+                model=stage_model("revise", actions=bucket_actions),
+            )
         revised = str(res.get("revised_draft") or "").strip()
         if not revised:
             raise HTTPException(status_code=500, detail="LLM returned empty revised draft")
     except LLMError as e:
         raise HTTPException(status_code=502, detail=str(e)) from e
+    finally:
+        await meter.flush()
 
     # Store as a new draft version
     try:
-        existing = await supabase.select(
-            "reply_drafts",
-            columns="version",
-            filters={"email_item_id": f"eq.{body.email_item_id}"},
-            order="version.desc",
-            limit=1,
-        )
-        next_version = (existing[0]["version"] if existing else 0) + 1
-
-        await supabase.insert(
-            "reply_drafts",
+        await supabase.rpc(
+            "insert_reply_draft",
             {
-                "email_item_id": body.email_item_id,
-                "version": next_version,
-                "draft_text": revised,
-                "instruction": body.instruction,
+                "p_email_item_id": body.email_item_id,
+                "p_draft_text": revised,
+                "p_instruction": body.instruction,
             },
         )
     except SupabaseRestError as e:
@@ -607,7 +883,10 @@ async def gmail_send_reply(
     try:
         items = await supabase.select(
             "email_items",
-            columns="id,user_id,gmail_account_id,gmail_message_id,thread_id,from_email,subject,status",
+            columns=(
+                "id,user_id,gmail_account_id,gmail_message_id,thread_id,from_email,subject,status,"
+                "header_message_id,header_references"
+            ),
             filters={"id": f"eq.{body.email_item_id}", "user_id": f"eq.{user_id}"},
             limit=1,
         )
@@ -626,15 +905,24 @@ async def gmail_send_reply(
         acc = accounts[0]
 
         refresh_token = decrypt_text(acc["refresh_token_encrypted"])
-        access_token = await refresh_access_token(refresh_token=refresh_token)
-
-        # Fetch original message headers to thread properly.
-        original = await get_message_full(access_token=access_token, message_id=item["gmail_message_id"])
-        headers = _extract_headers(original)
-        message_id_hdr = headers.get("message-id")
-        references_hdr = headers.get("references")
-        to_email = item.get("from_email") or parse_from_email(headers.get("from") or "")
-        subject = item.get("subject") or (headers.get("subject") or "")
+
+        # Threading headers were stored at ingest; older rows read just the headers from Gmail.
+        message_id_hdr = item.get("header_message_id")
+        references_hdr = item.get("header_references")
+        to_email = item.get("from_email")
+        subject = item.get("subject") or ""
+        if not message_id_hdr or not to_email:
+            original = await call_with_access_token(
+                refresh_token=refresh_token,
+                call=lambda token: get_message_metadata(
+                    access_token=token, quota_key=acc["id"], message_id=item["gmail_message_id"]
+                ),
+            )
+            headers = _extract_headers(original)
+            message_id_hdr = headers.get("message-id")
+            references_hdr = headers.get("references")
+            to_email = to_email or parse_from_email(headers.get("from") or "")
+            subject = subject or (headers.get("subject") or "")
         if not to_email:
             raise HTTPException(status_code=400, detail="Missing recipient (from_email)")
 
@@ -645,7 +933,13 @@ async def gmail_send_reply(
             references=references_hdr,
             body_text=body.final_draft_text,
         )
-        sent = await send_message(access_token=access_token, thread_id=item.get("thread_id"), raw_rfc822=raw)
+        # A 401 means Gmail rejected the token before sending anything, so the resend is safe.
+        sent = await call_with_access_token(
+            refresh_token=refresh_token,
+            call=lambda token: send_message(
+                access_token=token, quota_key=acc["id"], thread_id=item.get("thread_id"), raw_rfc822=raw
+            ),
+        )
 
         await supabase.update(
             "email_items",
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from .tracing import start_span
+
+
+# Seconds. Covers fast PostgREST calls through slow LLM completions.
+DEFAULT_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple[str, ...], values: LabelValues, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for k, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, k)} {v}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = float(value)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for k, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, k)} {v}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._values: dict[LabelValues, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        k = self._key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(k) or ([0] * len(self.buckets), 0.0, 0)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    counts[i] += 1
+            self._values[k] = (counts, total + value, n + 1)
+
+    def count(self, **labels: str) -> int:
+        v = self._values.get(self._key(labels))
+        return v[2] if v else 0
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for k, (counts, total, n) in sorted(self._values.items()):
+                for upper, c in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, (('le', repr(upper)),))} {c}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, (('le', '+Inf'),))} {n}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {total}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CALL_LATENCY: Histogram = REGISTRY.register(
+    Histogram("inbox_copilot_call_duration_seconds", "Latency of external calls and pipeline stages.", ("stage", "provider"))
+)
+CALLS_IN_FLIGHT: Gauge = REGISTRY.register(
+    Gauge("inbox_copilot_calls_in_flight", "Calls currently in progress.", ("stage", "provider"))
+)
+CALL_ERRORS: Counter = REGISTRY.register(
+    Counter("inbox_copilot_call_errors_total", "Calls that raised.", ("stage", "provider", "error"))
+)
+LLM_TOKENS: Counter = REGISTRY.register(
+    Counter("inbox_copilot_llm_tokens_total", "LLM tokens by kind (prompt, completion, cached).", ("stage", "provider", "model", "kind"))
+)
+LLM_COST: Counter = REGISTRY.register(
+    Counter("inbox_copilot_llm_cost_usd_total", "Estimated LLM spend in USD.", ("stage", "provider", "model"))
+)
+HTTP_RETRIES: Counter = REGISTRY.register(
+    Counter("inbox_copilot_http_retries_total", "Outbound HTTP retries by reason (status code or transport error).", ("service", "reason"))
+)
+RATE_LIMIT_WAIT: Histogram = REGISTRY.register(
+    Histogram("inbox_copilot_rate_limit_wait_seconds", "Time spent waiting on client-side rate limiters.", ("service",))
+)
+CIRCUIT_STATE: Gauge = REGISTRY.register(
+    Gauge("inbox_copilot_circuit_state", "Circuit breaker state (0 closed, 1 open, 2 half-open).", ("service",))
+)
+CIRCUIT_REJECTIONS: Counter = REGISTRY.register(
+    Counter("inbox_copilot_circuit_rejections_total", "Calls refused because the circuit was open.", ("service",))
+)
+
+PUSH_NOTIFICATIONS: Counter = REGISTRY.register(
+    Counter(
+        "inbox_copilot_gmail_push_notifications_total",
+        "Gmail push notifications by outcome (scheduled, coalesced, stale, invalid, sync_failed).",
+        ("outcome",),
+    )
+)
+
+
+# Per-run stage totals (seconds), collected after `begin_stage_timings()` in the current task.
+_stage_timings: ContextVar[dict[str, float] | None] = ContextVar("stage_timings", default=None)
+
+
+def begin_stage_timings() -> dict[str, float]:
+    """Start a fresh per-stage accumulator for the current task (and tasks it spawns)."""
+    timings: dict[str, float] = {}
+    _stage_timings.set(timings)
+    return timings
+
+
+def stage_timings_ms(timings: dict[str, float]) -> dict[str, int]:
+    return {k: int(v * 1000) for k, v in sorted(timings.items())}
+
+
+def _record(stage: str, provider: str, elapsed: float, error: BaseException | None) -> None:
+    CALL_LATENCY.observe(elapsed, stage=stage, provider=provider)
+    if error is not None:
+        CALL_ERRORS.inc(stage=stage, provider=provider, error=type(error).__name__)
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+@asynccontextmanager
+async def track(stage: str, *, provider: str) -> AsyncIterator[None]:
+    CALLS_IN_FLIGHT.inc(stage=stage, provider=provider)
+    started = time.perf_counter()
+    error: BaseException | None = None
+    try:
+        with start_span(stage, attributes={"provider": provider}):
+            yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        CALLS_IN_FLIGHT.dec(stage=stage, provider=provider)
+        _record(stage, provider, time.perf_counter() - started, error)
+
+
+@contextmanager
+def track_sync(stage: str, *, provider: str = "local") -> Iterator[None]:
+    started = time.perf_counter()
+    error: BaseException | None = None
+    try:
+        with start_span(stage, attributes={"provider": provider}):
+            yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _record(stage, provider, time.perf_counter() - started, error)
+
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+def instrumented(stage: str, *, provider: str) -> Callable[[F], F]:
+    """Decorator form of `track()` for async functions (also opens a trace span named `stage`)."""
+
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        async def inner(*args: Any, **kwargs: Any) -> Any:
+            async with track(stage, provider=provider):
+                return await fn(*args, **kwargs)
+
+        return inner  # type: ignore[return-value]
+
+    return wrap
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from .config import get_settings
+
+
+@dataclass(frozen=True)
+class StageModels:
+    """Model per LLM stage for one item (None = the provider default model)."""
+
+    classify: str | None
+    summarize: str | None
+    draft: str | None
+    escalation: str | None
+    escalate_band: tuple[float, float]
+
+    def should_escalate(self, confidence: float) -> bool:
+        """Re-classify with the stronger model when the cheap model is unsure."""
+        if not self.escalation or self.escalation == self.classify:
+            return False
+        lo, hi = self.escalate_band
+        return lo <= confidence <= hi
+
+
+# Settings that name a model for whichever LLM_PROVIDER is active.
+MODEL_SETTINGS = (
+    "llm_model_classify",
+    "llm_model_summarize",
+    "llm_model_draft",
+    "llm_model_revise",
+    "llm_escalation_model",
+    "llm_budget_model",
+)
+
+
+def _provider() -> str:
+    return (get_settings().llm_provider or "openai").strip().lower()
+
+
+def serves_model(provider: str, model: str) -> bool:
+    """Gemini only serves `gemini-*` models; OpenAI(-compatible) endpoints serve anything else."""
+    gemini = model.strip().lower().removeprefix("models/").startswith("gemini")
+    return gemini if provider == "gemini" else not gemini
+
+
+def check_model_settings() -> None:
+    """Fail at startup on a model override the active provider cannot serve (every call would fail)."""
+    settings, provider = get_settings(), _provider()
+    wrong = [
+        f"{name.upper()}={value}"
+        for name in MODEL_SETTINGS
+        if (value := (getattr(settings, name, "") or "").strip()) and not serves_model(provider, value)
+    ]
+    if wrong:
+        raise RuntimeError(f"Models not served by LLM_PROVIDER={provider}: {', '.join(wrong)}")
+
+
+def _setting_model(stage: str) -> str | None:
+    return getattr(get_settings(), f"llm_model_{stage}", "") or None
+
+
+def stage_model(stage: str, *, actions: dict[str, Any] | None = None) -> str | None:
+    """Resolve the model for `stage` ("classify", "summarize", "draft", "revise").
+
+    Precedence: bucket `actions.llm_models[stage]`, then the escalation model for buckets with
+    `actions.llm_escalate` (everything but classification), then `LLM_MODEL_<STAGE>`. A bucket
+    model the active provider cannot serve (pinned before a provider switch) is ignored.
+    """
+    actions = actions or {}
+    per_bucket = actions.get("llm_models")
+    if isinstance(per_bucket, dict) and isinstance(per_bucket.get(stage), str) and per_bucket[stage].strip():
+        if serves_model(_provider(), per_bucket[stage]):
+            return per_bucket[stage].strip()
+    if stage != "classify" and bool(actions.get("llm_escalate")):
+        escalation = get_settings().llm_escalation_model or None
+        if escalation:
+            return escalation
+    return _setting_model(stage)
+
+
+def route_models(*, actions: dict[str, Any] | None = None) -> StageModels:
+    settings = get_settings()
+    lo, hi = settings.llm_escalate_min_confidence, settings.llm_escalate_max_confidence
+    return StageModels(
+        classify=stage_model("classify", actions=actions),
+        summarize=stage_model("summarize", actions=actions),
+        draft=stage_model("draft", actions=actions),
+        escalation=settings.llm_escalation_model or None,
+        escalate_band=(min(lo, hi), max(lo, hi)),
+    )
+
+
+def budget_models(budget_model: str | None) -> StageModels:
+    """Over-budget routing: everything on the budget model (if any), never escalate."""
+    return StageModels(
+        classify=budget_model,
+        summarize=budget_model,
+        draft=budget_model,
+        escalation=None,
+        escalate_band=(1.0, 0.0),
+    )
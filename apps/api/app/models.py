@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -13,6 +15,10 @@ class ReviseResponse(BaseModel):
     revised_draft: str
 
 
+class EmailBodyResponse(BaseModel):
+    body_text: str
+
+
 class SendReplyRequest(BaseModel):
     email_item_id: str
     final_draft_text: str = Field(min_length=1)
@@ -21,3 +27,30 @@ class SendReplyRequest(BaseModel):
 class SendReplyResponse(BaseModel):
     ok: bool
 
+
+
+InboxView = Literal["needs_review", "sent", "all"]
+
+
+class InboxItem(BaseModel):
+    id: str
+    from_email: str | None = None
+    subject: str | None = None
+    snippet: str | None = None
+    received_at: str | None = None
+    is_relevant: bool | None = None
+    status: str
+    bucket_id: str | None = None
+
+
+class InboxCounts(BaseModel):
+    # View -> count (all buckets).
+    views: dict[str, int]
+    # Bucket id ("none" for unrouted) -> count within the requested view.
+    by_bucket: dict[str, int]
+
+
+class InboxPageResponse(BaseModel):
+    items: list[InboxItem]
+    next_cursor: str | None = None
+    counts: InboxCounts | None = None
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Coroutine
+
+from .config import get_settings
+from .supabase_rest import SupabaseRest
+
+
+# processing_runs.counts keys summed into a run's progress.
+RUN_COUNT_KEYS = ("fetched", "inserted", "known", "processed", "relevant", "push_queued", "pushed", "failed")
+
+
+def _parse_ts(value: Any) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+async def find_running_run(*, supabase: SupabaseRest, user_id: str, now: datetime) -> str | None:
+    """run_id of the user's in-flight manual poll on any replica (started within POLL_LEASE_S)."""
+    since = now - timedelta(seconds=get_settings().poll_lease_s)
+    rows = await supabase.select(
+        "processing_runs",
+        columns="run_id",
+        filters={
+            "user_id": f"eq.{user_id}",
+            "trigger": "eq.manual",
+            "status": "eq.running",
+            "run_id": "not.is.null",
+            "started_at": f"gte.{since.isoformat()}",
+        },
+        order="started_at.desc",
+        limit=1,
+    )
+    return rows[0]["run_id"] if rows else None
+
+
+async def create_run(
+    *, supabase: SupabaseRest, user_id: str, accounts: list[dict[str, Any]], now: datetime
+) -> tuple[str, dict[str, str]]:
+    """One `running` processing_runs row per account under a new run_id -> (run_id, {account id: row id})."""
+    run_id = str(uuid.uuid4())
+    rows = await supabase.insert(
+        "processing_runs",
+        [
+            {
+                "user_id": user_id,
+                "gmail_account_id": acc["id"],
+                "started_at": now.isoformat(),
+                "run_id": run_id,
+                "trigger": "manual",
+                "status": "running",
+                "counts": {},
+            }
+            for acc in accounts
+        ],
+    )
+    return run_id, {r["gmail_account_id"]: r["id"] for r in rows}
+
+
+def summarize_run(run_id: str, rows: list[dict[str, Any]], *, now: datetime) -> dict[str, Any]:
+    """Progress of a run from its processing_runs rows.
+
+    A row still `running` after POLL_LEASE_S belonged to a replica that went away: `expired`.
+    """
+    lease_s = get_settings().poll_lease_s
+    totals = {k: 0 for k in RUN_COUNT_KEYS}
+    accounts: list[dict[str, Any]] = []
+    statuses: set[str] = set()
+    for r in rows:
+        counts = r.get("counts") or {}
+        status = r.get("status") or "done"
+        started = _parse_ts(r.get("started_at"))
+        if status == "running" and started and (now - started).total_seconds() > lease_s:
+            status = "expired"
+        statuses.add(status)
+        for k in RUN_COUNT_KEYS:
+            totals[k] += int(counts.get(k) or 0)
+        accounts.append(
+            {
+                "gmail_account_id": r.get("gmail_account_id"),
+                "status": status,
+                "started_at": r.get("started_at"),
+                "finished_at": r.get("finished_at"),
+                "counts": {k: int(counts.get(k) or 0) for k in RUN_COUNT_KEYS},
+            }
+        )
+    if "running" in statuses:
+        overall = "running"
+    elif statuses and statuses <= {"failed", "expired"}:
+        overall = "failed"
+    else:
+        overall = "done"
+    return {"run_id": run_id, "status": overall, "totals": totals, "accounts": accounts}
+
+
+class ManualPolls:
+    """Background manual polls on this replica, at most one per user.
+
+    `claim()` reserves the user's slot synchronously, so concurrent clicks cannot both start a run;
+    `start()` then attaches the job, and the slot frees itself when the job finishes.
+    """
+
+    def __init__(self) -> None:
+        self._runs: dict[str, str | None] = {}
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+
+    def claim(self, user_id: str) -> tuple[bool, str | None]:
+        """(True, None) when the slot was free; else (False, the in-flight run_id or None if starting)."""
+        if user_id in self._runs:
+            return False, self._runs[user_id]
+        self._runs[user_id] = None
+        return True, None
+
+    def release(self, user_id: str) -> None:
+        self._runs.pop(user_id, None)
+
+    def start(self, user_id: str, run_id: str, job: Coroutine[Any, Any, None]) -> None:
+        self._runs[user_id] = run_id
+        task = asyncio.create_task(job)
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda _: self._finish(user_id, task))
+
+    def _finish(self, user_id: str, task: asyncio.Task[None]) -> None:
+        if self._tasks.get(user_id) is task:
+            self._tasks.pop(user_id, None)
+            self._runs.pop(user_id, None)
+
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def aclose(self) -> None:
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._runs.clear()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any
+
+from .config import get_settings
+from .supabase_rest import SupabaseRest
+
+
+# An observation this old carries half the weight of a fresh one in the arrival-rate average.
+RATE_HALF_LIFE_S = 6 * 3600
+# Accounts without an estimate yet start from the last week of received mail.
+BOOTSTRAP_WINDOW_S = 7 * 24 * 3600
+BOOTSTRAP_LIMIT = 1000
+JITTER = 0.1
+
+
+def _parse_ts(value: Any) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+async def bootstrap_rate(*, supabase: SupabaseRest, gmail_account_id: str, now: datetime) -> float:
+    """Messages per hour from (up to) the last week of `email_items.received_at`."""
+    since = now - timedelta(seconds=BOOTSTRAP_WINDOW_S)
+    rows = await supabase.select(
+        "email_items",
+        columns="received_at",
+        filters={"gmail_account_id": f"eq.{gmail_account_id}", "received_at": f"gte.{since.isoformat()}"},
+        order="received_at.desc",
+        limit=BOOTSTRAP_LIMIT,
+    )
+    if not rows:
+        return 0.0
+    # Measured over the history we actually have: a newly connected account only has the first
+    # poll's lookback, and a capped read covers less than the window.
+    oldest = _parse_ts(rows[-1].get("received_at")) or since
+    span_s = min(float(BOOTSTRAP_WINDOW_S), max(3600.0, (now - oldest).total_seconds()))
+    return len(rows) / (span_s / 3600)
+
+
+def update_rate(previous: float | None, *, arrived: int, elapsed_s: float) -> float:
+    """Time-decayed average of arrivals per hour; a longer gap weighs the new observation more."""
+    if elapsed_s <= 0:
+        return previous or 0.0
+    observed = arrived / (elapsed_s / 3600)
+    if previous is None:
+        return observed
+    weight = 1 - 0.5 ** (elapsed_s / RATE_HALF_LIFE_S)
+    return weight * observed + (1 - weight) * previous
+
+
+def next_interval_s(rate_per_h: float, *, watched: bool = False) -> float:
+    """Aim for POLL_TARGET_MESSAGES new messages per poll, within the configured bounds.
+
+    Accounts with a live Gmail watch get the longest interval: push covers latency, polling is only
+    the safety net.
+    """
+    settings = get_settings()
+    lo, hi = settings.poll_min_interval_s, max(settings.poll_min_interval_s, settings.poll_max_interval_s)
+    if watched or rate_per_h <= 0:
+        return hi
+    return min(max(settings.poll_target_messages / rate_per_h * 3600, lo), hi)
+
+
+async def schedule_after_poll(
+    *, supabase: SupabaseRest, acc: dict[str, Any], now: datetime, arrived: int, ok: bool
+) -> dict[str, Any]:
+    """gmail_accounts fields to write with the poll result: rate estimate, interval, next_poll_at."""
+    settings = get_settings()
+    if not ok:
+        # Retry soon, but do not let a failing account be polled on every tick.
+        return {"next_poll_at": (now + timedelta(seconds=settings.poll_min_interval_s)).isoformat()}
+
+    previous = acc.get("arrival_rate_per_h")
+    last_polled = _parse_ts(acc.get("last_polled_at"))
+    if previous is None:
+        try:
+            rate = await bootstrap_rate(supabase=supabase, gmail_account_id=acc["id"], now=now)
+        except Exception:
+            rate = update_rate(None, arrived=arrived, elapsed_s=3600.0)
+    else:
+        elapsed_s = (now - last_polled).total_seconds() if last_polled else 3600.0
+        rate = update_rate(float(previous), arrived=arrived, elapsed_s=elapsed_s)
+
+    watch_expires = _parse_ts(acc.get("watch_expires_at"))
+    watched = bool(settings.gmail_pubsub_topic and watch_expires and watch_expires > now)
+    interval_s = next_interval_s(rate, watched=watched) * random.uniform(1 - JITTER, 1 + JITTER)
+    return {
+        "arrival_rate_per_h": round(rate, 4),
+        "poll_interval_s": int(interval_s),
+        "next_poll_at": (now + timedelta(seconds=interval_s)).isoformat(),
+    }
+
+
+# gmail_accounts.shard_key is `hashtext(id) & 1023`; shard i of n owns a contiguous slice of it.
+SHARD_SPACE = 1024
+
+
+def shard_range(shard: int, shards: int) -> tuple[int, int]:
+    if shards < 1 or shards > SHARD_SPACE or not 0 <= shard < shards:
+        raise ValueError(f"Invalid shard {shard}/{shards}")
+    return shard * SHARD_SPACE // shards, (shard + 1) * SHARD_SPACE // shards
+
+
+def worker_id(shard: int, shards: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{shard}/{shards}"
+
+
+def poll_owner(trigger: str) -> str:
+    """Lease owner for one out-of-schedule poll (manual, push): unique even within a process."""
+    return f"{socket.gethostname()}:{os.getpid()}:{trigger}:{uuid.uuid4().hex[:8]}"
+
+
+async def claim_due_accounts(
+    *, supabase: SupabaseRest, shard: int, shards: int, limit: int, owner: str
+) -> list[dict[str, Any]]:
+    """Lease up to `limit` due accounts of this shard (POLL_LEASE_S); concurrent claims never overlap."""
+    lo, hi = shard_range(shard, shards)
+    rows = await supabase.rpc(
+        "claim_gmail_accounts",
+        {
+            "p_shard_lo": lo,
+            "p_shard_hi": hi,
+            "p_limit": limit,
+            "p_lease_s": int(get_settings().poll_lease_s),
+            "p_owner": owner,
+        },
+    )
+    return rows or []
+
+
+async def lease_account(*, supabase: SupabaseRest, gmail_account_id: str, owner: str) -> bool:
+    """Lease one account for POLL_LEASE_S regardless of its schedule; False if a poll holds it."""
+    res = await supabase.rpc(
+        "lease_gmail_account",
+        {"p_id": gmail_account_id, "p_lease_s": int(get_settings().poll_lease_s), "p_owner": owner},
+    )
+    return bool(res)
+
+
+async def release_lease(*, supabase: SupabaseRest, gmail_account_id: str, owner: str) -> None:
+    """Drop `owner`'s lease; a lease that expired and was claimed by another poll is left alone."""
+    await supabase.update(
+        "gmail_accounts",
+        {"poll_lease_until": None, "poll_lease_owner": None},
+        filters={"id": f"eq.{gmail_account_id}", "poll_lease_owner": f"eq.{owner}"},
+    )
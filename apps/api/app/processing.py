@@ -3,13 +3,25 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Any
 
-import anyio
-from pywebpush import WebPushException
-
+from .body_store import get_body_store
 from .buckets import ensure_default_buckets, route_to_bucket
-from .llm import ContextPack, classify_email, draft_reply, summarize_email
-from .push import send_web_push
+from .config import get_settings
+from .llm import (
+    ContextPack,
+    classify_email,
+    classify_prompt,
+    draft_reply,
+    resolve_model,
+    summarize_email,
+    summarize_prompt,
+)
+from .llm_batch import PENDING_STATUSES, BatchResult, OpenAIBatchClient, batch_line
+from .llm_usage import UsageMeter, daily_budget_usd, record_usage, spent_today_usd, usage_scope
+from .model_routing import budget_models, route_models
+from .metrics import track_sync
+from .push_dispatch import PushDispatcher
 from .supabase_rest import SupabaseRest, SupabaseRestError
+from .tracing import current_traceparent, start_span
 
 
 def _one_line_summary(*, summary_json: dict[str, Any] | None, subject: str | None, snippet: str | None) -> str:
@@ -30,295 +42,723 @@ def _one_line_summary(*, summary_json: dict[str, Any] | None, subject: str | Non
     return "New email"
 
 
-async def _send_push_to_user(
-    *,
-    supabase: SupabaseRest,
-    user_id: str,
-    email_item_id: str,
-    from_email: str | None,
-    one_line: str,
-) -> int:
-    try:
-        subs = await supabase.select(
-            "push_subscriptions",
-            columns="id,endpoint,p256dh,auth",
-            filters={"user_id": f"eq.{user_id}"},
-            limit=100,
-        )
-    except SupabaseRestError:
-        return 0
+def _coalesce_threads(items: list[dict[str, Any]]) -> list[tuple[dict[str, Any], list[dict[str, Any]]]]:
+    """Group items (oldest first) by thread_id. Returns (latest, earlier) pairs in order of first arrival."""
+    groups: dict[str, list[dict[str, Any]]] = {}
+    order: list[str] = []
+    for item in items:
+        key = item.get("thread_id") or f"item:{item.get('id')}"
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(item)
+    return [(groups[k][-1], groups[k][:-1]) for k in order]
+
 
-    payload = {
+def _push_payload(*, email_item_id: str, from_email: str | None, one_line: str) -> dict[str, Any]:
+    return {
         "email_item_id": email_item_id,
         "title": from_email or "Inbox Copilot",
         "body": one_line[:180],
         "url": f"/inbox/{email_item_id}",
     }
 
-    pushed = 0
-    for sub in subs:
-        sub_id = sub.get("id")
-        endpoint = sub.get("endpoint")
-        p256dh = sub.get("p256dh")
-        auth = sub.get("auth")
-        if not endpoint or not p256dh or not auth:
-            continue
 
-        subscription_info = {"endpoint": endpoint, "keys": {"p256dh": p256dh, "auth": auth}}
-        try:
-            await anyio.to_thread.run_sync(send_web_push, subscription=subscription_info, payload=payload)
-            pushed += 1
-            if sub_id:
-                try:
-                    await supabase.update(
-                        "push_subscriptions",
-                        {"last_used_at": datetime.now(tz=timezone.utc).isoformat()},
-                        filters={"id": f"eq.{sub_id}"},
-                    )
-                except Exception:
-                    pass
-        except WebPushException as e:
-            # Drop expired subscriptions to keep the table clean.
-            status = getattr(getattr(e, "response", None), "status_code", None)
-            if status in (404, 410) and sub_id:
-                try:
-                    await supabase.delete("push_subscriptions", filters={"id": f"eq.{sub_id}"})
-                except Exception:
-                    pass
-        except Exception:
-            continue
+# Columns apply_email_item_patches() knows how to write.
+_PATCHABLE_COLUMNS = frozenset(
+    {"bucket_id", "is_relevant", "confidence", "category", "reason", "summary_json", "status", "error_message"}
+)
 
-    return pushed
 
+class _ResultWriter:
+    """Accumulates per-item `email_items` patches and writes them in one RPC.
 
-async def process_ingested_for_account(
-    *,
-    supabase: SupabaseRest,
-    user_id: str,
-    gmail_account_id: str,
-    max_items: int = 25,
-) -> dict[str, Any]:
-    """Process ingested emails into: bucket -> classify -> (optional) summary/draft -> (optional) push."""
-
-    counts: dict[str, Any] = {
-        "processed": 0,
-        "relevant": 0,
-        "pushed": 0,
-        "failed": 0,
-        "ignored": 0,
-    }
-    errors: list[str] = []
+    Later patches for the same item merge over earlier ones. If the bulk call fails, each item is
+    retried with its own PATCH so one bad row can't sink the batch.
+    """
 
-    # Ensure buckets exist (seed defaults for new users).
-    buckets = await ensure_default_buckets(supabase=supabase, user_id=user_id)
+    def __init__(self, *, supabase: SupabaseRest) -> None:
+        self._supabase = supabase
+        self._patches: dict[str, dict[str, Any]] = {}
 
-    # Load context pack (optional).
-    ctx = ContextPack()
-    try:
-        ctx_rows = await supabase.select(
-            "context_packs",
-            columns="brand_name,brand_blurb,products_info_json,policies_json,tone,signature,keywords_array",
-            filters={"user_id": f"eq.{user_id}"},
-            limit=1,
-        )
-        if ctx_rows:
-            r = ctx_rows[0]
-            ctx = ContextPack(
-                brand_name=r.get("brand_name"),
-                brand_blurb=r.get("brand_blurb"),
-                products_info_json=r.get("products_info_json"),
-                policies_json=r.get("policies_json"),
-                tone=r.get("tone"),
-                signature=r.get("signature"),
-                keywords_array=r.get("keywords_array") or [],
+    def set(self, email_item_id: str, patch: dict[str, Any]) -> None:
+        unknown = set(patch) - _PATCHABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unsupported email_items patch columns: {sorted(unknown)}")
+        self._patches.setdefault(email_item_id, {}).update(patch)
+
+    async def flush(self) -> list[tuple[str, str]]:
+        """Returns (email_item_id, error) for items that could not be written."""
+        patches = self._patches
+        self._patches = {}
+        if not patches:
+            return []
+        try:
+            await self._supabase.rpc(
+                "apply_email_item_patches",
+                {"p_patches": [{"id": k, "patch": v} for k, v in patches.items()]},
             )
-    except Exception:
-        pass
+            return []
+        except SupabaseRestError:
+            pass
 
-    # Fetch ingested items (oldest first).
-    try:
-        items = await supabase.select(
-            "email_items",
-            columns="id,from_email,subject,snippet,body_text,status",
-            filters={"gmail_account_id": f"eq.{gmail_account_id}", "status": "eq.ingested"},
-            order="received_at.asc",
-            limit=max_items,
-        )
-    except SupabaseRestError as e:
-        return {"counts": counts, "errors": [str(e)]}
+        failed: list[tuple[str, str]] = []
+        for email_item_id, patch in patches.items():
+            try:
+                await self._supabase.update("email_items", patch, filters={"id": f"eq.{email_item_id}"})
+            except Exception as e:
+                failed.append((email_item_id, str(e)))
+        return failed
 
-    for item in items:
-        email_item_id = item.get("id")
-        if not email_item_id:
-            continue
 
-        from_email = item.get("from_email")
-        subject = item.get("subject")
-        snippet = item.get("snippet")
-        body_text = item.get("body_text")
-
-        bucket = route_to_bucket(
-            buckets=buckets,
-            from_email=from_email,
-            subject=subject,
-            snippet=snippet,
-            body_text=body_text,
-        )
-        bucket_id = bucket.get("id") if isinstance(bucket, dict) else None
-        actions = (bucket.get("actions") if isinstance(bucket, dict) else None) or {}
+async def _insert_drafts(*, supabase: SupabaseRest, drafts: list[dict[str, Any]]) -> list[tuple[str, str]]:
+    """Append draft versions via one bulk RPC; on failure retry one by one. Returns (email_item_id, error) pairs."""
+    if not drafts:
+        return []
+    try:
+        await supabase.rpc("insert_reply_drafts", {"p_drafts": drafts})
+        return []
+    except SupabaseRestError:
+        pass
 
-        patch: dict[str, Any] = {
-            "error_message": None,
-            "bucket_id": bucket_id,
+    failed: list[tuple[str, str]] = []
+    for d in drafts:
+        try:
+            await supabase.rpc(
+                "insert_reply_draft",
+                {
+                    "p_email_item_id": d["email_item_id"],
+                    "p_draft_text": d["draft_text"],
+                    "p_instruction": d["instruction"],
+                },
+            )
+        except SupabaseRestError as e:
+            failed.append((d["email_item_id"], str(e)))
+    return failed
+
+
+def _thread_context(earlier: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [
+        {
+            "from_email": e.get("from_email"),
+            "subject": e.get("subject"),
+            "snippet": e.get("snippet"),
+            "body_text": e.get("body_text"),
         }
+        for e in earlier
+    ]
+
+
+def _batch_eligible(actions: dict[str, Any]) -> bool:
+    settings = get_settings()
+    return (
+        settings.llm_batch_enabled
+        and (settings.llm_provider or "openai").strip().lower() == "openai"
+        and bool(actions.get("llm_batch"))
+        and bool(actions.get("llm_classify", True))
+        and not bool(actions.get("ignore"))
+    )
+
+
+_ITEM_COLUMNS = "id,thread_id,from_email,subject,snippet,body_hash,body_text,received_at,status,bucket_id"
+
+
+class _Run:
+    """State shared by every item in one processing pass over an account.
+
+    Items are handled by `process_item()`, either straight from ingestion or later, when provider
+    batch results for them arrive (`collect_batches()`); `finish()` writes everything in bulk.
+    """
+
+    def __init__(
+        self,
+        *,
+        supabase: SupabaseRest,
+        user_id: str,
+        gmail_account_id: str,
+        dispatcher: PushDispatcher | None,
+        backfill: bool = False,
+    ) -> None:
+        self.supabase = supabase
+        self.user_id = user_id
+        self.gmail_account_id = gmail_account_id
+        self.dispatcher = dispatcher
+        # Backfilled history: no drafts, and no pushes (no dispatcher).
+        self.backfill = backfill
+        self.counts: dict[str, Any] = {
+            "processed": 0,
+            "relevant": 0,
+            "push_queued": 0,
+            "failed": 0,
+            "ignored": 0,
+            "superseded": 0,
+            "budget_degraded": 0,
+            "escalated": 0,
+            "batch_queued": 0,
+            "batch_applied": 0,
+        }
+        self.errors: list[str] = []
+        self.pending_drafts: list[dict[str, Any]] = []
+        # Counted (email_item_id -> relevant) and pushed only once finish() has written the item.
+        self.pending_done: dict[str, bool] = {}
+        self.pending_pushes: dict[str, dict[str, Any]] = {}
+        self.writer = _ResultWriter(supabase=supabase)
+        self.meter = UsageMeter(supabase=supabase)
+        self.buckets: list[dict[str, Any]] = []
+        self.ctx = ContextPack()
+        self.budget = 0.0
+        self.spent_before = 0.0
+        # Backfill may only spend its share of the daily budget; the rest is kept for fresh mail.
+        self.budget_share = get_settings().backfill_budget_share if backfill else 1.0
+
+    async def load_user_context(self) -> None:
+        supabase, user_id = self.supabase, self.user_id
+
+        # Ensure buckets exist (seed defaults for new users).
+        self.buckets = await ensure_default_buckets(supabase=supabase, user_id=user_id)
+
+        # Load context pack (optional).
+        budget_override: Any = None
+        try:
+            ctx_rows = await supabase.select(
+                "context_packs",
+                columns="brand_name,brand_blurb,products_info_json,policies_json,tone,signature,keywords_array,llm_daily_budget_usd",
+                filters={"user_id": f"eq.{user_id}"},
+                limit=1,
+            )
+            if ctx_rows:
+                r = ctx_rows[0]
+                budget_override = r.get("llm_daily_budget_usd")
+                self.ctx = ContextPack(
+                    brand_name=r.get("brand_name"),
+                    brand_blurb=r.get("brand_blurb"),
+                    products_info_json=r.get("products_info_json"),
+                    policies_json=r.get("policies_json"),
+                    tone=r.get("tone"),
+                    signature=r.get("signature"),
+                    keywords_array=r.get("keywords_array") or [],
+                )
+        except Exception:
+            pass
 
+        # Daily LLM budget: once today's spend (rollup + this run) reaches it, items are classify-only.
+        self.budget = daily_budget_usd(budget_override)
+        if self.budget > 0:
+            try:
+                self.spent_before = await spent_today_usd(supabase=supabase, user_id=user_id)
+            except Exception:
+                pass
+
+    async def load_bodies(self, items: list[dict[str, Any]]) -> None:
+        # Bodies live in the body store (legacy rows still carry body_text inline); one batched read.
         try:
-            # Ignore/noise buckets: store it, but don't spend tokens or send pushes.
-            if bool(actions.get("ignore")):
-                counts["ignored"] += 1
-                patch.update(
-                    {
-                        "is_relevant": False,
-                        "confidence": 0.0,
-                        "category": "ignored",
-                        "reason": "Routed to FYI bucket.",
-                        "summary_json": None,
-                        "status": "processed",
+            bodies = await get_body_store(supabase=self.supabase).get_many(
+                [i["body_hash"] for i in items if i.get("body_hash") and i.get("body_text") is None]
+            )
+        except Exception as e:
+            bodies = {}
+            self.errors.append(f"body load failed: {e}")
+        for i in items:
+            if i.get("body_text") is None and i.get("body_hash"):
+                i["body_text"] = bodies.get(i["body_hash"])
+
+    def over_budget(self) -> bool:
+        spent = self.spent_before + self.meter.spent_usd(self.user_id)
+        return self.budget > 0 and spent >= self.budget * self.budget_share
+
+    def route(self, item: dict[str, Any]) -> dict[str, Any] | None:
+        with track_sync("route.bucket"):
+            return route_to_bucket(
+                buckets=self.buckets,
+                from_email=item.get("from_email"),
+                subject=item.get("subject"),
+                snippet=item.get("snippet"),
+                body_text=item.get("body_text"),
+            )
+
+    async def process_item(
+        self,
+        item: dict[str, Any],
+        earlier: list[dict[str, Any]],
+        *,
+        bucket: dict[str, Any] | None,
+        batch_results: dict[str, BatchResult] | None = None,
+    ) -> None:
+        """bucket -> classify -> (optional) summary/draft -> (optional) push, for one thread's latest item.
+
+        `batch_results` ("classify"/"summarize" -> provider batch output) replace the corresponding
+        synchronous calls; anything missing or invalid is computed synchronously instead.
+        """
+        counts, writer, ctx, user_id = self.counts, self.writer, self.ctx, self.user_id
+        email_item_id = str(item["id"])
+
+        with start_span(
+            "process.email",
+            attributes={
+                "gmail_account_id": self.gmail_account_id,
+                "email_item_id": email_item_id,
+                "thread.earlier_messages": len(earlier),
+                "llm.batch": batch_results is not None,
+            },
+        ) as span, usage_scope(self.meter, user_id=user_id) as usage:
+            thread_context = _thread_context(earlier)
+
+            from_email = item.get("from_email")
+            subject = item.get("subject")
+            snippet = item.get("snippet")
+            body_text = item.get("body_text")
+
+            bucket_id = bucket.get("id") if isinstance(bucket, dict) else None
+            actions = (bucket.get("actions") if isinstance(bucket, dict) else None) or {}
+            span.set_attribute("bucket", bucket.get("slug") if isinstance(bucket, dict) else None)
+            usage.bucket_id = bucket_id
+
+            # Batch output was paid for whether or not we end up using it.
+            for res in (batch_results or {}).values():
+                if res.usage is not None:
+                    record_usage(res.usage)
+
+            over_budget = self.over_budget()
+            models = budget_models(get_settings().llm_budget_model or None) if over_budget else route_models(actions=actions)
+            if over_budget:
+                counts["budget_degraded"] += 1
+                span.set_attribute("llm.over_budget", True)
+
+            patch: dict[str, Any] = {
+                "error_message": None,
+                "bucket_id": bucket_id,
+            }
+
+            try:
+                # Ignore/noise buckets: store it, but don't spend tokens or send pushes.
+                if bool(actions.get("ignore")):
+                    counts["ignored"] += 1
+                    patch.update(
+                        {
+                            "is_relevant": False,
+                            "confidence": 0.0,
+                            "category": "ignored",
+                            "reason": "Routed to FYI bucket.",
+                            "summary_json": None,
+                            "status": "processed",
+                        }
+                    )
+                    writer.set(email_item_id, patch)
+                    self.pending_done[email_item_id] = False
+                    return
+
+                # LLM classification (per bucket). Defaults to on.
+                if bool(actions.get("llm_classify", True)):
+                    classify_kwargs: dict[str, Any] = {
+                        "ctx": ctx,
+                        "from_email": from_email,
+                        "subject": subject,
+                        "snippet": snippet,
+                        "body_text": body_text,
+                        "thread_context": thread_context,
                     }
-                )
-                await supabase.update("email_items", patch, filters={"id": f"eq.{email_item_id}"})
-                counts["processed"] += 1
-                continue
+                    batched = batch_results.get("classify") if batch_results else None
+                    classification = (batched.parse("classification") if batched else None) or await classify_email(
+                        **classify_kwargs, model=models.classify
+                    )
+                    # Cheap model unsure -> ask the stronger one and trust its answer.
+                    if models.should_escalate(float(classification.get("confidence", 0.0))):
+                        classification = await classify_email(**classify_kwargs, model=models.escalation)
+                        counts["escalated"] += 1
+                        span.set_attribute("llm.escalated", True)
+                    patch.update(
+                        {
+                            "is_relevant": bool(classification.get("is_relevant")),
+                            "confidence": float(classification.get("confidence", 0.0)),
+                            "category": str(classification.get("category") or "unknown"),
+                            "reason": str(classification.get("reason") or ""),
+                        }
+                    )
+                else:
+                    patch.update(
+                        {
+                            "is_relevant": True,
+                            "confidence": 1.0,
+                            "category": "bucket_routed",
+                            "reason": "Bucket rule match.",
+                        }
+                    )
 
-            # LLM classification (per bucket). Defaults to on.
-            if bool(actions.get("llm_classify", True)):
-                classification = await classify_email(
-                    ctx=ctx,
-                    from_email=from_email,
-                    subject=subject,
-                    snippet=snippet,
-                    body_text=body_text,
-                )
-                patch.update(
-                    {
-                        "is_relevant": bool(classification.get("is_relevant")),
-                        "confidence": float(classification.get("confidence", 0.0)),
-                        "category": str(classification.get("category") or "unknown"),
-                        "reason": str(classification.get("reason") or ""),
+                is_relevant = bool(patch.get("is_relevant"))
+                confidence = float(patch.get("confidence") or 0.0)
+
+                if not is_relevant:
+                    patch.update({"summary_json": None, "status": "processed"})
+                    writer.set(email_item_id, patch)
+                    self.pending_done[email_item_id] = False
+                    return
+
+                summary: dict[str, Any] | None = None
+                if bool(actions.get("llm_summarize", True)) and not over_budget:
+                    batched = batch_results.get("summarize") if batch_results else None
+                    summary = (batched.parse("summary") if batched else None) or await summarize_email(
+                        ctx=ctx,
+                        from_email=from_email,
+                        subject=subject,
+                        body_text=body_text,
+                        thread_context=thread_context,
+                        model=models.summarize,
+                    )
+                    patch["summary_json"] = summary
+
+                # Draft can be gated by confidence (useful for the fallback bucket).
+                draft_min_conf = actions.get("draft_min_confidence")
+                if draft_min_conf is None:
+                    draft_min_conf = 0.0
+                try:
+                    draft_min_conf_f = float(draft_min_conf)
+                except Exception:
+                    draft_min_conf_f = 0.0
+
+                did_draft = False
+                if (
+                    bool(actions.get("llm_draft", True))
+                    and not self.backfill
+                    and not over_budget
+                    and confidence >= draft_min_conf_f
+                ):
+                    draft = await draft_reply(
+                        ctx=ctx,
+                        from_email=from_email,
+                        subject=subject,
+                        body_text=body_text,
+                        summary_json=summary
+                        or {
+                            "summary_bullets": ["(no summary)"],
+                            "what_they_want": ["(unknown)"],
+                            "suggested_next_step": "Reply if needed.",
+                        },
+                        thread_context=thread_context,
+                        model=models.draft,
+                    )
+
+                    # Draft versions are appended in one bulk RPC in finish().
+                    self.pending_drafts.append(
+                        {
+                            "email_item_id": email_item_id,
+                            "draft_text": str(draft.get("draft_text") or "").strip(),
+                            "instruction": None,
+                        }
+                    )
+                    did_draft = True
+
+                # If we created no draft and we also didn't summarize, there is nothing to review.
+                # Backfilled history is never queued for review; its summary is kept for the archive.
+                review = (did_draft or summary) and not self.backfill
+                patch.update({"status": "needs_review" if review else "processed"})
+                writer.set(email_item_id, patch)
+                self.pending_done[email_item_id] = True
+
+                # Best-effort push (do not fail item if push fails).
+                push_min_conf = actions.get("push_min_confidence")
+                if push_min_conf is None:
+                    push_min_conf = 0.0
+                try:
+                    push_min_conf_f = float(push_min_conf)
+                except Exception:
+                    push_min_conf_f = 0.0
+
+                if self.dispatcher is not None and bool(actions.get("push", True)) and confidence >= push_min_conf_f:
+                    self.pending_pushes[email_item_id] = {
+                        "user_id": user_id,
+                        "payload": _push_payload(
+                            email_item_id=email_item_id,
+                            from_email=from_email,
+                            one_line=_one_line_summary(summary_json=summary, subject=subject, snippet=snippet),
+                        ),
+                        "bucket_name": bucket.get("name") if isinstance(bucket, dict) else None,
+                        "digest": bool(actions.get("push_digest", False)),
+                        "traceparent": current_traceparent(),
                     }
+
+            except Exception as e:
+                span.record_error(e)
+                counts["failed"] += 1
+                msg = str(e)
+                self.errors.append(f"{email_item_id}: {msg}")
+                patch.update({"status": "failed", "error_message": msg})
+                writer.set(email_item_id, patch)
+
+    async def submit_batch(self, deferred: list[tuple[dict[str, Any], list[dict[str, Any]], dict[str, Any] | None]]) -> None:
+        """Send classify (+ summarize) prompts for `deferred` items as one provider batch job.
+
+        Summaries are requested up front (they are only used for relevant items) so results need a
+        single round trip. If submission fails, the items are processed synchronously right away.
+        """
+        lines: list[dict[str, Any]] = []
+        for item, earlier, bucket in deferred:
+            actions = (bucket.get("actions") if isinstance(bucket, dict) else None) or {}
+            models = route_models(actions=actions)
+            email_kwargs: dict[str, Any] = {
+                "ctx": self.ctx,
+                "from_email": item.get("from_email"),
+                "subject": item.get("subject"),
+                "body_text": item.get("body_text"),
+                "thread_context": _thread_context(earlier),
+            }
+            lines.append(
+                batch_line(
+                    custom_id=f"{item['id']}:classify",
+                    name="classification",
+                    user=classify_prompt(**email_kwargs, snippet=item.get("snippet")),
+                    model=resolve_model(models.classify, provider="openai"),
                 )
-            else:
-                patch.update(
-                    {
-                        "is_relevant": True,
-                        "confidence": 1.0,
-                        "category": "bucket_routed",
-                        "reason": "Bucket rule match.",
-                    }
+            )
+            if bool(actions.get("llm_summarize", True)):
+                lines.append(
+                    batch_line(
+                        custom_id=f"{item['id']}:summarize",
+                        name="summary",
+                        user=summarize_prompt(**email_kwargs),
+                        model=resolve_model(models.summarize, provider="openai"),
+                    )
                 )
 
-            is_relevant = bool(patch.get("is_relevant"))
-            confidence = float(patch.get("confidence") or 0.0)
-
-            if not is_relevant:
-                patch.update({"summary_json": None, "status": "processed"})
-                await supabase.update("email_items", patch, filters={"id": f"eq.{email_item_id}"})
-                counts["processed"] += 1
-                continue
+        try:
+            provider_batch_id = await OpenAIBatchClient().submit(
+                lines, metadata={"gmail_account_id": self.gmail_account_id}
+            )
+            await self.supabase.insert(
+                "llm_batches",
+                {
+                    "user_id": self.user_id,
+                    "gmail_account_id": self.gmail_account_id,
+                    "provider": "openai",
+                    "provider_batch_id": provider_batch_id,
+                    "status": "submitted",
+                    "request_count": len(lines),
+                    "items": [
+                        {"email_item_id": str(item["id"]), "earlier_ids": [str(e["id"]) for e in earlier if e.get("id")]}
+                        for item, earlier, _ in deferred
+                    ],
+                },
+            )
+        except Exception as e:
+            self.errors.append(f"batch submit failed, processing inline: {e}")
+            for item, earlier, bucket in deferred:
+                await self.process_item(item, earlier, bucket=bucket)
+            return
+
+        for item, _, bucket in deferred:
+            self.writer.set(
+                str(item["id"]),
+                {
+                    "bucket_id": bucket.get("id") if isinstance(bucket, dict) else None,
+                    "status": "batch_pending",
+                    "error_message": None,
+                },
+            )
+            self.counts["batch_queued"] += 1
 
-            summary: dict[str, Any] | None = None
-            if bool(actions.get("llm_summarize", True)):
-                summary = await summarize_email(ctx=ctx, from_email=from_email, subject=subject, body_text=body_text)
-                patch["summary_json"] = summary
+    async def collect_batches(self) -> None:
+        """Apply results of this account's finished provider batches (checked once per run).
 
-            # Draft can be gated by confidence (useful for the fallback bucket).
-            draft_min_conf = actions.get("draft_min_confidence")
-            if draft_min_conf is None:
-                draft_min_conf = 0.0
+        Failed/expired/cancelled batches, and individual requests without usable output, fall back
+        to the synchronous path so no item is left behind.
+        """
+        try:
+            batches = await self.supabase.select(
+                "llm_batches",
+                columns="id,provider_batch_id,items",
+                filters={"gmail_account_id": f"eq.{self.gmail_account_id}", "status": "eq.submitted"},
+                order="created_at.asc",
+                limit=20,
+            )
+        except SupabaseRestError as e:
+            self.errors.append(f"batch lookup failed: {e}")
+            return
+        if not batches:
+            return
+
+        client = OpenAIBatchClient()
+        for b in batches:
             try:
-                draft_min_conf_f = float(draft_min_conf)
-            except Exception:
-                draft_min_conf_f = 0.0
-
-            did_draft = False
-            if bool(actions.get("llm_draft", True)) and confidence >= draft_min_conf_f:
-                draft = await draft_reply(
-                    ctx=ctx,
-                    from_email=from_email,
-                    subject=subject,
-                    body_text=body_text,
-                    summary_json=summary
-                    or {
-                        "summary_bullets": ["(no summary)"],
-                        "what_they_want": ["(unknown)"],
-                        "suggested_next_step": "Reply if needed.",
-                    },
-                )
+                info = await client.retrieve(str(b["provider_batch_id"]))
+                status = str(info.get("status") or "")
+                if status in PENDING_STATUSES:
+                    continue
+                results = await client.results(info)
+            except Exception as e:
+                self.errors.append(f"batch {b['provider_batch_id']}: {e}")
+                continue
 
-                # Insert draft version (append-only).
-                existing = await supabase.select(
-                    "reply_drafts",
-                    columns="version",
-                    filters={"email_item_id": f"eq.{email_item_id}"},
-                    order="version.desc",
-                    limit=1,
-                )
-                next_version = (existing[0]["version"] if existing else 0) + 1
-                await supabase.insert(
-                    "reply_drafts",
+            await self._apply_batch(b.get("items") or [], results)
+            try:
+                await self.supabase.update(
+                    "llm_batches",
                     {
-                        "email_item_id": email_item_id,
-                        "version": next_version,
-                        "draft_text": str(draft.get("draft_text") or "").strip(),
-                        "instruction": None,
+                        "status": "applied" if status == "completed" else status,
+                        "completed_at": datetime.now(tz=timezone.utc).isoformat(),
                     },
+                    filters={"id": f"eq.{b['id']}"},
                 )
-                did_draft = True
+            except SupabaseRestError as e:
+                self.errors.append(f"batch {b['provider_batch_id']}: status update failed: {e}")
+
+    async def _apply_batch(self, entries: list[dict[str, Any]], results: dict[str, BatchResult]) -> None:
+        ids = sorted(
+            {str(e.get("email_item_id")) for e in entries if e.get("email_item_id")}
+            | {str(x) for e in entries for x in (e.get("earlier_ids") or [])}
+        )
+        if not ids:
+            return
+        rows = await self.supabase.select(
+            "email_items",
+            columns=_ITEM_COLUMNS,
+            filters={"id": f"in.({','.join(ids)})"},
+            limit=len(ids),
+        )
+        await self.load_bodies(rows)
+        by_id = {str(r["id"]): r for r in rows}
+        buckets_by_id = {str(b.get("id")): b for b in self.buckets}
+
+        for entry in entries:
+            item = by_id.get(str(entry.get("email_item_id")))
+            # Handled elsewhere in the meantime (or deleted): nothing to apply.
+            if item is None or item.get("status") != "batch_pending":
+                continue
+            earlier = [by_id[x] for x in (entry.get("earlier_ids") or []) if x in by_id]
+            bucket = buckets_by_id.get(str(item.get("bucket_id"))) or self.route(item)
+            await self.process_item(
+                item,
+                earlier,
+                bucket=bucket,
+                batch_results={
+                    stage: res
+                    for stage in ("classify", "summarize")
+                    if (res := results.get(f"{item['id']}:{stage}")) is not None
+                },
+            )
+            self.counts["batch_applied"] += 1
+
+    async def finish(self) -> None:
+        """Write drafts and results; only items that were written count as processed or get a push."""
+        failed: set[str] = set()
+        for email_item_id, msg in await _insert_drafts(supabase=self.supabase, drafts=self.pending_drafts):
+            failed.add(email_item_id)
+            self.counts["failed"] += 1
+            self.errors.append(f"{email_item_id}: draft insert failed: {msg}")
+            self.writer.set(email_item_id, {"status": "failed", "error_message": msg})
+        self.pending_drafts = []
+
+        for email_item_id, msg in await self.writer.flush():
+            self.errors.append(f"{email_item_id}: result write failed: {msg}")
+            if email_item_id in self.pending_done and email_item_id not in failed:
+                self.counts["failed"] += 1
+            failed.add(email_item_id)
+
+        for email_item_id, relevant in self.pending_done.items():
+            if email_item_id not in failed:
+                self.counts["processed"] += 1
+                self.counts["relevant"] += int(relevant)
+        for email_item_id, push in self.pending_pushes.items():
+            if email_item_id not in failed and self.dispatcher is not None:
+                self.dispatcher.enqueue(**push)
+                self.counts["push_queued"] += 1
+        self.pending_done = {}
+        self.pending_pushes = {}
+
+        self.counts["llm"] = self.meter.totals()
+        await self.meter.flush()
 
-            patch.update({"status": "needs_review"})
-            await supabase.update("email_items", patch, filters={"id": f"eq.{email_item_id}"})
 
-            counts["processed"] += 1
-            counts["relevant"] += 1
+async def process_ingested_for_account(
+    *,
+    supabase: SupabaseRest,
+    user_id: str,
+    gmail_account_id: str,
+    max_items: int = 25,
+    push_dispatcher: PushDispatcher | None = None,
+    backfilled_ids: list[str] | None = None,
+) -> dict[str, Any]:
+    """Process ingested emails into: bucket -> classify -> (optional) summary/draft -> (optional) push.
 
-            # Best-effort push (do not fail item if push fails).
-            push_min_conf = actions.get("push_min_confidence")
-            if push_min_conf is None:
-                push_min_conf = 0.0
-            try:
-                push_min_conf_f = float(push_min_conf)
-            except Exception:
-                push_min_conf_f = 0.0
-
-            if bool(actions.get("push", True)) and confidence >= push_min_conf_f:
-                pushed = await _send_push_to_user(
-                    supabase=supabase,
-                    user_id=user_id,
-                    email_item_id=email_item_id,
-                    from_email=from_email,
-                    one_line=_one_line_summary(summary_json=summary, subject=subject, snippet=snippet),
-                )
-                counts["pushed"] += pushed
+    Pushes are queued on `push_dispatcher` so they can be digested per user. Pass a shared dispatcher
+    to aggregate across accounts; the caller then owns `flush()`. Without one, a dispatcher is
+    created for this call and flushed before returning (and `counts["pushed"]` is filled in).
 
-            # If we created no draft and we also didn't summarize, keep the status accurate.
-            if not did_draft and not summary:
-                try:
-                    await supabase.update(
-                        "email_items",
-                        {"status": "processed"},
-                        filters={"id": f"eq.{email_item_id}"},
-                    )
-                except Exception:
-                    pass
+    With LLM_BATCH_ENABLED, items in `actions.llm_batch` buckets are submitted as a provider batch
+    and left `batch_pending`; a later call picks up the finished batch and completes them.
 
-        except Exception as e:
-            counts["failed"] += 1
-            msg = str(e)
-            errors.append(f"{email_item_id}: {msg}")
-            patch.update({"status": "failed", "error_message": msg})
-            try:
-                await supabase.update("email_items", patch, filters={"id": f"eq.{email_item_id}"})
-            except Exception:
-                pass
+    `backfilled_ids` processes exactly those `backfilled` rows (with their bodies) instead, as
+    history: classified and summarized inline, but never drafted or pushed. Backfill stops once
+    today's spend reaches BACKFILL_BUDGET_SHARE of the daily budget and leaves the rest `backfilled`.
+    """
+
+    backfill = backfilled_ids is not None
+    owns_dispatcher = push_dispatcher is None and not backfill
+    dispatcher = None if backfill else (push_dispatcher or PushDispatcher(supabase=supabase))
+
+    run = _Run(
+        supabase=supabase,
+        user_id=user_id,
+        gmail_account_id=gmail_account_id,
+        dispatcher=dispatcher,
+        backfill=backfill,
+    )
+    await run.load_user_context()
+
+    if get_settings().llm_batch_enabled and not backfill:
+        await run.collect_batches()
+
+    # Fetch ingested items (oldest first).
+    if backfilled_ids is not None:
+        filters = {"id": f"in.({','.join(backfilled_ids)})", "status": "eq.backfilled"}
+        max_items = len(backfilled_ids)
+    else:
+        filters = {"gmail_account_id": f"eq.{gmail_account_id}", "status": "eq.ingested"}
+    try:
+        items = []
+        if max_items > 0:
+            items = await supabase.select(
+                "email_items",
+                columns=_ITEM_COLUMNS,
+                filters=filters,
+                order="received_at.asc",
+                limit=max_items,
+            )
+    except SupabaseRestError as e:
+        run.errors.append(str(e))
+        items = []
+
+    await run.load_bodies(items)
+
+    # Several replies on one thread between polls: only process the latest message and
+    # feed the earlier ones in as context, so each conversation costs one LLM pass + one push.
+    # The earlier messages are filed under the latest one's bucket, so bucket views and counts
+    # still show the whole thread.
+    threads = _coalesce_threads(items)
+    deferred: list[tuple[dict[str, Any], list[dict[str, Any]], dict[str, Any] | None]] = []
+    for item, earlier in threads:
+        if backfill and run.over_budget():
+            # Out of backfill budget: the rest stays `backfilled` for another day.
+            break
+        bucket = run.route(item)
+        bucket_id = bucket.get("id") if isinstance(bucket, dict) else None
+        for e in earlier:
+            if e.get("id"):
+                run.writer.set(str(e["id"]), {"status": "superseded", "error_message": None, "bucket_id": bucket_id})
+                run.counts["superseded"] += 1
+        if not item.get("id"):
+            continue
+        actions = (bucket.get("actions") if isinstance(bucket, dict) else None) or {}
+        # Batch results are applied as live mail (drafts, pushes), so history stays inline.
+        if not backfill and _batch_eligible(actions) and not run.over_budget():
+            deferred.append((item, earlier, bucket))
+            continue
+        await run.process_item(item, earlier, bucket=bucket)
+
+    if deferred:
+        await run.submit_batch(deferred)
+
+    await run.finish()
+
+    if owns_dispatcher and dispatcher is not None:
+        run.counts["pushed"] = await dispatcher.flush()
 
-    return {"counts": counts, "errors": errors}
+    return {"counts": run.counts, "errors": run.errors}
@@ -2,13 +2,37 @@ from __future__ import annotations
 
 import base64
 import json
+import os
+import time
+from functools import lru_cache
 from typing import Any
+from urllib.parse import urlparse
 
-from pywebpush import WebPushException, webpush
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat, load_pem_private_key
 
 from .config import get_settings
+from .http_pool import get_http_client
+from .metrics import instrumented
+from .tracing import set_attributes
+
+
+# VAPID JWTs are valid for up to 24h; we mint 12h tokens and refresh a bit before expiry.
+VAPID_JWT_TTL_SECONDS = 12 * 60 * 60
+VAPID_JWT_REFRESH_MARGIN_SECONDS = 5 * 60
+
+# Single-record aes128gcm: the record size only has to exceed the encrypted payload.
+_RECORD_SIZE = 4096
+
+
+class WebPushError(RuntimeError):
+    def __init__(self, message: str, *, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
 
 
 def _b64url_to_bytes(s: str) -> bytes:
@@ -17,9 +41,17 @@ def _b64url_to_bytes(s: str) -> bytes:
     return base64.urlsafe_b64decode(padded.encode("ascii"))
 
 
-def _vapid_private_key_to_pem(vapid_private_key: str) -> str:
+def _bytes_to_b64url(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).decode("ascii").rstrip("=")
+
+
+@lru_cache(maxsize=2)
+def _vapid_private_key(vapid_private_key: str) -> ec.EllipticCurvePrivateKey:
     if "BEGIN" in vapid_private_key:
-        return vapid_private_key
+        key = load_pem_private_key(vapid_private_key.encode("ascii"), password=None)
+        if not isinstance(key, ec.EllipticCurvePrivateKey):
+            raise RuntimeError("VAPID_PRIVATE_KEY must be a P-256 EC key")
+        return key
 
     # Treat as base64url `d` from a P-256 JWK.
     d_bytes = _b64url_to_bytes(vapid_private_key)
@@ -27,20 +59,114 @@ def _vapid_private_key_to_pem(vapid_private_key: str) -> str:
         raise RuntimeError("VAPID_PRIVATE_KEY must be PEM or base64url (32 bytes when decoded)")
 
     private_value = int.from_bytes(d_bytes, byteorder="big", signed=False)
-    key = ec.derive_private_key(private_value, ec.SECP256R1())
-    pem = key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption())
-    return pem.decode("ascii")
+    return ec.derive_private_key(private_value, ec.SECP256R1())
+
+
+def _public_key_raw(key: ec.EllipticCurvePublicKey) -> bytes:
+    return key.public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+
+
+@lru_cache(maxsize=2)
+def _vapid_public_key_b64(vapid_private_key: str) -> str:
+    return _bytes_to_b64url(_public_key_raw(_vapid_private_key(vapid_private_key).public_key()))
+
+
+def _sign_es256_jwt(key: ec.EllipticCurvePrivateKey, claims: dict[str, Any]) -> str:
+    header = _bytes_to_b64url(json.dumps({"typ": "JWT", "alg": "ES256"}, separators=(",", ":")).encode())
+    body = _bytes_to_b64url(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{header}.{body}".encode("ascii")
+    r, s = decode_dss_signature(key.sign(signing_input, ec.ECDSA(hashes.SHA256())))
+    sig = r.to_bytes(32, "big") + s.to_bytes(32, "big")
+    return f"{header}.{body}.{_bytes_to_b64url(sig)}"
+
+
+# (push-service origin, VAPID public key, subject) -> (jwt, exp). One signature per origin per TTL
+# instead of per send; rotating the key or subject mints a new token right away.
+_vapid_jwt_cache: dict[tuple[str, str, str], tuple[str, int]] = {}
 
 
-def send_web_push(*, subscription: dict[str, Any], payload: dict[str, Any]) -> None:
+def _vapid_authorization(*, endpoint: str, vapid_private_key: str, vapid_subject: str) -> str:
+    url = urlparse(endpoint)
+    aud = f"{url.scheme}://{url.netloc}"
+    key = _vapid_private_key(vapid_private_key)
+    public_key = _vapid_public_key_b64(vapid_private_key)
+    cache_key = (aud, public_key, vapid_subject)
+    now = int(time.time())
+
+    cached = _vapid_jwt_cache.get(cache_key)
+    hit = bool(cached and cached[1] - VAPID_JWT_REFRESH_MARGIN_SECONDS > now)
+    set_attributes(**{"push.vapid_jwt_cache_hit": hit})
+    if cached and hit:
+        token = cached[0]
+    else:
+        exp = now + VAPID_JWT_TTL_SECONDS
+        token = _sign_es256_jwt(key, {"aud": aud, "exp": exp, "sub": vapid_subject})
+        _vapid_jwt_cache[cache_key] = (token, exp)
+
+    return f"vapid t={token}, k={public_key}"
+
+
+def _hkdf(*, salt: bytes, ikm: bytes, info: bytes, length: int) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(ikm)
+
+
+def encrypt_payload(*, plaintext: bytes, p256dh: str, auth: str) -> bytes:
+    """RFC 8291 message encryption (aes128gcm content coding, single record)."""
+    ua_public = _b64url_to_bytes(p256dh)
+    auth_secret = _b64url_to_bytes(auth)
+    if len(ua_public) != 65 or len(auth_secret) != 16:
+        raise WebPushError("Invalid subscription keys (p256dh/auth)")
+    if len(plaintext) + 1 + 16 > _RECORD_SIZE:
+        raise WebPushError("Push payload too large")
+
+    as_private = ec.generate_private_key(ec.SECP256R1())
+    as_public = _public_key_raw(as_private.public_key())
+    ua_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), ua_public)
+    ecdh_secret = as_private.exchange(ec.ECDH(), ua_key)
+
+    ikm = _hkdf(
+        salt=auth_secret,
+        ikm=ecdh_secret,
+        info=b"WebPush: info\x00" + ua_public + as_public,
+        length=32,
+    )
+    salt = os.urandom(16)
+    cek = _hkdf(salt=salt, ikm=ikm, info=b"Content-Encoding: aes128gcm\x00", length=16)
+    nonce = _hkdf(salt=salt, ikm=ikm, info=b"Content-Encoding: nonce\x00", length=12)
+
+    # 0x02 marks the last (and only) record.
+    ciphertext = AESGCM(cek).encrypt(nonce, plaintext + b"\x02", None)
+    header = salt + _RECORD_SIZE.to_bytes(4, "big") + bytes([len(as_public)]) + as_public
+    return header + ciphertext
+
+
+@instrumented("push.send", provider="webpush")
+async def send_web_push(*, subscription: dict[str, Any], payload: dict[str, Any], ttl: int = 24 * 60 * 60) -> None:
     settings = get_settings()
     if not settings.vapid_private_key or not settings.vapid_public_key or not settings.vapid_subject:
         raise RuntimeError("Missing VAPID keys (VAPID_PUBLIC_KEY/VAPID_PRIVATE_KEY/VAPID_SUBJECT)")
 
-    pem_private = _vapid_private_key_to_pem(settings.vapid_private_key)
-    webpush(
-        subscription_info=subscription,
-        data=json.dumps(payload),
-        vapid_private_key=pem_private,
-        vapid_claims={"sub": settings.vapid_subject},
+    endpoint = subscription.get("endpoint")
+    keys = subscription.get("keys") or {}
+    if not endpoint or not keys.get("p256dh") or not keys.get("auth"):
+        raise WebPushError("Invalid subscription")
+
+    body = encrypt_payload(
+        plaintext=json.dumps(payload).encode("utf-8"),
+        p256dh=keys["p256dh"],
+        auth=keys["auth"],
     )
+    headers = {
+        "authorization": _vapid_authorization(
+            endpoint=endpoint,
+            vapid_private_key=settings.vapid_private_key,
+            vapid_subject=settings.vapid_subject,
+        ),
+        "content-encoding": "aes128gcm",
+        "content-type": "application/octet-stream",
+        "ttl": str(ttl),
+    }
+
+    resp = await get_http_client().post(endpoint, content=body, headers=headers)
+    if resp.status_code > 202:
+        raise WebPushError(f"Push failed: {resp.status_code} {resp.text}", status_code=resp.status_code)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+import anyio
+
+from .config import get_settings
+from .push import WebPushError, send_web_push
+from .supabase_rest import SupabaseRest, SupabaseRestError
+from .tracing import current_traceparent, set_attributes, start_span
+
+
+@dataclass
+class QueuedPush:
+    payload: dict[str, Any]
+    bucket_name: str | None
+    digest: bool
+    # Span that queued it (the email's processing span), so delivery shows up in the same trace.
+    traceparent: str | None = None
+
+
+def _digest_payload(queued: list[QueuedPush]) -> dict[str, Any]:
+    by_bucket = Counter(q.bucket_name or "Other" for q in queued)
+    return {
+        "email_item_id": None,
+        "title": f"{len(queued)} new emails",
+        "body": " · ".join(f"{name} {n}" for name, n in by_bucket.most_common())[:180],
+        "url": "/inbox",
+        "count": len(queued),
+    }
+
+
+class PushDispatcher:
+    """Per-cycle web push fan-out.
+
+    Notifications are queued with `enqueue()` and delivered by `flush()`: subscriptions are loaded
+    once per user, sends run concurrently (bounded), and the `last_used_at` / expired-subscription
+    bookkeeping is written in bulk.
+
+    Items from buckets with `actions.push_digest` are folded into one summary notification per user;
+    once a user has more than `digest_threshold` queued items, everything for that user is.
+    """
+
+    def __init__(
+        self,
+        *,
+        supabase: SupabaseRest,
+        max_concurrency: int = 8,
+        digest_threshold: int | None = None,
+    ) -> None:
+        self._supabase = supabase
+        self._limiter = anyio.CapacityLimiter(max_concurrency)
+        self._digest_threshold = (
+            digest_threshold if digest_threshold is not None else get_settings().push_digest_threshold
+        )
+        self._queued: dict[str, list[QueuedPush]] = {}
+        self._subs_by_user: dict[str, list[dict[str, Any]]] = {}
+        self._used_ids: set[str] = set()
+        self._expired_ids: set[str] = set()
+
+    async def _subscriptions(self, user_id: str) -> list[dict[str, Any]]:
+        cached = self._subs_by_user.get(user_id)
+        set_attributes(**{"push.subscriptions_cache_hit": cached is not None})
+        if cached is not None:
+            return cached
+        try:
+            subs = await self._supabase.select(
+                "push_subscriptions",
+                columns="id,endpoint,p256dh,auth",
+                filters={"user_id": f"eq.{user_id}"},
+                limit=100,
+            )
+        except SupabaseRestError:
+            return []
+        subs = [s for s in subs if s.get("endpoint") and s.get("p256dh") and s.get("auth")]
+        self._subs_by_user[user_id] = subs
+        return subs
+
+    async def _send_one(self, sub: dict[str, Any], payload: dict[str, Any]) -> bool:
+        sub_id = sub.get("id")
+        subscription_info = {"endpoint": sub["endpoint"], "keys": {"p256dh": sub["p256dh"], "auth": sub["auth"]}}
+        try:
+            async with self._limiter:
+                await send_web_push(subscription=subscription_info, payload=payload)
+        except WebPushError as e:
+            # Drop expired subscriptions to keep the table clean.
+            if e.status_code in (404, 410) and sub_id:
+                self._expired_ids.add(sub_id)
+            return False
+        except Exception:
+            return False
+        if sub_id:
+            self._used_ids.add(sub_id)
+        return True
+
+    async def send_to_user(self, *, user_id: str, payload: dict[str, Any]) -> int:
+        subs = [s for s in await self._subscriptions(user_id) if s.get("id") not in self._expired_ids]
+        if not subs:
+            return 0
+
+        results: list[bool] = []
+
+        async def run(sub: dict[str, Any]) -> None:
+            results.append(await self._send_one(sub, payload))
+
+        async with anyio.create_task_group() as tg:
+            for sub in subs:
+                tg.start_soon(run, sub)
+        return sum(1 for ok in results if ok)
+
+    def enqueue(
+        self,
+        *,
+        user_id: str,
+        payload: dict[str, Any],
+        bucket_name: str | None,
+        digest: bool,
+        traceparent: str | None = None,
+    ) -> None:
+        """Queue one push; `traceparent` (default: the current span) is the trace delivery continues."""
+        self._queued.setdefault(user_id, []).append(
+            QueuedPush(
+                payload=payload,
+                bucket_name=bucket_name,
+                digest=digest,
+                traceparent=traceparent or current_traceparent(),
+            )
+        )
+
+    def _plan(self, queued: list[QueuedPush]) -> list[dict[str, Any]]:
+        if len(queued) > self._digest_threshold:
+            return [_digest_payload(queued)]
+        single = [q.payload for q in queued if not q.digest]
+        digest = [q for q in queued if q.digest]
+        if len(digest) == 1:
+            single.append(digest[0].payload)
+        elif digest:
+            single.append(_digest_payload(digest))
+        return single
+
+    async def _deliver(self, user_id: str, queued: list[QueuedPush]) -> int:
+        origin = {q.payload.get("email_item_id"): q.traceparent for q in queued}
+        pushed = 0
+        for payload in self._plan(queued):
+            email_item_id = payload.get("email_item_id")
+            # Single notifications continue their email's trace; digests link to every email they cover.
+            with start_span(
+                "push.deliver",
+                attributes={"user_id": user_id, "email_item_id": email_item_id, "push.count": payload.get("count", 1)},
+                traceparent=origin.get(email_item_id) if email_item_id else None,
+                links=None if email_item_id else [q.traceparent for q in queued if q.traceparent],
+            ) as span:
+                sent = await self.send_to_user(user_id=user_id, payload=payload)
+                span.set_attribute("push.delivered", sent)
+            pushed += sent
+        return pushed
+
+    async def flush(self) -> int:
+        """Deliver queued notifications, then write bookkeeping (one bulk UPDATE + one bulk DELETE).
+
+        Best-effort. Returns the number of device notifications delivered.
+        """
+        queued = self._queued
+        self._queued = {}
+        delivered: list[int] = []
+
+        async def run(user_id: str, items: list[QueuedPush]) -> None:
+            delivered.append(await self._deliver(user_id, items))
+
+        async with anyio.create_task_group() as tg:
+            for user_id, items in queued.items():
+                tg.start_soon(run, user_id, items)
+
+        expired = sorted(self._expired_ids)
+        used = sorted(self._used_ids - self._expired_ids)
+        self._expired_ids.clear()
+        self._used_ids.clear()
+
+        if used:
+            try:
+                await self._supabase.update(
+                    "push_subscriptions",
+                    {"last_used_at": datetime.now(tz=timezone.utc).isoformat()},
+                    filters={"id": f"in.({','.join(used)})"},
+                )
+            except Exception:
+                pass
+        if expired:
+            try:
+                await self._supabase.delete("push_subscriptions", filters={"id": f"in.({','.join(expired)})"})
+            except Exception:
+                pass
+            for user_id, subs in self._subs_by_user.items():
+                self._subs_by_user[user_id] = [s for s in subs if s.get("id") not in expired]
+
+        return sum(delivered)
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from .config import get_settings
+from .http_pool import get_http_client
+from .metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE, HTTP_RETRIES, RATE_LIMIT_WAIT
+from .tracing import set_attributes
+
+
+# Statuses worth retrying: throttled, or the upstream is briefly unavailable.
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Gmail API quota units per method (per-user limit is 250 units/second).
+GMAIL_QUOTA_UNITS = {
+    "profile": 1,
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.send": 100,
+    "watch": 100,
+}
+
+# Transport errors raised before the request reached the server: safe to retry even for POSTs.
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """`Retry-After` as seconds (delta-seconds or HTTP-date), or None if absent/unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(tz=timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    base_delay_s: float
+    max_delay_s: float
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2**attempt)))
+
+
+def default_policy() -> RetryPolicy:
+    settings = get_settings()
+    return RetryPolicy(
+        max_attempts=max(1, settings.http_max_attempts),
+        base_delay_s=max(0.0, settings.http_backoff_base_s),
+        max_delay_s=max(0.0, settings.http_backoff_max_s),
+    )
+
+
+class TokenBucket:
+    """Reservation-style token bucket: callers take tokens (possibly into debt) and sleep it off.
+
+    No lock is needed on a single event loop: reserve() never awaits.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens now; returns how long the caller must wait before sending."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= min(cost, self.capacity)
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(wait, self._blocked_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds` (the server said so via Retry-After)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        now = time.monotonic()
+        return self._tokens + (now - self._updated) * self.rate >= self.capacity and now >= self._blocked_until
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures -> half-open after `reset_s`.
+
+    Only server-side failures (5xx, transport errors) count; 4xx means the upstream is up.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _GAUGE = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, service: str, *, failure_threshold: int, reset_s: float) -> None:
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_s:
+            self._set(self.HALF_OPEN)
+        return self._state
+
+    def _set(self, state: str) -> None:
+        self._state = state
+        CIRCUIT_STATE.set(self._GAUGE[state], service=self.service)
+
+    def check(self) -> None:
+        if self.failure_threshold > 0 and self.state == self.OPEN:
+            CIRCUIT_REJECTIONS.inc(service=self.service)
+            raise CircuitOpenError(f"{self.service} circuit open; retry in {self.reset_s:.0f}s")
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self._state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or (self.failure_threshold > 0 and self._failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+# Least recently used first. Idle buckets are dropped as new ones arrive; past _MAX_BUCKETS the
+# oldest goes even if busy (it only forgets a little debt).
+_buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+_MAX_BUCKETS = 1000
+
+
+def breaker(service: str) -> CircuitBreaker:
+    b = _breakers.get(service)
+    if b is None:
+        settings = get_settings()
+        b = CircuitBreaker(
+            service,
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_s=settings.circuit_reset_s,
+        )
+        _breakers[service] = b
+    return b
+
+
+def _bucket(key: str, rate: float) -> TokenBucket:
+    b = _buckets.get(key)
+    if b is not None:
+        _buckets.move_to_end(key)
+        return b
+    while _buckets:
+        oldest = next(iter(_buckets.values()))
+        if len(_buckets) < _MAX_BUCKETS and not oldest.idle:
+            break
+        _buckets.popitem(last=False)
+    b = _buckets[key] = TokenBucket(rate)
+    return b
+
+
+def _limiter(service: str, host: str, quota_key: str | None) -> TokenBucket | None:
+    """Gmail: per-account quota-unit bucket. Other hosts: per-host bucket from HTTP_HOST_RPS_JSON."""
+    if service == "gmail" and quota_key:
+        rate = get_settings().gmail_quota_units_per_second
+        if rate <= 0:
+            return None
+        # Keyed by the account (not its token, which changes on refresh) so every token shares it.
+        # Hashed because callers without an account yet pass the token itself.
+        return _bucket("gmail:" + hashlib.sha256(quota_key.encode("utf-8")).hexdigest()[:16], rate)
+    rate = get_settings().http_host_rps.get(host, 0.0)
+    return _bucket(f"host:{host}", rate) if rate > 0 else None
+
+
+async def _throttle(service: str, bucket: TokenBucket | None, cost: float) -> None:
+    if bucket is None:
+        return
+    wait = bucket.reserve(cost)
+    if wait > 0:
+        RATE_LIMIT_WAIT.observe(wait, service=service)
+        await asyncio.sleep(wait)
+
+
+def _retry(service: str, reason: str, attempt: int) -> None:
+    HTTP_RETRIES.inc(service=service, reason=reason)
+    set_attributes(**{"http.retries": attempt + 1})
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    service: str,
+    idempotent: bool | None = None,
+    quota_key: str | None = None,
+    cost: float = 1.0,
+    policy: RetryPolicy | None = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """Send a request on the pooled client with rate limiting, retries and a per-service breaker.
+
+    Retries 408/429/5xx and transport errors with jittered exponential backoff, honouring
+    `Retry-After` (a wait longer than the policy's max delay returns the response instead).
+    Non-idempotent requests (default: anything but GET/PUT/PATCH/DELETE) are only retried when
+    the server cannot have acted: 429, or a connection that never opened. The final response is
+    returned as-is, so callers keep their own status handling; `CircuitOpenError` is raised
+    without a request when `service` is failing.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in {"GET", "HEAD", "PUT", "PATCH", "DELETE"}
+    policy = policy or default_policy()
+    circuit = breaker(service)
+    bucket = _limiter(service, (urlsplit(url).hostname or "").lower(), quota_key)
+    client = get_http_client()
+
+    attempt = 0
+    while True:
+        circuit.check()
+        await _throttle(service, bucket, cost)
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            circuit.record_failure()
+            retryable = idempotent or isinstance(e, _NOT_SENT)
+            if not retryable or attempt + 1 >= policy.max_attempts:
+                raise
+            _retry(service, type(e).__name__, attempt)
+            await asyncio.sleep(policy.backoff(attempt))
+            attempt += 1
+            continue
+
+        if resp.status_code >= 500:
+            circuit.record_failure()
+        else:
+            circuit.record_success()
+        if resp.status_code not in RETRY_STATUSES or attempt + 1 >= policy.max_attempts:
+            return resp
+        if not idempotent and resp.status_code != 429:
+            return resp
+
+        retry_after = parse_retry_after(resp.headers.get("retry-after"))
+        if retry_after is not None and retry_after > policy.max_delay_s:
+            return resp
+        delay = retry_after if retry_after is not None else policy.backoff(attempt)
+        _retry(service, str(resp.status_code), attempt)
+        if resp.status_code == 429 and bucket is not None:
+            # Everyone sharing this quota backs off, not just this caller; _throttle() waits it out.
+            bucket.pause(delay)
+        else:
+            await asyncio.sleep(delay)
+        attempt += 1
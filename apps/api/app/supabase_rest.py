@@ -2,9 +2,9 @@ from __future__ import annotations
 
 from typing import Any, Literal
 
-import httpx
-
 from .config import get_settings
+from .metrics import instrumented
+from .resilience import request
 
 
 class SupabaseRestError(RuntimeError):
@@ -28,6 +28,7 @@ class SupabaseRest:
             "content-type": "application/json",
         }
 
+    @instrumented("supabase.select", provider="supabase")
     async def select(
         self,
         table: str,
@@ -45,12 +46,14 @@ class SupabaseRest:
         if limit is not None:
             params["limit"] = str(limit)
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.get(f"{self._base}/{table}", params=params, headers=self._headers())
+        resp = await request(
+            "GET", f"{self._base}/{table}", service="supabase", params=params, headers=self._headers(), timeout=30
+        )
         if resp.status_code >= 400:
             raise SupabaseRestError(f"Supabase select failed: {resp.status_code} {resp.text}")
         return resp.json()
 
+    @instrumented("supabase.insert", provider="supabase")
     async def insert(
         self,
         table: str,
@@ -69,12 +72,22 @@ class SupabaseRest:
         headers = self._headers()
         headers["Prefer"] = ",".join(prefer)
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.post(f"{self._base}/{table}", params=params, headers=headers, json=rows)
+        # Upserts can be replayed safely; plain inserts only retry when nothing reached the server.
+        resp = await request(
+            "POST",
+            f"{self._base}/{table}",
+            service="supabase",
+            idempotent=upsert,
+            params=params,
+            headers=headers,
+            json=rows,
+            timeout=30,
+        )
         if resp.status_code >= 400:
             raise SupabaseRestError(f"Supabase insert failed: {resp.status_code} {resp.text}")
         return resp.json()
 
+    @instrumented("supabase.update", provider="supabase")
     async def update(
         self,
         table: str,
@@ -85,12 +98,14 @@ class SupabaseRest:
         headers = self._headers()
         headers["Prefer"] = "return=representation"
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.patch(f"{self._base}/{table}", params=filters, headers=headers, json=patch)
+        resp = await request(
+            "PATCH", f"{self._base}/{table}", service="supabase", params=filters, headers=headers, json=patch, timeout=30
+        )
         if resp.status_code >= 400:
             raise SupabaseRestError(f"Supabase update failed: {resp.status_code} {resp.text}")
         return resp.json()
 
+    @instrumented("supabase.delete", provider="supabase")
     async def delete(
         self,
         table: str,
@@ -100,8 +115,35 @@ class SupabaseRest:
         headers = self._headers()
         headers["Prefer"] = "return=representation"
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.delete(f"{self._base}/{table}", params=filters, headers=headers)
+        resp = await request(
+            "DELETE", f"{self._base}/{table}", service="supabase", params=filters, headers=headers, timeout=30
+        )
         if resp.status_code >= 400:
             raise SupabaseRestError(f"Supabase delete failed: {resp.status_code} {resp.text}")
         return resp.json()
+
+    @instrumented("supabase.rpc", provider="supabase")
+    async def rpc(
+        self,
+        fn: str,
+        params: dict[str, Any] | None = None,
+    ) -> Any:
+        """Call a Postgres function exposed by PostgREST (`POST /rpc/<fn>`).
+
+        Functions may have side effects (counters, inserts), so retries are limited to requests the
+        server never saw.
+        """
+        resp = await request(
+            "POST",
+            f"{self._base}/rpc/{fn}",
+            service="supabase",
+            idempotent=False,
+            headers=self._headers(),
+            json=params or {},
+            timeout=30,
+        )
+        if resp.status_code >= 400:
+            raise SupabaseRestError(f"Supabase rpc {fn} failed: {resp.status_code} {resp.text}")
+        if not resp.content:
+            return None
+        return resp.json()
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from .config import get_settings
+
+
+SERVICE_NAME = "inbox-copilot-api"
+
+# OTLP status codes.
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Finished spans are buffered and written when a root span ends (or the buffer gets this big).
+_MAX_BUFFERED_SPANS = 512
+# Batches waiting for the writer thread; beyond this (a stuck disk) new batches are dropped.
+_MAX_QUEUED_BATCHES = 64
+
+
+class Span:
+    """A single timed operation. Ids and field names follow OpenTelemetry / W3C trace context."""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "start_ns", "end_ns", "attributes", "status", "status_message", "links")
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None,
+        attributes: dict[str, Any] | None = None,
+        links: list[tuple[str, str]] | None = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes: dict[str, Any] = {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.links = links or []
+        if attributes:
+            self.set_attributes(**attributes)
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for k, v in attributes.items():
+            self.set_attribute(k, v)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"[:500]
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan(Span):
+    """Returned when tracing is disabled; accepts and drops everything."""
+
+    def __init__(self) -> None:
+        super().__init__(name="", trace_id="0" * 32, parent_span_id=None)
+
+    @property
+    def recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+    def record_error(self, error: BaseException) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def _otlp_value(v: Any) -> dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    if isinstance(v, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(x) for x in v]}}
+    return {"stringValue": str(v)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+def _otlp_span(span: Span) -> dict[str, Any]:
+    out: dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": span.status, **({"message": span.status_message} if span.status_message else {})},
+    }
+    if span.parent_span_id:
+        out["parentSpanId"] = span.parent_span_id
+    if span.links:
+        out["links"] = [{"traceId": t, "spanId": s} for t, s in span.links]
+    return out
+
+
+class JsonFileExporter:
+    """Appends OTLP/JSON `ExportTraceServiceRequest` objects, one per line.
+
+    Same format as the OpenTelemetry Collector file exporter, so the file can be replayed into a
+    collector (`otlpjsonfile` receiver) or inspected offline with `jq`. Lines are written by a
+    background thread, so ending a span on the event loop never waits for the disk.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._buffer: list[Span] = []
+        self._queue: queue.Queue[list[Span]] = queue.Queue(maxsize=_MAX_QUEUED_BATCHES)
+        self._writer: threading.Thread | None = None
+
+    def add(self, span: Span, *, flush: bool) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if not flush and len(self._buffer) < _MAX_BUFFERED_SPANS:
+                return
+            spans, self._buffer = self._buffer, []
+        self._submit(spans)
+
+    def flush(self) -> None:
+        """Hands over buffered spans and blocks until everything queued is written (for shutdown)."""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if spans:
+            self._submit(spans)
+        self._queue.join()
+
+    def _submit(self, spans: list[Span]) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            try:
+                self._write(spans)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    def _write(self, spans: list[Span]) -> None:
+        doc = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [_otlp_span(s) for s in spans]}],
+                }
+            ]
+        }
+        line = json.dumps(doc, ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            parent = os.path.dirname(self._path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            # Tracing must never break the request path.
+            pass
+
+
+_exporter: JsonFileExporter | None = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> JsonFileExporter | None:
+    """The configured exporter, or None when TRACE_EXPORT_PATH is unset (tracing off)."""
+    global _exporter
+    path = get_settings().trace_export_path
+    if not path:
+        return None
+    with _exporter_lock:
+        if _exporter is None or _exporter._path != path:
+            _exporter = JsonFileExporter(path)
+        return _exporter
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """W3C `traceparent` -> (trace_id, parent span_id), or None if malformed."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+def current_span() -> Span:
+    return _current_span.get() or _NOOP_SPAN
+
+
+def current_traceparent() -> str | None:
+    """Trace context to hand to background work (queues, threads, other processes)."""
+    span = _current_span.get()
+    return span.traceparent() if span is not None else None
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Annotate the innermost active span (no-op when tracing is off)."""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(**attributes)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    *,
+    attributes: dict[str, Any] | None = None,
+    traceparent: str | None = None,
+    links: list[str] | None = None,
+) -> Iterator[Span]:
+    """Open a child of the current span (or of `traceparent`, for work resumed elsewhere).
+
+    Context propagates through anyio task groups and `anyio.to_thread.run_sync` automatically,
+    since both copy contextvars.
+    """
+    exporter = get_exporter()
+    if exporter is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_span_id = remote
+    elif parent is not None:
+        trace_id, parent_span_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_span_id = secrets.token_hex(16), None
+
+    span = Span(
+        name=name,
+        trace_id=trace_id,
+        parent_span_id=parent_span_id,
+        attributes=attributes,
+        links=[p for p in (parse_traceparent(link) for link in links or []) if p is not None],
+    )
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_ns = time.time_ns()
+        exporter.add(span, flush=parent is None)
@@ -0,0 +1,130 @@
+"""Storage / transfer savings of the body codec.
+
+Usage (from apps/api):
+
+    python -m bench.compression                      # built-in synthetic sample
+    python -m bench.compression --corpus ./mail/     # directory of .txt / .eml files
+    python -m bench.compression --corpus ./mail/ --write-dict ./mail.zdict
+
+The dictionary is trained on the first half of the corpus and evaluated on the second half.
+Point COMPRESSION_DICT_PATH at the `--write-dict` output to use it in the API.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import zlib
+from pathlib import Path
+
+from app.compression import DEFAULT_DICTIONARY, train_dictionary
+
+
+def _synthetic_corpus(n: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    names = ["Alex", "Sam", "Priya", "Jordan", "Wei", "Maria", "Tom", "Aisha"]
+    topics = ["pricing for 20 seats", "the Q3 invoice", "a bug in the export", "the NDA draft", "our demo call"]
+    footer = (
+        "\n\n--\nYou are receiving this email because you signed up at example.com.\n"
+        "Unsubscribe | Manage preferences | View in browser | Privacy Policy\n"
+        "Example Inc, 123 Market St, San Francisco, CA 94105\n"
+    )
+    out: list[str] = []
+    for i in range(n):
+        name = rng.choice(names)
+        topic = rng.choice(topics)
+        body = [f"Hi {rng.choice(names)},", "", f"Following up on {topic}."]
+        body += [" ".join(rng.choice(topics).split()[::-1]) + "." for _ in range(rng.randint(2, 20))]
+        body += ["", "Let me know if you have any questions.", "", "Best regards,", name]
+        if i % 3 == 0:
+            body.append(footer)
+        if i % 4 == 0:
+            body.append(f"\nOn Mon, {name} <{name.lower()}@example.com> wrote:\n> " + "\n> ".join(body[:6]))
+        out.append("\n".join(body))
+    return out
+
+
+def _load_corpus(path: Path) -> list[str]:
+    files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in (".txt", ".eml"))
+    return [p.read_text("utf-8", errors="replace") for p in files]
+
+
+def _zlib_size(raw: bytes, zdict: bytes | None) -> int:
+    c = zlib.compressobj(level=6, zdict=zdict) if zdict else zlib.compressobj(level=6)
+    return len(c.compress(raw) + c.flush())
+
+
+def _transfer_size(stored_len: int, compressed: bool) -> int:
+    # PostgREST ships the column as a JSON string; compressed payloads travel as base64.
+    return 4 * ((stored_len + 2) // 3) if compressed else stored_len
+
+
+def run(bodies: list[str], *, min_bytes: int = 512) -> tuple[dict[str, dict[str, int]], bytes]:
+    half = max(1, len(bodies) // 2)
+    trained = train_dictionary(bodies[:half])
+    evaluate = bodies[half:] or bodies
+
+    unique: dict[str, bytes] = {}
+    for b in evaluate:
+        raw = b.encode("utf-8")
+        unique.setdefault(hashlib.sha256(raw).hexdigest(), raw)
+
+    variants: dict[str, bytes | None | bool] = {
+        "plain": False,
+        "zlib": None,
+        "zlib+default_dict": DEFAULT_DICTIONARY,
+        "zlib+trained_dict": trained,
+    }
+    report: dict[str, dict[str, int]] = {}
+    for name, zdict in variants.items():
+        stored = transfer = 0
+        for raw in unique.values():
+            if zdict is False or len(raw) < min_bytes:
+                size, compressed = len(raw), False
+            else:
+                size = _zlib_size(raw, zdict if isinstance(zdict, bytes) else None)
+                size, compressed = (size, True) if size < len(raw) else (len(raw), False)
+            stored += size
+            transfer += _transfer_size(size, compressed)
+        report[name] = {"stored_bytes": stored, "transfer_bytes": transfer}
+
+    raw_total = sum(len(b.encode("utf-8")) for b in evaluate)
+    report["inline_no_dedupe"] = {"stored_bytes": raw_total, "transfer_bytes": raw_total}
+    return report, trained
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", type=Path, help="Directory of .txt/.eml bodies (default: synthetic sample)")
+    ap.add_argument("--samples", type=int, default=2000, help="Synthetic sample size")
+    ap.add_argument("--min-bytes", type=int, default=512, help="Bodies smaller than this stay plain")
+    ap.add_argument("--write-dict", type=Path, help="Write the trained dictionary here")
+    ap.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = ap.parse_args()
+
+    bodies = _load_corpus(args.corpus) if args.corpus else _synthetic_corpus(args.samples)
+    if not bodies:
+        raise SystemExit("Empty corpus")
+
+    report, trained = run(bodies, min_bytes=args.min_bytes)
+    if args.write_dict:
+        args.write_dict.write_bytes(trained)
+
+    if args.json:
+        print(json.dumps({"bodies": len(bodies), "dict_bytes": len(trained), "report": report}, indent=2))
+        return
+
+    base = report["inline_no_dedupe"]
+    print(f"bodies={len(bodies)} trained_dict={len(trained)}B (evaluated on the held-out half)")
+    print(f"{'variant':<22}{'stored':>14}{'ratio':>8}{'transfer':>14}{'ratio':>8}")
+    for name, r in report.items():
+        print(
+            f"{name:<22}{r['stored_bytes']:>14,}{r['stored_bytes'] / base['stored_bytes']:>8.2f}"
+            f"{r['transfer_bytes']:>14,}{r['transfer_bytes'] / base['transfer_bytes']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""Deterministic synthetic mailboxes in Gmail API `format=full` shape.
+
+Usage (from apps/api):
+
+    python -m bench.corpus --accounts 10 --messages 10000 --stats          # stream + summarise only
+    python -m bench.corpus --accounts 10 --messages 10000 --out ./corpus    # one <account>.jsonl each
+    python -m bench.pipeline --corpus ./corpus                              # replay through the pipeline
+
+The same (seed, account, spec) always yields the same messages; only `internalDate` moves with
+`--end-ms` (default: now), so mailboxes stay "recent" for the poll loop. Messages are generated
+lazily, oldest first, so 1M-message corpora stream in constant memory.
+
+Mix (weights via --mix kind=weight,...): plain text, HTML-only, multipart/alternative,
+newsletters (HTML-heavy, List-Unsubscribe, List-Id), and multipart/mixed with attachments
+(20 KB - `--max-attachment-bytes`, log-uniform). Replies (`--reply-rate`) join existing threads
+with In-Reply-To/References and the quoted history, so some threads grow long. All bodies are
+base64url like the real API. Attachments carry an `attachmentId` as Gmail returns them; with
+`--attachment-mode inline` their bytes are embedded as `body.data` instead (parser stress).
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+
+KINDS = ("plain", "html", "alternative", "newsletter", "attachment")
+DEFAULT_MIX: dict[str, float] = {"plain": 0.30, "html": 0.10, "alternative": 0.25, "newsletter": 0.20, "attachment": 0.15}
+
+# Subject/body vocabulary per intent; most intents hit a default bucket's keywords.
+_INTENTS: dict[str, tuple[list[str], list[str]]] = {
+    "priority": (
+        ["Action required: {thing}", "URGENT: {thing} past due", "Deadline tomorrow for {thing}"],
+        ["This is overdue and needs your attention today.", "Please handle this asap, the deadline is Friday."],
+    ),
+    "sales": (
+        ["Pricing for {n} seats", "Quote request: {thing}", "Can we book a demo?", "Trial extension for {company}"],
+        ["We're evaluating tools and would like a quote for {n} seats.", "Could you share pricing and trial terms?"],
+    ),
+    "support": (
+        ["Bug in the {thing} export", "Help: {thing} is broken", "Error when saving {thing}"],
+        ["Since this morning the export fails with an error.", "We can't log in and need help urgently-ish."],
+    ),
+    "hiring": (
+        ["Application: {role}", "Interview availability for {role}", "Candidate referral - {name}"],
+        ["Please find my resume attached for the {role} opening.", "Are you free for an interview next week?"],
+    ),
+    "finance": (
+        ["Invoice #{n} from {company}", "Your receipt for {thing}", "Payment confirmation {n}"],
+        ["Attached is the invoice for last month's billing period.", "Your card was charged for the renewal."],
+    ),
+    "ops": (
+        ["NDA for {company}", "Updated MSA and DPA", "Contract redlines - {company}"],
+        ["Legal has reviewed the contract; see the comments on the terms.", "Please countersign the NDA."],
+    ),
+    "personal": (
+        ["Lunch on {day}?", "Photos from the weekend", "Re: catching up"],
+        ["It was great to see you, let's do it again soon.", "Are you around on {day}? Coffee?"],
+    ),
+}
+_INTENT_WEIGHTS = {"priority": 0.06, "sales": 0.18, "support": 0.18, "hiring": 0.08, "finance": 0.2, "ops": 0.1, "personal": 0.2}
+
+_NAMES = ["Alex Kim", "Sam Patel", "Priya Nair", "Jordan Lee", "Wei Chen", "Maria Garcia", "Tom Berg", "Aisha Bello"]
+_COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne"]
+_THINGS = ["Q3 report", "CSV export", "dashboard", "API key", "onboarding", "SSO setup", "billing page", "roadmap"]
+_ROLES = ["Backend Engineer", "Designer", "Account Executive", "Data Analyst"]
+_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+_FILLER = (
+    "Let me know if you have any questions. Happy to jump on a call if that's easier. "
+    "We appreciate your help and look forward to hearing back from you. "
+)
+_NEWSLETTER_SENDERS = ["news@updates.{d}", "no-reply@{d}", "digest@mail.{d}", "hello@{d}"]
+_ATTACHMENT_TYPES = [
+    ("application/pdf", "pdf"),
+    ("image/png", "png"),
+    ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    ("application/zip", "zip"),
+]
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    accounts: int = 1
+    messages: int = 1000  # per account
+    seed: int = 42
+    window_s: int = 3000  # internalDate spread, ending at end_ms
+    end_ms: int | None = None
+    reply_rate: float = 0.35
+    attachment_mode: str = "id"  # "id" (as Gmail format=full returns them) or "inline"
+    max_attachment_bytes: int = 5_000_000
+    mix: dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _text_part(mime: str, text: str, part_id: str) -> dict[str, Any]:
+    raw = text.encode("utf-8")
+    return {
+        "partId": part_id,
+        "mimeType": mime,
+        "filename": "",
+        "headers": [{"name": "Content-Type", "value": f"{mime}; charset=UTF-8"}],
+        "body": {"size": len(raw), "data": _b64url(raw)},
+    }
+
+
+def _html_from_text(text: str) -> str:
+    paras = "".join(f"<p>{line}</p>" for line in text.split("\n") if line.strip())
+    return f'<html><body><div dir="ltr" style="font-family:Arial,sans-serif">{paras}</div></body></html>'
+
+
+class _Thread:
+    __slots__ = ("thread_id", "subject", "intent", "message_ids", "history", "participant")
+
+    def __init__(self, thread_id: str, subject: str, participant: str, intent: str = "personal") -> None:
+        self.thread_id = thread_id
+        self.subject = subject
+        self.intent = intent
+        self.participant = participant
+        self.message_ids: list[str] = []
+        self.history: list[str] = []
+
+
+class _MailboxGenerator:
+    def __init__(self, account: str, spec: CorpusSpec) -> None:
+        self.account = account
+        self.spec = spec
+        self.rng = random.Random(f"{spec.seed}:{account}")
+        self.address = f"{account}@example.com"
+        self.threads: list[_Thread] = []
+        # A handful of long-running conversations that keep attracting replies.
+        self.hot: list[_Thread] = []
+        kinds = [k for k in KINDS if spec.mix.get(k, 0) > 0]
+        self.kinds = kinds or list(KINDS)
+        self.kind_weights = [spec.mix.get(k, 1.0) for k in self.kinds]
+
+    def _hex(self, n: int = 16) -> str:
+        return "%0*x" % (n, self.rng.getrandbits(4 * n))
+
+    def _fill(self, template: str) -> str:
+        r = self.rng
+        return template.format(
+            n=r.randint(2, 9999),
+            thing=r.choice(_THINGS),
+            company=r.choice(_COMPANIES),
+            name=r.choice(_NAMES),
+            role=r.choice(_ROLES),
+            day=r.choice(_DAYS),
+        )
+
+    def _person(self) -> tuple[str, str]:
+        name = self.rng.choice(_NAMES)
+        company = self.rng.choice(_COMPANIES).lower()
+        return name, f"{name.split()[0].lower()}@{company}.com"
+
+    def _prose(self, intent: str) -> str:
+        r = self.rng
+        _, lines = _INTENTS[intent]
+        paras = [self._fill(r.choice(lines)) for _ in range(r.randint(1, 4))]
+        paras += [_FILLER * r.randint(1, 6)]
+        return "Hi,\n\n" + "\n\n".join(paras) + f"\n\nBest,\n{r.choice(_NAMES).split()[0]}"
+
+    def _newsletter_html(self, company: str) -> str:
+        r = self.rng
+        items = "".join(
+            f'<tr><td style="padding:12px;border-bottom:1px solid #eee"><h3 style="margin:0">{self._fill("{thing} update")}</h3>'
+            f'<p style="color:#555">{_FILLER * r.randint(1, 3)}</p>'
+            f'<a href="https://{company}.example/article/{self._hex(8)}?utm_source=newsletter">Read more</a></td></tr>'
+            for _ in range(r.randint(5, 40))
+        )
+        return (
+            '<!DOCTYPE html><html><head><meta charset="utf-8"><style>td{font-family:Helvetica}</style></head><body>'
+            f'<table width="100%" cellpadding="0" cellspacing="0"><tr><td><a href="https://{company}.example/view">View in browser</a></td></tr>'
+            f"{items}"
+            f'<tr><td style="font-size:11px;color:#999">You are receiving this because you subscribed to the {company} digest. '
+            f'<a href="https://{company}.example/unsubscribe/{self._hex(12)}">Unsubscribe</a></td></tr></table></body></html>'
+        )
+
+    def _attachment(self, part_id: str) -> dict[str, Any]:
+        r = self.rng
+        lo, hi = math.log(20_000), math.log(max(20_001, self.spec.max_attachment_bytes))
+        size = int(math.exp(r.uniform(lo, hi)))
+        mime, ext = r.choice(_ATTACHMENT_TYPES)
+        filename = f"{self._fill('{thing}').replace(' ', '_')}_{r.randint(1, 999)}.{ext}"
+        body: dict[str, Any] = {"size": size}
+        if self.spec.attachment_mode == "inline":
+            body["data"] = _b64url(r.randbytes(size))
+        else:
+            body["attachmentId"] = "ANGjdJ" + self._hex(48)
+        return {
+            "partId": part_id,
+            "mimeType": mime,
+            "filename": filename,
+            "headers": [
+                {"name": "Content-Type", "value": f'{mime}; name="{filename}"'},
+                {"name": "Content-Disposition", "value": f'attachment; filename="{filename}"'},
+                {"name": "Content-Transfer-Encoding", "value": "base64"},
+            ],
+            "body": body,
+        }
+
+    def _pick_thread(self) -> _Thread | None:
+        if not self.threads or self.rng.random() >= self.spec.reply_rate:
+            return None
+        if self.hot and self.rng.random() < 0.3:
+            return self.rng.choice(self.hot)
+        # Otherwise skewed towards recent threads.
+        idx = len(self.threads) - 1 - min(len(self.threads) - 1, int(self.rng.expovariate(0.5)))
+        return self.threads[idx]
+
+    def message(self, index: int, internal_ms: int) -> dict[str, Any]:
+        r = self.rng
+        kind = r.choices(self.kinds, weights=self.kind_weights)[0]
+        intent = r.choices(list(_INTENT_WEIGHTS), weights=list(_INTENT_WEIGHTS.values()))[0]
+        msg_id_header = f"<{self._hex(20)}@mail.example.com>"
+        extra_headers: list[tuple[str, str]] = []
+
+        thread = None if kind == "newsletter" else self._pick_thread()
+        if kind == "newsletter":
+            company = r.choice(_COMPANIES).lower()
+            from_name, from_addr = company.title(), r.choice(_NEWSLETTER_SENDERS).format(d=f"{company}.com")
+            subject = self._fill(r.choice(["Your weekly {thing} digest", "{company} newsletter: what's new", "Tips for your {thing}"]))
+            html = self._newsletter_html(company)
+            text = None
+            extra_headers += [
+                ("List-Unsubscribe", f"<mailto:unsubscribe@{company}.com>, <https://{company}.example/unsubscribe/{self._hex(12)}>"),
+                ("List-Unsubscribe-Post", "List-Unsubscribe=One-Click"),
+                ("List-Id", f"{company.title()} News <news.{company}.com>"),
+                ("Precedence", "bulk"),
+            ]
+            # Newsletters never get replies; keep them out of the reply pool.
+            thread = _Thread(self._hex(), subject, from_addr)
+        else:
+            if thread is None:
+                from_name, from_addr = self._person()
+                subject = self._fill(r.choice(_INTENTS[intent][0]))
+                thread = _Thread(self._hex(), subject, from_addr, intent)
+                self.threads.append(thread)
+                if len(self.hot) < 8 and r.random() < 0.02:
+                    self.hot.append(thread)
+            else:
+                intent = thread.intent
+                from_addr = thread.participant
+                from_name = from_addr.split("@")[0].title()
+                subject = "Re: " + thread.subject
+                extra_headers += [
+                    ("In-Reply-To", thread.message_ids[-1]),
+                    ("References", " ".join(thread.message_ids[-20:])),
+                ]
+            text = self._prose(intent)
+            if thread.history:
+                quoted = "\n".join("> " + line for line in thread.history[-1].splitlines())
+                text += f"\n\nOn {time.strftime('%a, %d %b %Y', time.gmtime(internal_ms / 1000))}, {thread.participant} wrote:\n{quoted}"
+            html = _html_from_text(text) if kind in ("html", "alternative", "attachment") else None
+
+        thread.message_ids.append(msg_id_header)
+        if text is not None:
+            thread.history.append(text[:20_000])
+
+        if kind == "plain" or (kind == "attachment" and r.random() < 0.5):
+            body_part = _text_part("text/plain", text or "", "0")
+        elif kind in ("html", "newsletter"):
+            body_part = _text_part("text/html", html or "", "0")
+        else:
+            body_part = {
+                "partId": "0",
+                "mimeType": "multipart/alternative",
+                "filename": "",
+                "headers": [{"name": "Content-Type", "value": f'multipart/alternative; boundary="{self._hex(28)}"'}],
+                "body": {"size": 0},
+                "parts": [_text_part("text/plain", text or "", "0.0"), _text_part("text/html", html or "", "0.1")],
+            }
+
+        if kind == "attachment":
+            parts = [body_part] + [self._attachment(str(i + 1)) for i in range(r.randint(1, 3))]
+            payload = {
+                "partId": "",
+                "mimeType": "multipart/mixed",
+                "filename": "",
+                "headers": [{"name": "Content-Type", "value": f'multipart/mixed; boundary="{self._hex(28)}"'}],
+                "body": {"size": 0},
+                "parts": parts,
+            }
+        else:
+            payload = dict(body_part, partId="")
+
+        headers = [
+            ("Delivered-To", self.address),
+            ("From", f'"{from_name}" <{from_addr}>'),
+            ("To", self.address),
+            ("Subject", subject),
+            ("Date", time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(internal_ms / 1000))),
+            ("Message-ID", msg_id_header),
+            ("MIME-Version", "1.0"),
+            *extra_headers,
+        ]
+        payload["headers"] = [{"name": k, "value": v} for k, v in headers] + payload.get("headers", [])
+
+        snippet_src = text if text is not None else "View in browser " + subject
+        size = sum(p.get("body", {}).get("size", 0) for p in [payload, *payload.get("parts", [])])
+        labels = ["INBOX", "UNREAD"] + (["CATEGORY_PROMOTIONS"] if kind == "newsletter" else ["CATEGORY_PERSONAL"])
+        return {
+            "id": self._hex(),
+            "threadId": thread.thread_id,
+            "labelIds": labels,
+            "snippet": " ".join(snippet_src.split())[:200],
+            "sizeEstimate": size + 1200,
+            "historyId": str(1_000_000 + index),
+            "internalDate": str(internal_ms),
+            "payload": payload,
+        }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        spec = self.spec
+        end_ms = spec.end_ms if spec.end_ms is not None else int(time.time() * 1000)
+        n = max(0, spec.messages)
+        for i in range(n):
+            # Oldest first, evenly spread over the window (Gmail internalDate is ms since epoch).
+            internal_ms = end_ms - int(spec.window_s * 1000 * (n - i) / (n + 1))
+            yield self.message(i, internal_ms)
+            if len(self.threads) > 5000:
+                del self.threads[:1000]
+
+
+def account_names(spec: CorpusSpec) -> list[str]:
+    return [f"acct{i}" for i in range(spec.accounts)]
+
+
+def generate_mailbox(account: str, spec: CorpusSpec) -> Iterator[dict[str, Any]]:
+    """Messages for one account, oldest first."""
+    return iter(_MailboxGenerator(account, spec))
+
+
+def generate(spec: CorpusSpec) -> Iterator[tuple[str, dict[str, Any]]]:
+    for account in account_names(spec):
+        for msg in generate_mailbox(account, spec):
+            yield account, msg
+
+
+def read_jsonl(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_jsonl(spec: CorpusSpec, out_dir: Path) -> list[Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for account in account_names(spec):
+        path = out_dir / f"{account}.jsonl"
+        with path.open("w", encoding="utf-8") as f:
+            for msg in generate_mailbox(account, spec):
+                f.write(json.dumps(msg, separators=(",", ":")) + "\n")
+        paths.append(path)
+    return paths
+
+
+def describe(msg: dict[str, Any]) -> str:
+    """Structural kind of a message, recovered from its shape (no generator-only fields)."""
+    payload = msg.get("payload") or {}
+    names = {h.get("name", "").lower() for h in payload.get("headers") or []}
+    mime = payload.get("mimeType")
+    if mime == "multipart/mixed":
+        return "attachment"
+    if "list-unsubscribe" in names:
+        return "newsletter"
+    return {"text/plain": "plain", "text/html": "html", "multipart/alternative": "alternative"}.get(mime or "", "other")
+
+
+def stats(messages: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    kinds: Counter[str] = Counter()
+    threads: Counter[str] = Counter()
+    n = total_bytes = attachments = attachment_bytes = replies = 0
+    for msg in messages:
+        n += 1
+        kinds[describe(msg)] += 1
+        threads[msg.get("threadId", "")] += 1
+        total_bytes += int(msg.get("sizeEstimate") or 0)
+        payload = msg.get("payload") or {}
+        if any(h.get("name") == "In-Reply-To" for h in payload.get("headers") or []):
+            replies += 1
+        for p in payload.get("parts") or []:
+            if p.get("filename"):
+                attachments += 1
+                attachment_bytes += int((p.get("body") or {}).get("size") or 0)
+    lengths = sorted(threads.values())
+    return {
+        "messages": n,
+        "kinds": dict(sorted(kinds.items())),
+        "replies": replies,
+        "threads": len(threads),
+        "max_thread_length": lengths[-1] if lengths else 0,
+        "threads_over_10": sum(1 for v in lengths if v > 10),
+        "attachments": attachments,
+        "attachment_bytes": attachment_bytes,
+        "size_estimate_bytes": total_bytes,
+    }
+
+
+def _parse_mix(raw: str) -> dict[str, float]:
+    mix = {}
+    for pair in raw.split(","):
+        kind, _, weight = pair.partition("=")
+        if kind.strip() not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown kind {kind!r}; expected one of {', '.join(KINDS)}")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--accounts", type=int, default=1)
+    ap.add_argument("--messages", type=int, default=1000, help="Messages per account")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--window-s", type=int, default=3000, help="internalDate spread before --end-ms")
+    ap.add_argument("--end-ms", type=int, help="Newest internalDate (default: now)")
+    ap.add_argument("--reply-rate", type=float, default=0.35)
+    ap.add_argument("--attachment-mode", choices=("id", "inline"), default="id")
+    ap.add_argument("--max-attachment-bytes", type=int, default=5_000_000)
+    ap.add_argument("--mix", type=_parse_mix, help="e.g. plain=3,html=1,alternative=2,newsletter=2,attachment=1")
+    ap.add_argument("--out", type=Path, help="Directory for <account>.jsonl files")
+    ap.add_argument("--stats", action="store_true", help="Print corpus statistics (JSON)")
+    args = ap.parse_args()
+
+    spec = CorpusSpec(
+        accounts=args.accounts,
+        messages=args.messages,
+        seed=args.seed,
+        window_s=args.window_s,
+        end_ms=args.end_ms,
+        reply_rate=args.reply_rate,
+        attachment_mode=args.attachment_mode,
+        max_attachment_bytes=args.max_attachment_bytes,
+    )
+    if args.mix:
+        spec = replace(spec, mix=args.mix)
+
+    started = time.perf_counter()
+    if args.out:
+        paths = write_jsonl(spec, args.out)
+        print(f"wrote {len(paths)} mailbox(es) to {args.out} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        if args.stats:
+            report = stats(m for p in paths for m in read_jsonl(p))
+            print(json.dumps(report, indent=2))
+        return
+    report = stats(m for _, m in generate(spec))
+    report["generated_per_s"] = round(report["messages"] / max(1e-9, time.perf_counter() - started), 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
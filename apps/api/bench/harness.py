@@ -0,0 +1,175 @@
+"""Shared plumbing for the offline benchmarks: in-process mock services and measurement helpers.
+
+`configure_env()` must run before anything imports `app.*` (settings are read once). `install()`
+then points the API's pooled HTTP client at the mocks through `RouterTransport`, which serves each
+mock host from its ASGI app in-process and counts round trips per service and endpoint.
+"""
+
+from __future__ import annotations
+
+import base64
+import math
+import os
+import re
+import statistics
+import subprocess
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+
+SUPABASE_URL = "http://supabase.bench"
+OPENAI_BASE_URL = "http://openai.bench/v1"
+CRON_SECRET = "bench-cron-secret"
+PUSH_TOKEN = "bench-push-token"
+
+# host -> service label used in the round-trip report
+SERVICES = {
+    "gmail.googleapis.com": "gmail",
+    "oauth2.googleapis.com": "google",
+    "supabase.bench": "supabase",
+    "openai.bench": "openai",
+}
+
+_ID_SEGMENT = re.compile(r"/messages/(?!send$)[^/]+$")
+
+
+def configure_env(**overrides: str) -> None:
+    """Settings for a hermetic run (mock URLs, throwaway keys); call before importing `app`."""
+    env = {
+        "NEXT_PUBLIC_SUPABASE_URL": SUPABASE_URL,
+        "NEXT_PUBLIC_SUPABASE_ANON_KEY": "bench-anon",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-role",
+        "CRON_SECRET": CRON_SECRET,
+        "GMAIL_PUSH_TOKEN": PUSH_TOKEN,
+        "TOKEN_ENCRYPTION_KEY_B64": base64.b64encode(b"b" * 32).decode("ascii"),
+        "GOOGLE_CLIENT_ID": "bench-client",
+        "GOOGLE_CLIENT_SECRET": "bench-secret",
+        "GOOGLE_REDIRECT_URI": "http://localhost/callback",
+        "LLM_PROVIDER": "openai",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": OPENAI_BASE_URL,
+        "BODY_STORE_BACKEND": "supabase",
+        "TRACE_EXPORT_PATH": "",
+        "METRICS_TOKEN": "",
+        # Backfill pacing is wall-clock sleeping; round trips are what the bench measures.
+        "BACKFILL_QUOTA_UNITS_PER_SECOND": "0",
+        **overrides,
+    }
+    os.environ.update(env)
+
+
+def _endpoint(request: httpx.Request) -> str:
+    path = request.url.path
+    if path.startswith("/rest/v1/"):
+        path = path[len("/rest/v1/") :]
+    elif path.startswith("/gmail/v1/users/me/"):
+        path = _ID_SEGMENT.sub("/messages/{id}", path[len("/gmail/v1/users/me") :]).lstrip("/")
+    elif path.startswith("/v1/"):
+        path = path[len("/v1/") :]
+    return f"{request.method} {path}"
+
+
+class RouterTransport(httpx.AsyncBaseTransport):
+    """Dispatch by host to in-process ASGI apps; unknown hosts fail like a refused connection."""
+
+    def __init__(self, routes: dict[str, Any]) -> None:
+        self._routes = {host: httpx.ASGITransport(app=asgi) for host, asgi in routes.items()}
+        self.round_trips: Counter[tuple[str, str]] = Counter()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        transport = self._routes.get(host)
+        if transport is None:
+            raise httpx.ConnectError(f"No mock for host {host}", request=request)
+        self.round_trips[(SERVICES.get(host, host), _endpoint(request))] += 1
+        return await transport.handle_async_request(request)
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        out: dict[str, dict[str, int]] = {}
+        for (service, endpoint), n in sorted(self.round_trips.items()):
+            out.setdefault(service, {})[endpoint] = n
+        return out
+
+    def reset(self) -> None:
+        self.round_trips.clear()
+
+
+def install() -> RouterTransport:
+    """Route the API's pooled client (and therefore every outbound call) to the mocks."""
+    from app import http_pool
+    from bench import mock_gmail, mock_openai, mock_supabase
+
+    router = RouterTransport(
+        {
+            "gmail.googleapis.com": mock_gmail.app,
+            "oauth2.googleapis.com": mock_gmail.app,
+            "supabase.bench": mock_supabase.app,
+            "openai.bench": mock_openai.app,
+        }
+    )
+    http_pool._client = httpx.AsyncClient(transport=router, timeout=30)
+    return router
+
+
+def percentiles(samples_s: list[float]) -> dict[str, float]:
+    """p50/p90/p99/max in milliseconds (nearest-rank)."""
+    if not samples_s:
+        return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples_s)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, math.ceil(p * len(ordered)) - 1)] * 1000
+
+    return {
+        "p50_ms": round(rank(0.50), 3),
+        "p90_ms": round(rank(0.90), 3),
+        "p99_ms": round(rank(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    ops: int = 0
+    unit: str = "op"
+    wall_s: float = 0.0
+    latencies_s: list[float] = field(default_factory=list)
+    round_trips: dict[str, dict[str, int]] = field(default_factory=dict)
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    def report(self) -> dict[str, Any]:
+        total_rt = sum(sum(v.values()) for v in self.round_trips.values())
+        return {
+            "ops": self.ops,
+            "unit": self.unit,
+            "wall_s": round(self.wall_s, 4),
+            "throughput_per_s": round(self.ops / self.wall_s, 2) if self.wall_s > 0 else 0.0,
+            "latency": percentiles(self.latencies_s),
+            "mean_ms": round(statistics.fmean(self.latencies_s) * 1000, 4) if self.latencies_s else 0.0,
+            "round_trips": self.round_trips,
+            "round_trips_total": total_rt,
+            "round_trips_per_op": round(total_rt / self.ops, 3) if self.ops else 0.0,
+            **self.extra,
+        }
+
+
+class Stopwatch:
+    def __enter__(self) -> "Stopwatch":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.elapsed = time.perf_counter() - self.started
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
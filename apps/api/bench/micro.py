@@ -0,0 +1,294 @@
+"""Micro-benchmarks and regression gate for the per-message hot paths.
+
+Usage (from apps/api):
+
+    python -m bench.micro                                   # every case, table output
+    python -m bench.micro -k route                          # only cases whose name contains "route"
+    python -m bench.micro --save micro-base.json            # record a baseline ...
+    python -m bench.micro --compare micro-base.json         # ... and fail (exit 1) on regressions
+    python -m bench.micro --compare micro-base.json --max-regression 0.1 --stat median
+
+Cases: `route/<buckets>x<keywords>` runs buckets.route_to_bucket over corpus messages with 8-100
+enabled buckets of 50-500 keywords each (plus the `other` fallback); most messages match nothing,
+so every keyword is scanned, which is the worst and the common case. `extract/<kind>/<size>` runs
+gmail_client.extract_body_text on plain, html-only, multipart/alternative and attachment payloads
+of 1KB-2MB.
+
+Each case is calibrated so a round takes about `--round-ms`, then timed for `--rounds` rounds;
+the per-message cost of a round is its wall time divided by its call count. The gate compares
+`--stat` (min by default: least sensitive to a noisy machine) against the baseline. Baselines are
+only comparable on the same machine and interpreter; a mismatch is reported but not fatal.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable
+
+from bench.corpus import CorpusSpec, _b64url, _html_from_text, _text_part, generate_mailbox
+from bench.harness import git_revision
+
+
+BUCKET_COUNTS = (8, 25, 100)
+KEYWORD_COUNTS = (50, 200, 500)
+EXTRACT_KINDS = ("plain", "html", "alternative", "attachment")
+EXTRACT_SIZES = {"1k": 1_024, "16k": 16_384, "256k": 262_144, "2m": 2_097_152}
+
+_SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "vex", "zo", "quil", "dra", "pem", "sor", "yat"]
+
+
+def _keywords(rng: random.Random, n: int) -> list[str]:
+    # Nonsense words (never in the corpus) so a bucket only matches through its few real keywords.
+    out = []
+    for _ in range(n):
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        out.append(word if rng.random() < 0.8 else f"{word} {rng.choice(_SYLLABLES)}{rng.choice(_SYLLABLES)}")
+    return out
+
+
+def synthetic_buckets(n_buckets: int, n_keywords: int, *, seed: int = 43) -> list[dict[str, Any]]:
+    """`n_buckets` enabled buckets of `n_keywords` keywords each, plus the `other` fallback."""
+    rng = random.Random(seed * 1_000_003 + n_buckets * 1_009 + n_keywords)
+    buckets = []
+    for i in range(n_buckets):
+        buckets.append(
+            {
+                "slug": f"b{i}",
+                "priority": 10 + i,
+                "is_enabled": True,
+                "matchers": {
+                    "keywords": _keywords(rng, n_keywords),
+                    "sender_emails": [f"{rng.choice(_SYLLABLES)}{i}@vendor{i}.example"],
+                    "sender_domains": [f"client{i}.example"],
+                    "exclude_keywords": ["unsubscribe"] if i % 2 else [],
+                    "exclude_sender_emails": [],
+                    "exclude_sender_domains": [],
+                },
+            }
+        )
+    buckets.append({"slug": "other", "priority": 1000, "is_enabled": True, "matchers": {}})
+    rng.shuffle(buckets)  # route_to_bucket orders by priority itself
+    return buckets
+
+
+def _route_samples(n: int, *, seed: int) -> list[dict[str, Any]]:
+    from app.gmail_client import _extract_headers, extract_body_text, parse_from_email
+
+    out = []
+    for m in generate_mailbox("micro", replace(CorpusSpec(seed=seed), messages=n)):
+        headers = _extract_headers(m)
+        out.append(
+            {
+                "from_email": parse_from_email(headers.get("from")),
+                "subject": headers.get("subject"),
+                "snippet": m.get("snippet"),
+                "body_text": extract_body_text(m),
+            }
+        )
+    return out
+
+
+def _text_of(size: int, rng: random.Random) -> str:
+    words = ["invoice", "thanks", "schedule", "review", "the", "attached", "call", "team", "update", "next"]
+    out: list[str] = []
+    n = 0
+    while n < size:
+        line = " ".join(rng.choice(words) for _ in range(12)) + "."
+        out.append(line)
+        n += len(line) + 1
+    return "\n".join(out)[:size]
+
+
+def extract_payload(kind: str, size: int, *, seed: int = 44) -> dict[str, Any]:
+    """Gmail format=full message whose text (or attachment, for `attachment`) is about `size` bytes."""
+    rng = random.Random(seed + size)
+    if kind == "plain":
+        payload = _text_part("text/plain", _text_of(size, rng), "")
+    elif kind == "html":
+        # The markup roughly doubles the text; keep the total near `size`.
+        payload = _text_part("text/html", _html_from_text(_text_of(size // 2, rng)), "")
+    elif kind == "alternative":
+        text = _text_of(size // 3, rng)
+        payload = {
+            "partId": "",
+            "mimeType": "multipart/alternative",
+            "body": {"size": 0},
+            "parts": [_text_part("text/plain", text, "0"), _text_part("text/html", _html_from_text(text), "1")],
+        }
+    elif kind == "attachment":
+        text = _text_of(2_048, rng)
+        blob = rng.randbytes(size)
+        payload = {
+            "partId": "",
+            "mimeType": "multipart/mixed",
+            "body": {"size": 0},
+            "parts": [
+                {
+                    "partId": "0",
+                    "mimeType": "multipart/alternative",
+                    "body": {"size": 0},
+                    "parts": [_text_part("text/plain", text, "0.0"), _text_part("text/html", _html_from_text(text), "0.1")],
+                },
+                {
+                    "partId": "1",
+                    "mimeType": "application/pdf",
+                    "filename": "report.pdf",
+                    "body": {"size": size, "data": _b64url(blob)},
+                },
+            ],
+        }
+    else:
+        raise ValueError(f"Unknown payload kind: {kind}")
+    return {"id": f"{kind}-{size}", "threadId": f"{kind}-{size}", "payload": payload}
+
+
+def measure(fn: Callable[[Any], Any], samples: list[Any], *, rounds: int, round_s: float) -> dict[str, Any]:
+    """Per-call cost in microseconds over `rounds` rounds of ~`round_s` each (samples are cycled)."""
+    for s in samples[: min(len(samples), 20)]:  # warm-up (imports, caches)
+        fn(s)
+    started = time.perf_counter()
+    probe = 0
+    while probe < len(samples) and time.perf_counter() - started < round_s / 10:
+        fn(samples[probe])
+        probe += 1
+    per_call = (time.perf_counter() - started) / max(1, probe)
+    calls = max(1, int(round_s / max(per_call, 1e-9)))
+
+    per_op: list[float] = []
+    for _ in range(rounds):
+        n = len(samples)
+        t0 = time.perf_counter()
+        for i in range(calls):
+            fn(samples[i % n])
+        per_op.append((time.perf_counter() - t0) / calls * 1e6)
+    return {
+        "min_us": round(min(per_op), 3),
+        "median_us": round(statistics.median(per_op), 3),
+        "max_us": round(max(per_op), 3),
+        "calls_per_round": calls,
+        "rounds": rounds,
+    }
+
+
+def cases(*, seed: int, samples: int) -> dict[str, Callable[[], tuple[Callable[[Any], Any], list[Any]]]]:
+    """name -> setup(); setup returns (fn, samples) so only the selected cases build their inputs."""
+    from app.buckets import route_to_bucket
+    from app.gmail_client import extract_body_text
+
+    out: dict[str, Callable[[], tuple[Callable[[Any], Any], list[Any]]]] = {}
+    route_inputs: list[dict[str, Any]] = []
+
+    def route_case(n_buckets: int, n_keywords: int) -> Callable[[], tuple[Callable[[Any], Any], list[Any]]]:
+        def setup() -> tuple[Callable[[Any], Any], list[Any]]:
+            if not route_inputs:
+                route_inputs.extend(_route_samples(samples, seed=seed))
+            buckets = synthetic_buckets(n_buckets, n_keywords, seed=seed)
+            return (lambda s: route_to_bucket(buckets=buckets, **s)), route_inputs
+
+        return setup
+
+    def extract_case(kind: str, size: int) -> Callable[[], tuple[Callable[[Any], Any], list[Any]]]:
+        def setup() -> tuple[Callable[[Any], Any], list[Any]]:
+            return extract_body_text, [extract_payload(kind, size, seed=seed)]
+
+        return setup
+
+    for b in BUCKET_COUNTS:
+        for k in KEYWORD_COUNTS:
+            out[f"route/{b}x{k}"] = route_case(b, k)
+    for kind in EXTRACT_KINDS:
+        for label, size in EXTRACT_SIZES.items():
+            out[f"extract/{kind}/{label}"] = extract_case(kind, size)
+    return out
+
+
+def _environment() -> dict[str, str]:
+    return {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+
+def compare(
+    results: dict[str, dict[str, Any]], baseline: dict[str, Any], *, stat: str, max_regression: float
+) -> list[str]:
+    """Cases whose `stat` grew by more than `max_regression` (fraction) over the baseline."""
+    failures = []
+    base_cases = baseline.get("cases") or {}
+    for name, r in results.items():
+        base = (base_cases.get(name) or {}).get(stat)
+        if not base:
+            continue
+        ratio = r[stat] / base
+        r["baseline_us"] = base
+        r["delta"] = round(ratio - 1, 4)
+        if ratio > 1 + max_regression:
+            failures.append(f"{name}: {base:,.3f}us -> {r[stat]:,.3f}us (+{(ratio - 1) * 100:.1f}% {stat})")
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-k", dest="select", action="append", help="Only cases containing this substring (repeatable)")
+    ap.add_argument("--rounds", type=int, default=7)
+    ap.add_argument("--round-ms", type=float, default=100.0, help="Target wall time per round")
+    ap.add_argument("--samples", type=int, default=500, help="Corpus messages routed per case")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--save", type=Path, help="Write results here (a baseline for --compare)")
+    ap.add_argument("--compare", type=Path, help="Baseline JSON from --save; exit 1 on regressions")
+    ap.add_argument("--stat", choices=("min_us", "median_us"), default="min_us")
+    ap.add_argument("--max-regression", type=float, default=0.15, help="Allowed slowdown as a fraction")
+    ap.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = ap.parse_args()
+
+    from bench.harness import configure_env
+
+    configure_env()
+    selected = {
+        name: setup
+        for name, setup in cases(seed=args.seed, samples=args.samples).items()
+        if not args.select or any(s in name for s in args.select)
+    }
+    if not selected:
+        raise SystemExit("No cases match -k")
+
+    results: dict[str, dict[str, Any]] = {}
+    for name, setup in selected.items():
+        fn, samples = setup()
+        results[name] = measure(fn, samples, rounds=args.rounds, round_s=args.round_ms / 1000)
+        if not args.json:
+            print(f"{name:<28}{results[name]['min_us']:>14,.3f} us", file=sys.stderr)
+
+    report = {"revision": git_revision(), "environment": _environment(), "stat": args.stat, "cases": results}
+    failures: list[str] = []
+    if args.compare:
+        baseline = json.loads(args.compare.read_text("utf-8"))
+        if baseline.get("environment") != report["environment"]:
+            print(f"warning: baseline recorded on {baseline.get('environment')}, not comparable", file=sys.stderr)
+        failures = compare(results, baseline, stat=args.stat, max_regression=args.max_regression)
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2) + "\n", "utf-8")
+
+    if args.json:
+        print(json.dumps({**report, "regressions": failures}, indent=2))
+    else:
+        print(f"revision={report['revision']} stat={args.stat}")
+        print(f"{'case':<28}{'min us':>12}{'median us':>12}{'calls':>8}{'baseline':>12}{'delta':>9}")
+        for name, r in results.items():
+            base = f"{r['baseline_us']:,.3f}" if "baseline_us" in r else "-"
+            delta = f"{r['delta'] * 100:+.1f}%" if "delta" in r else "-"
+            print(f"{name:<28}{r['min_us']:>12,.3f}{r['median_us']:>12,.3f}{r['calls_per_round']:>8}{base:>12}{delta:>9}")
+    if failures:
+        print(f"{len(failures)} regression(s) over {args.max_regression * 100:.0f}%:", file=sys.stderr)
+        for f in failures:
+            print(f"  {f}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
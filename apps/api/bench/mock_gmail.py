@@ -0,0 +1,197 @@
+"""Gmail API + Google OAuth token endpoint mock serving synthetic mailboxes.
+
+Usage (from apps/api):
+
+    uvicorn bench.mock_gmail:app --port 8013
+
+Covers what the API calls: `POST /token` (refresh -> access token), and under `/gmail/v1/users/me`:
+`profile`, `messages` (list; honours `after:`/`before:<epoch>`, `maxResults`, `pageToken`),
+`messages/{id}` (format=full, or metadata with `metadataHeaders`),
+`messages/send` and `watch`/`stop`. Mailboxes come from bench.corpus (generated, or replayed from
+JSONL) and are addressed by refresh token; the issued access token is "at:<refresh_token>".
+`Mailbox.deliver()` adds live mail and bumps the historyId a push notification carries. Knobs (env):
+MOCK_GMAIL_LATENCY_MS (per request), MOCK_GMAIL_429_RATE (fraction of Gmail requests answered 429
+with `Retry-After: 0`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from bench.corpus import CorpusSpec, generate_mailbox, read_jsonl
+
+
+app = FastAPI(title="mock-gmail")
+
+
+class Mailbox:
+    def __init__(self, *, email_address: str, messages: list[dict[str, Any]]) -> None:
+        self.email_address = email_address
+        # Gmail lists newest first.
+        self.messages = sorted(messages, key=lambda m: int(m.get("internalDate") or 0), reverse=True)
+        self.by_id = {m["id"]: m for m in self.messages}
+        self.sent: list[dict[str, Any]] = []
+        self.history_id = 1000
+        self.watch: dict[str, Any] | None = None
+
+    def deliver(self, msg: dict[str, Any]) -> int:
+        """New mail arriving now; returns the mailbox historyId a push notification would carry."""
+        msg = {**msg, "internalDate": str(int(time.time() * 1000))}
+        self.messages.insert(0, msg)
+        self.by_id[msg["id"]] = msg
+        self.history_id += 1
+        return self.history_id
+
+
+MAILBOXES: dict[str, Mailbox] = {}
+_rng = random.Random(41)
+
+
+def add_mailbox(refresh_token: str, mailbox: Mailbox) -> None:
+    MAILBOXES[refresh_token] = mailbox
+
+
+def reset() -> None:
+    MAILBOXES.clear()
+
+
+def corpus_mailbox(*, account: str, spec: CorpusSpec) -> Mailbox:
+    """Synthetic mailbox from bench.corpus (newest message ~now, so the poll window sees it)."""
+    return Mailbox(email_address=f"{account}@example.com", messages=list(generate_mailbox(account, spec)))
+
+
+def jsonl_mailbox(path: Path, *, rebase: bool = True) -> Mailbox:
+    """Mailbox from a `python -m bench.corpus --out` file; `rebase` shifts dates so the newest is now."""
+    messages = list(read_jsonl(path))
+    if rebase and messages:
+        shift = int(time.time() * 1000) - max(int(m.get("internalDate") or 0) for m in messages)
+        for m in messages:
+            m["internalDate"] = str(int(m.get("internalDate") or 0) + shift)
+    return Mailbox(email_address=f"{path.stem}@example.com", messages=messages)
+
+
+async def _latency() -> None:
+    try:
+        ms = float(os.environ.get("MOCK_GMAIL_LATENCY_MS", "0"))
+    except ValueError:
+        ms = 0.0
+    if ms > 0:
+        await asyncio.sleep(ms / 1000)
+
+
+def _throttled() -> JSONResponse | None:
+    try:
+        rate = float(os.environ.get("MOCK_GMAIL_429_RATE", "0"))
+    except ValueError:
+        rate = 0.0
+    if rate > 0 and _rng.random() < rate:
+        return JSONResponse(
+            {"error": {"code": 429, "message": "User-rate limit exceeded"}},
+            status_code=429,
+            headers={"retry-after": "0"},
+        )
+    return None
+
+
+def _mailbox(request: Request) -> Mailbox:
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    mailbox = MAILBOXES.get(token.removeprefix("at:"))
+    if not token.startswith("at:") or mailbox is None:
+        raise HTTPException(status_code=401, detail="Invalid Credentials")
+    return mailbox
+
+
+@app.post("/token")
+async def token(request: Request) -> dict[str, Any]:
+    await _latency()
+    form = {k: v[0] for k, v in parse_qs((await request.body()).decode("utf-8")).items()}
+    refresh_token = form.get("refresh_token", "")
+    if form.get("grant_type") != "refresh_token" or refresh_token not in MAILBOXES:
+        raise HTTPException(status_code=400, detail="invalid_grant")
+    return {"access_token": f"at:{refresh_token}", "expires_in": 3599, "token_type": "Bearer"}
+
+
+@app.get("/gmail/v1/users/me/profile", response_model=None)
+async def profile(request: Request) -> dict[str, Any] | JSONResponse:
+    await _latency()
+    mailbox = _mailbox(request)
+    return _throttled() or {"emailAddress": mailbox.email_address, "messagesTotal": len(mailbox.messages)}
+
+
+@app.get("/gmail/v1/users/me/messages", response_model=None)
+async def list_messages(request: Request) -> dict[str, Any] | JSONResponse:
+    await _latency()
+    mailbox = _mailbox(request)
+    if (limited := _throttled()) is not None:
+        return limited
+    after_ms, before_ms = 0, None
+    for term in request.query_params.get("q", "").split():
+        if term.startswith("after:") and term[6:].isdigit():
+            after_ms = int(term[6:]) * 1000
+        elif term.startswith("before:") and term[7:].isdigit():
+            before_ms = int(term[7:]) * 1000
+    matching = [
+        m
+        for m in mailbox.messages
+        if int(m.get("internalDate") or 0) > after_ms
+        and (before_ms is None or int(m.get("internalDate") or 0) < before_ms)
+    ]
+    offset = int(request.query_params.get("pageToken") or 0)
+    size = min(500, int(request.query_params.get("maxResults") or 100))
+    page = matching[offset : offset + size]
+    out: dict[str, Any] = {
+        "messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+        "resultSizeEstimate": len(matching),
+    }
+    if offset + size < len(matching):
+        out["nextPageToken"] = str(offset + size)
+    return out
+
+
+@app.get("/gmail/v1/users/me/messages/{message_id}", response_model=None)
+async def get_message(message_id: str, request: Request) -> dict[str, Any] | JSONResponse:
+    await _latency()
+    mailbox = _mailbox(request)
+    if (limited := _throttled()) is not None:
+        return limited
+    msg = mailbox.by_id.get(message_id)
+    if msg is None:
+        raise HTTPException(status_code=404, detail="Requested entity was not found.")
+    if request.query_params.get("format") == "metadata":
+        wanted = {h.lower() for h in request.query_params.getlist("metadataHeaders")}
+        payload = msg.get("payload") or {}
+        headers = [h for h in payload.get("headers") or [] if not wanted or str(h.get("name")).lower() in wanted]
+        return {**{k: v for k, v in msg.items() if k != "payload"}, "payload": {"headers": headers}}
+    return msg
+
+
+@app.post("/gmail/v1/users/me/watch", response_model=None)
+async def watch(request: Request) -> dict[str, Any] | JSONResponse:
+    await _latency()
+    mailbox = _mailbox(request)
+    if (limited := _throttled()) is not None:
+        return limited
+    mailbox.watch = await request.json()
+    expiration = int(time.time() * 1000) + 7 * 24 * 3600 * 1000
+    return {"historyId": str(mailbox.history_id), "expiration": str(expiration)}
+
+
+@app.post("/gmail/v1/users/me/messages/send", response_model=None)
+async def send(request: Request) -> dict[str, Any] | JSONResponse:
+    await _latency()
+    mailbox = _mailbox(request)
+    if (limited := _throttled()) is not None:
+        return limited
+    body = await request.json()
+    sent = {"id": f"sent-{len(mailbox.sent)}", "threadId": body.get("threadId") or f"sent-t{len(mailbox.sent)}"}
+    mailbox.sent.append({**sent, "raw": body.get("raw")})
+    return {**sent, "labelIds": ["SENT"]}
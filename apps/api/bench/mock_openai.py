@@ -0,0 +1,193 @@
+"""OpenAI-compatible mock: chat completions + Files/Batch API, deterministic, no network.
+
+Usage (from apps/api):
+
+    uvicorn bench.mock_openai:app --port 8011
+    OPENAI_BASE_URL=http://127.0.0.1:8011/v1 OPENAI_API_KEY=mock LLM_BATCH_ENABLED=true uvicorn app.main:app
+
+Knobs (env): MOCK_LLM_LATENCY_MS (per chat completion), MOCK_LLM_COMPLETION_TOKENS (reported
+completion tokens; default ~chars/4), MOCK_LLM_CACHED_FRACTION (share of prompt tokens reported as
+cached), MOCK_BATCH_DELAY_S (time until a batch completes), MOCK_BATCH_FAIL_RATE (fraction of batch
+requests answered with an error line).
+Answers are derived from a hash of the prompt, so runs are reproducible.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+
+app = FastAPI(title="mock-openai")
+
+_files: dict[str, bytes] = {}
+_batches: dict[str, dict[str, Any]] = {}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _h(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _answer(prompt: str) -> dict[str, Any]:
+    """A schema-valid answer for whichever output schema the prompt asks for."""
+    h = _h(prompt)
+    # The output schema is appended last; its title says which answer is expected.
+    schema_title = prompt.rsplit('"title": ', 1)[-1].split('"')[1] if '"title": ' in prompt else ""
+    if schema_title == "EmailClassification":
+        return {
+            "is_relevant": h % 5 < 3,
+            "confidence": round(0.3 + (h % 70) / 100, 2),
+            "category": ["sales", "support", "finance", "ops", "other"][h % 5],
+            "reason": "Mock classification.",
+        }
+    if schema_title == "EmailSummary":
+        return {
+            "summary_bullets": ["Sender asks for an update.", "Mentions a deadline."],
+            "what_they_want": ["A reply with next steps."],
+            "suggested_next_step": "Reply with a short status update.",
+        }
+    if schema_title == "ReviseResult":
+        return {"revised_draft": "Hi,\n\nThanks for the note. Here is the revised reply.\n\nBest,"}
+    return {"draft_text": "Hi,\n\nThanks for reaching out. I'll get back to you shortly.\n\nBest,"}
+
+
+def _completion(body: dict[str, Any]) -> dict[str, Any]:
+    messages = body.get("messages") or []
+    prompt = "\n".join(str(m.get("content") or "") for m in messages)
+    content = json.dumps(_answer(prompt))
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = int(_env_float("MOCK_LLM_COMPLETION_TOKENS", 0)) or max(1, len(content) // 4)
+    cached_tokens = int(prompt_tokens * min(1.0, max(0.0, _env_float("MOCK_LLM_CACHED_FRACTION", 0))))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "gpt-4o-mini",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        },
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request) -> dict[str, Any]:
+    latency_ms = _env_float("MOCK_LLM_LATENCY_MS", 0)
+    if latency_ms > 0:
+        await asyncio.sleep(latency_ms / 1000)
+    return _completion(await request.json())
+
+
+def _multipart_file(body: bytes, content_type: str) -> bytes:
+    boundary = content_type.split("boundary=", 1)[-1].strip().strip('"').encode("ascii")
+    for part in body.split(b"--" + boundary):
+        head, sep, data = part.partition(b"\r\n\r\n")
+        if sep and b'name="file"' in head:
+            return data[:-2] if data.endswith(b"\r\n") else data
+    raise HTTPException(status_code=400, detail="No file part")
+
+
+@app.post("/v1/files")
+async def upload_file(request: Request) -> dict[str, Any]:
+    data = _multipart_file(await request.body(), request.headers.get("content-type", ""))
+    file_id = f"file-{uuid.uuid4().hex[:16]}"
+    _files[file_id] = data
+    return {"id": file_id, "object": "file", "bytes": len(data), "purpose": "batch"}
+
+
+@app.get("/v1/files/{file_id}/content", response_class=PlainTextResponse)
+async def file_content(file_id: str) -> str:
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="No such file")
+    return _files[file_id].decode("utf-8")
+
+
+@app.post("/v1/batches")
+async def create_batch(request: Request) -> dict[str, Any]:
+    body = await request.json()
+    if body.get("input_file_id") not in _files:
+        raise HTTPException(status_code=400, detail="Unknown input_file_id")
+    batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+    _batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": body.get("endpoint"),
+        "input_file_id": body["input_file_id"],
+        "completion_window": body.get("completion_window", "24h"),
+        "status": "validating",
+        "created_at": int(time.time()),
+        "metadata": body.get("metadata") or {},
+    }
+    return _batches[batch_id]
+
+
+def _run_batch(batch: dict[str, Any]) -> None:
+    fail_rate = _env_float("MOCK_BATCH_FAIL_RATE", 0)
+    out: list[str] = []
+    errors: list[str] = []
+    for raw in _files[batch["input_file_id"]].decode("utf-8").splitlines():
+        if not raw.strip():
+            continue
+        line = json.loads(raw)
+        custom_id = line.get("custom_id")
+        if fail_rate > 0 and (_h(str(custom_id)) % 1000) / 1000 < fail_rate:
+            errors.append(
+                json.dumps(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                        "custom_id": custom_id,
+                        "response": {"status_code": 500, "body": {"error": {"message": "mock failure"}}},
+                        "error": None,
+                    }
+                )
+            )
+            continue
+        out.append(
+            json.dumps(
+                {
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": custom_id,
+                    "response": {"status_code": 200, "body": _completion(line.get("body") or {})},
+                    "error": None,
+                }
+            )
+        )
+    batch["output_file_id"] = f"file-{uuid.uuid4().hex[:16]}"
+    _files[batch["output_file_id"]] = ("\n".join(out) + "\n").encode("utf-8")
+    if errors:
+        batch["error_file_id"] = f"file-{uuid.uuid4().hex[:16]}"
+        _files[batch["error_file_id"]] = ("\n".join(errors) + "\n").encode("utf-8")
+    batch["request_counts"] = {"total": len(out) + len(errors), "completed": len(out), "failed": len(errors)}
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str) -> dict[str, Any]:
+    batch = _batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="No such batch")
+    if batch["status"] != "completed":
+        if time.time() - batch["created_at"] >= _env_float("MOCK_BATCH_DELAY_S", 0):
+            _run_batch(batch)
+        else:
+            batch["status"] = "in_progress"
+    return batch
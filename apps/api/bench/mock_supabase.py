@@ -0,0 +1,346 @@
+"""In-memory PostgREST + Supabase auth mock, enough of the REST surface the API uses.
+
+Usage (from apps/api):
+
+    uvicorn bench.mock_supabase:app --port 8012
+
+Supports select/insert (incl. upsert with on_conflict)/update/delete on any table with the
+eq/neq/lt/lte/gt/gte/in/is filters (and `not.` negation), `order`, `limit`, plus the RPCs the API
+calls. `GET /auth/v1/user` treats the bearer token as the user id. No constraints, RLS or types:
+values are stored as JSON. Knob (env): MOCK_SUPABASE_LATENCY_MS (per request).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+
+app = FastAPI(title="mock-supabase")
+
+# Upsert targets when the request does not name one (PostgREST uses the primary key).
+_PRIMARY_KEYS: dict[str, tuple[str, ...]] = {
+    "email_bodies": ("hash",),
+    "context_packs": ("user_id",),
+}
+
+
+class Store:
+    def __init__(self) -> None:
+        self.tables: dict[str, list[dict[str, Any]]] = {}
+        # (table, key columns) -> key values -> row; built on first upsert, dropped on delete.
+        self._indexes: dict[tuple[str, tuple[str, ...]], dict[tuple[Any, ...], dict[str, Any]]] = {}
+
+    def reset(self) -> None:
+        self.tables.clear()
+        self._indexes.clear()
+
+    def table(self, name: str) -> list[dict[str, Any]]:
+        return self.tables.setdefault(name, [])
+
+    def index(self, name: str, keys: tuple[str, ...]) -> dict[tuple[Any, ...], dict[str, Any]]:
+        idx = self._indexes.get((name, keys))
+        if idx is None:
+            idx = {tuple(r.get(k) for k in keys): r for r in self.table(name)}
+            self._indexes[(name, keys)] = idx
+        return idx
+
+    def append(self, name: str, row: dict[str, Any]) -> dict[str, Any]:
+        row = _with_defaults(row)
+        self.table(name).append(row)
+        for (t, keys), idx in self._indexes.items():
+            if t == name:
+                idx.setdefault(tuple(row.get(k) for k in keys), row)
+        return row
+
+    def replace(self, name: str, rows: list[dict[str, Any]]) -> None:
+        self.tables[name] = rows
+        for key in [k for k in self._indexes if k[0] == name]:
+            del self._indexes[key]
+
+    def seed(self, name: str, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        return [self.append(name, dict(r)) for r in rows]
+
+
+STORE = Store()
+
+
+def _now() -> str:
+    return datetime.now(tz=timezone.utc).isoformat()
+
+
+def _with_defaults(row: dict[str, Any]) -> dict[str, Any]:
+    row.setdefault("id", str(uuid.uuid4()))
+    row.setdefault("created_at", _now())
+    return row
+
+
+def _coerce(raw: str, current: Any) -> Any:
+    if isinstance(current, bool):
+        return raw == "true"
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw.strip('"')
+
+
+def _predicate(column: str, expr: str) -> Callable[[dict[str, Any]], bool]:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+
+    def test(row: dict[str, Any]) -> bool:
+        v = row.get(column)
+        if op == "is":
+            ok = (v is None) if raw == "null" else (v is (raw == "true"))
+        elif op == "in":
+            values = [s.strip().strip('"') for s in raw.strip("()").split(",") if s.strip()]
+            ok = v is not None and str(v) in values
+        elif v is None:
+            ok = False
+        else:
+            rhs = _coerce(raw, v)
+            lhs = float(v) if isinstance(rhs, float) else str(v)
+            if op == "eq":
+                ok = lhs == rhs
+            elif op == "neq":
+                ok = lhs != rhs
+            elif op == "lt":
+                ok = lhs < rhs
+            elif op == "lte":
+                ok = lhs <= rhs
+            elif op == "gt":
+                ok = lhs > rhs
+            elif op == "gte":
+                ok = lhs >= rhs
+            else:
+                raise HTTPException(status_code=400, detail=f"Unsupported operator: {op}")
+        return not ok if negate else ok
+
+    return test
+
+
+_RESERVED = {"select", "order", "limit", "offset", "on_conflict"}
+
+
+def _filtered(rows: list[dict[str, Any]], params: dict[str, str]) -> list[dict[str, Any]]:
+    preds = []
+    for k, v in params.items():
+        if k in _RESERVED:
+            continue
+        if k in ("or", "and"):
+            raise HTTPException(status_code=400, detail="Logical filters are not supported by the mock")
+        preds.append(_predicate(k, v))
+    return [r for r in rows if all(p(r) for p in preds)]
+
+
+def _ordered(rows: list[dict[str, Any]], order: str | None) -> list[dict[str, Any]]:
+    for part in reversed([p for p in (order or "").split(",") if p]):
+        col, _, direction = part.partition(".")
+        desc = direction.startswith("desc")
+        present = [r for r in rows if r.get(col) is not None]
+        missing = [r for r in rows if r.get(col) is None]
+        rows = sorted(present, key=lambda r: r[col], reverse=desc) + missing
+    return rows
+
+
+def _project(row: dict[str, Any], select: str | None) -> dict[str, Any]:
+    if not select or select == "*":
+        return dict(row)
+    return {c: row.get(c) for c in (s.strip() for s in select.split(",")) if c}
+
+
+async def _latency() -> None:
+    try:
+        ms = float(os.environ.get("MOCK_SUPABASE_LATENCY_MS", "0"))
+    except ValueError:
+        ms = 0.0
+    if ms > 0:
+        await asyncio.sleep(ms / 1000)
+
+
+@app.get("/rest/v1/{table}")
+async def select(table: str, request: Request) -> list[dict[str, Any]]:
+    await _latency()
+    params = dict(request.query_params)
+    rows = _ordered(_filtered(STORE.table(table), params), params.get("order"))
+    if "limit" in params:
+        rows = rows[: int(params["limit"])]
+    return [_project(r, params.get("select")) for r in rows]
+
+
+@app.post("/rest/v1/{table}")
+async def insert(table: str, request: Request) -> Response:
+    await _latency()
+    body = await request.json()
+    rows = body if isinstance(body, list) else [body]
+    prefer = request.headers.get("prefer", "")
+    conflict = request.query_params.get("on_conflict")
+    keys = tuple(c.strip() for c in conflict.split(",")) if conflict else _PRIMARY_KEYS.get(table, ("id",))
+    upsert = "resolution=" in prefer
+    ignore = "resolution=ignore-duplicates" in prefer
+
+    index = STORE.index(table, keys)
+    out: list[dict[str, Any]] = []
+    for row in rows:
+        key = tuple(row.get(k) for k in keys)
+        existing = index.get(key) if all(v is not None for v in key) else None
+        if existing is not None:
+            if not upsert:
+                return JSONResponse({"code": "23505", "message": "duplicate key value"}, status_code=409)
+            if not ignore:
+                existing.update(row)
+                out.append(existing)
+            continue
+        out.append(STORE.append(table, dict(row)))
+    return JSONResponse([dict(r) for r in out], status_code=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update(table: str, request: Request) -> list[dict[str, Any]]:
+    await _latency()
+    patch = await request.json()
+    rows = _filtered(STORE.table(table), dict(request.query_params))
+    for r in rows:
+        r.update(patch)
+    return [dict(r) for r in rows]
+
+
+@app.delete("/rest/v1/{table}")
+async def delete(table: str, request: Request) -> list[dict[str, Any]]:
+    await _latency()
+    doomed = _filtered(STORE.table(table), dict(request.query_params))
+    ids = {id(r) for r in doomed}
+    STORE.replace(table, [r for r in STORE.table(table) if id(r) not in ids])
+    return [dict(r) for r in doomed]
+
+
+def _rpc_apply_email_item_patches(p: dict[str, Any]) -> int:
+    by_id = STORE.index("email_items", ("id",))
+    n = 0
+    for entry in p.get("p_patches") or []:
+        row = by_id.get((entry.get("id"),))
+        if row is not None:
+            row.update(entry.get("patch") or {})
+            n += 1
+    return n
+
+
+def _insert_draft(email_item_id: str, draft_text: str, instruction: str | None) -> dict[str, Any]:
+    drafts = STORE.table("reply_drafts")
+    version = 1 + max((d.get("version") or 0 for d in drafts if d.get("email_item_id") == email_item_id), default=0)
+    row = {"email_item_id": email_item_id, "draft_text": draft_text, "instruction": instruction, "version": version}
+    return dict(STORE.append("reply_drafts", row))
+
+
+def _rpc_insert_reply_drafts(p: dict[str, Any]) -> list[dict[str, Any]]:
+    return [_insert_draft(d["email_item_id"], d["draft_text"], d.get("instruction")) for d in p.get("p_drafts") or []]
+
+
+def _rpc_insert_reply_draft(p: dict[str, Any]) -> dict[str, Any]:
+    return _insert_draft(p["p_email_item_id"], p["p_draft_text"], p.get("p_instruction"))
+
+
+def _rpc_record_llm_usage(p: dict[str, Any]) -> None:
+    table = STORE.table("llm_usage_daily")
+    for row in p.get("p_rows") or []:
+        key = ("user_id", "day", "bucket_id", "stage", "provider", "model")
+        existing = next((r for r in table if all(r.get(k) == row.get(k) for k in key)), None)
+        if existing is None:
+            table.append(dict(row))
+            continue
+        for k in ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"):
+            existing[k] = (existing.get(k) or 0) + (row.get(k) or 0)
+
+
+def _rpc_inbox_counts(p: dict[str, Any]) -> list[dict[str, Any]]:
+    counts: dict[tuple[Any, Any], int] = {}
+    for r in STORE.table("email_items"):
+        if r.get("user_id") == p.get("p_user_id"):
+            k = (r.get("bucket_id"), r.get("status"))
+            counts[k] = counts.get(k, 0) + 1
+    return [{"bucket_id": b, "status": s, "n": n} for (b, s), n in counts.items()]
+
+
+def _parse_ts(value: Any) -> datetime | None:
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")) if value else None
+    except ValueError:
+        return None
+
+
+def _shard_key(account_id: Any) -> int:
+    # Stands in for Postgres hashtext(): any stable hash spreads accounts the same way for the bench.
+    return int.from_bytes(hashlib.md5(str(account_id).encode("utf-8")).digest()[:4], "big") & 1023
+
+
+def _rpc_claim_gmail_accounts(p: dict[str, Any]) -> list[dict[str, Any]]:
+    now = datetime.now(tz=timezone.utc)
+    lo, hi = int(p["p_shard_lo"]), int(p["p_shard_hi"])
+    due = []
+    for r in STORE.table("gmail_accounts"):
+        next_poll_at = _parse_ts(r.get("next_poll_at")) or now
+        lease = _parse_ts(r.get("poll_lease_until"))
+        if r.get("status") != "active" or next_poll_at > now or (lease is not None and lease >= now):
+            continue
+        if lo <= _shard_key(r.get("id")) < hi:
+            due.append((next_poll_at, r))
+    due.sort(key=lambda t: t[0])
+    claimed = []
+    for _, r in due[: int(p["p_limit"])]:
+        r["poll_lease_until"] = (now + timedelta(seconds=int(p["p_lease_s"]))).isoformat()
+        r["poll_lease_owner"] = p.get("p_owner")
+        claimed.append(dict(r))
+    return claimed
+
+
+def _rpc_lease_gmail_account(p: dict[str, Any]) -> bool:
+    now = datetime.now(tz=timezone.utc)
+    for r in STORE.table("gmail_accounts"):
+        if r.get("id") != p["p_id"]:
+            continue
+        lease = _parse_ts(r.get("poll_lease_until"))
+        if lease is not None and lease >= now:
+            return False
+        r["poll_lease_until"] = (now + timedelta(seconds=int(p["p_lease_s"]))).isoformat()
+        r["poll_lease_owner"] = p.get("p_owner")
+        return True
+    return False
+
+
+_RPCS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "apply_email_item_patches": _rpc_apply_email_item_patches,
+    "insert_reply_drafts": _rpc_insert_reply_drafts,
+    "insert_reply_draft": _rpc_insert_reply_draft,
+    "record_llm_usage": _rpc_record_llm_usage,
+    "inbox_counts": _rpc_inbox_counts,
+    "claim_gmail_accounts": _rpc_claim_gmail_accounts,
+    "lease_gmail_account": _rpc_lease_gmail_account,
+}
+
+
+@app.post("/rest/v1/rpc/{fn}")
+async def rpc(fn: str, request: Request) -> Any:
+    await _latency()
+    handler = _RPCS.get(fn)
+    if handler is None:
+        raise HTTPException(status_code=404, detail=f"Unknown function: {fn}")
+    return handler(await request.json())
+
+
+@app.get("/auth/v1/user")
+async def auth_user(request: Request) -> dict[str, Any]:
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    return {"id": token, "aud": "authenticated"}
@@ -0,0 +1,579 @@
+"""End-to-end benchmarks for the poll/process pipeline against in-process mock services.
+
+Usage (from apps/api):
+
+    python -m bench.pipeline                                  # every scenario, default sizes
+    python -m bench.pipeline --scenario cron --accounts 20 --messages 150
+    python -m bench.pipeline --llm-latency-ms 400 --gmail-latency-ms 40 --supabase-latency-ms 8
+    python -m bench.pipeline --out bench-$(git rev-parse --short HEAD).json
+    python -m bench.pipeline --compare bench-<base>.json      # deltas vs an earlier run
+    python -m bench.pipeline --corpus corpus/ --scenario cron # replay `bench.corpus --out corpus/`
+
+Scenarios: `cron` (POST /cron/poll-gmail over every account), `poll_now` (POST /poll/now per user,
+then GET /poll/runs/{id} until the run is done),
+`push` (live mail announced by `--storm` duplicate Gmail notifications per message to /webhooks/gmail),
+`backfill` (POST /cron/backfill ticks over just-connected accounts until their history is processed),
+`process` (process_ingested_for_account until the backlog is drained), `route` (route_to_bucket)
+and `extract` (extract_body_text). Mailboxes and samples come from bench.corpus: generated from
+`--seed` (deterministic), or replayed from a `--corpus` directory of JSONL files. Gmail, Google
+OAuth, Supabase (PostgREST) and OpenAI are served by bench.mock_gmail / mock_supabase / mock_openai
+in-process; nothing leaves the machine.
+
+Each scenario reports throughput, latency percentiles and round trips per service/endpoint. With
+the mock latencies at 0 (default) wall time is app CPU plus mock overhead; round-trip counts are
+exact and the most stable number to compare across commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterator
+
+import httpx
+
+from bench.corpus import CorpusSpec, generate_mailbox, read_jsonl
+from bench.harness import (
+    CRON_SECRET,
+    PUSH_TOKEN,
+    RouterTransport,
+    ScenarioResult,
+    Stopwatch,
+    configure_env,
+    git_revision,
+)
+
+if TYPE_CHECKING:
+    from bench.mock_gmail import Mailbox
+
+
+SCENARIOS = ("cron", "poll_now", "push", "backfill", "process", "route", "extract")
+
+
+def _mailboxes(*, accounts: int, messages: int, spec: CorpusSpec, corpus: Path | None) -> list[Mailbox]:
+    """Mailboxes replayed from a corpus directory (one per .jsonl file), else generated from `spec`."""
+    from bench import mock_gmail
+
+    if corpus is not None:
+        return [mock_gmail.jsonl_mailbox(p) for p in sorted(corpus.glob("*.jsonl"))[:accounts]]
+    spec = replace(spec, messages=messages)
+    return [mock_gmail.corpus_mailbox(account=f"acct{i}", spec=spec) for i in range(accounts)]
+
+
+def _seed_accounts(mailboxes: list[Mailbox]) -> list[dict[str, Any]]:
+    """One user per Gmail account, each serving one mailbox."""
+    from app.crypto_utils import encrypt_text
+    from bench import mock_gmail, mock_supabase
+
+    rows = []
+    for i, mailbox in enumerate(mailboxes):
+        refresh_token = f"rt-{i}"
+        mock_gmail.add_mailbox(refresh_token, mailbox)
+        rows.append(
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": str(uuid.uuid4()),
+                "google_email": mailbox.email_address,
+                "refresh_token_encrypted": encrypt_text(refresh_token),
+                "last_polled_at": None,
+                "next_poll_at": datetime.now(tz=timezone.utc).isoformat(),
+                "status": "active",
+            }
+        )
+    return mock_supabase.STORE.seed("gmail_accounts", rows)
+
+
+def _reset(router: RouterTransport) -> None:
+    from app.google_oauth import reset_access_tokens
+    from bench import mock_gmail, mock_supabase
+
+    mock_gmail.reset()
+    mock_supabase.STORE.reset()
+    # Every scenario starts cold, whatever ran before it.
+    reset_access_tokens()
+    router.reset()
+
+
+def _run_durations() -> list[float]:
+    from bench import mock_supabase
+
+    out = []
+    for r in mock_supabase.STORE.table("processing_runs"):
+        started = datetime.fromisoformat(r["started_at"])
+        finished = datetime.fromisoformat(r["finished_at"])
+        out.append((finished - started).total_seconds())
+    return out
+
+
+def _api_client() -> httpx.AsyncClient:
+    from app.main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api.bench", timeout=600)
+
+
+async def scenario_cron(router: RouterTransport, *, mailboxes: Callable[[], list[Mailbox]], **_: Any) -> ScenarioResult:
+    _reset(router)
+    _seed_accounts(mailboxes())
+    router.reset()
+    async with _api_client() as api:
+        with Stopwatch() as sw:
+            resp = await api.post("/cron/poll-gmail", headers={"X-CRON-SECRET": CRON_SECRET})
+    resp.raise_for_status()
+    body = resp.json()
+    per_account = body.get("per_account") or []
+    return ScenarioResult(
+        name="cron",
+        ops=int(body.get("total_new") or 0),
+        unit="message",
+        wall_s=sw.elapsed,
+        latencies_s=_run_durations(),
+        round_trips=router.snapshot(),
+        extra={
+            "accounts": len(per_account),
+            "processed": sum(int(a.get("processed") or 0) for a in per_account),
+            "errors": sum(len(a.get("errors") or []) for a in per_account),
+            "latency_of": "account",
+        },
+    )
+
+
+async def scenario_poll_now(
+    router: RouterTransport, *, mailboxes: Callable[[], list[Mailbox]], concurrency: int = 1, **_: Any
+) -> ScenarioResult:
+    _reset(router)
+    seeded = _seed_accounts(mailboxes())
+    router.reset()
+    latencies: list[float] = []
+    enqueue_latencies: list[float] = []
+    new = processed = errors = 0
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async with _api_client() as api:
+
+        async def poll(user_id: str) -> None:
+            nonlocal new, processed, errors
+            headers = {"Authorization": f"Bearer {user_id}"}
+            async with sem:
+                started = time.perf_counter()
+                resp = await api.post("/poll/now", headers=headers)
+                resp.raise_for_status()
+                enqueue_latencies.append(time.perf_counter() - started)
+                run_id = resp.json().get("run_id")
+                progress: dict[str, Any] = {}
+                while run_id:
+                    resp = await api.get(f"/poll/runs/{run_id}", headers=headers)
+                    resp.raise_for_status()
+                    progress = resp.json()
+                    if progress.get("status") != "running":
+                        break
+                    await asyncio.sleep(0.005)
+                latencies.append(time.perf_counter() - started)
+            totals = progress.get("totals") or {}
+            new += int(totals.get("inserted") or 0)
+            processed += int(totals.get("processed") or 0)
+            errors += sum(1 for a in progress.get("accounts") or [] if a.get("status") != "done")
+
+        with Stopwatch() as sw:
+            await asyncio.gather(*(poll(acc["user_id"]) for acc in seeded))
+
+    return ScenarioResult(
+        name="poll_now",
+        ops=len(seeded),
+        unit="poll",
+        wall_s=sw.elapsed,
+        latencies_s=latencies,
+        round_trips=router.snapshot(),
+        extra={
+            "messages": new,
+            "processed": processed,
+            "errors": errors,
+            "concurrency": concurrency,
+            "enqueue_p50_ms": round(sorted(enqueue_latencies)[len(enqueue_latencies) // 2] * 1000, 3)
+            if enqueue_latencies
+            else None,
+            "latency_of": "poll (click -> run done)",
+        },
+    )
+
+
+async def scenario_push(
+    router: RouterTransport,
+    *,
+    mailboxes: Callable[[], list[Mailbox]],
+    rounds: int = 5,
+    storm: int = 10,
+    **_: Any,
+) -> ScenarioResult:
+    """Live mail through Gmail watch notifications: each round delivers one message per mailbox and
+    posts `storm` duplicate notifications for it to /webhooks/gmail, then waits for the syncs."""
+    from app.main import push_syncs
+    from app.metrics import PUSH_NOTIFICATIONS
+    from bench import mock_supabase
+    from bench.pubsub import envelope
+
+    _reset(router)
+    boxes = mailboxes()
+    # Connected and watched already: only mail delivered from here on is new.
+    for row, box in zip(_seed_accounts(boxes), boxes):
+        row["last_polled_at"] = datetime.now(tz=timezone.utc).isoformat()
+        row["watch_history_id"] = box.history_id
+    router.reset()
+    before = {o: PUSH_NOTIFICATIONS.value(outcome=o) for o in ("scheduled", "coalesced", "stale", "sync_failed")}
+
+    latencies: list[float] = []
+    delivered = 0
+    async with _api_client() as api:
+        with Stopwatch() as sw:
+            for r in range(rounds):
+                started = time.perf_counter()
+                for box in boxes:
+                    src = box.messages[-1 - (r % len(box.messages))]
+                    history_id = box.deliver({**src, "id": f"live{r}-{src['id']}"})
+                    delivered += 1
+                    for _ in range(storm):
+                        resp = await api.post(
+                            "/webhooks/gmail", params={"token": PUSH_TOKEN}, json=envelope(box.email_address, history_id)
+                        )
+                        resp.raise_for_status()
+                while push_syncs.pending():
+                    await asyncio.sleep(0.002)
+                latencies.append(time.perf_counter() - started)
+
+    outcomes = {o: int(PUSH_NOTIFICATIONS.value(outcome=o) - n) for o, n in before.items()}
+    return ScenarioResult(
+        name="push",
+        ops=delivered,
+        unit="message",
+        wall_s=sw.elapsed,
+        latencies_s=latencies,
+        round_trips=router.snapshot(),
+        extra={
+            "notifications": delivered * storm,
+            "syncs": len(mock_supabase.STORE.table("processing_runs")),
+            "ingested": len(mock_supabase.STORE.table("email_items")),
+            **outcomes,
+            "latency_of": "round (notify -> synced)",
+        },
+    )
+
+
+async def scenario_backfill(
+    router: RouterTransport, *, mailboxes: Callable[[], list[Mailbox]], max_ticks: int = 50, **_: Any
+) -> ScenarioResult:
+    """History backfill of just-connected accounts: POST /cron/backfill until every one is done."""
+    from app.ingestion import inbox_query
+    from bench import mock_supabase
+
+    _reset(router)
+    now = datetime.now(tz=timezone.utc)
+    accounts = _seed_accounts(mailboxes())
+    for row in accounts:
+        row.update(
+            {
+                "last_polled_at": now.isoformat(),
+                "backfill_status": "pending",
+                # Corpus mail ends at generation time, within this second.
+                "backfill_query": inbox_query(after=now - timedelta(days=30), before=now + timedelta(seconds=1)),
+                "backfill_listed": 0,
+                "backfill_next_at": now.isoformat(),
+            }
+        )
+    router.reset()
+
+    latencies: list[float] = []
+    async with _api_client() as api:
+        with Stopwatch() as sw:
+            while len(latencies) < max_ticks:
+                started = time.perf_counter()
+                resp = await api.post("/cron/backfill", headers={"X-CRON-SECRET": CRON_SECRET})
+                latencies.append(time.perf_counter() - started)
+                resp.raise_for_status()
+                if all(r.get("backfill_status") == "done" for r in accounts):
+                    break
+
+    items = mock_supabase.STORE.table("email_items")
+    return ScenarioResult(
+        name="backfill",
+        ops=len(items),
+        unit="message",
+        wall_s=sw.elapsed,
+        latencies_s=latencies,
+        round_trips=router.snapshot(),
+        extra={
+            "ticks": len(latencies),
+            "done": sum(1 for r in accounts if r.get("backfill_status") == "done"),
+            "still_backfilled": sum(1 for r in items if r.get("status") == "backfilled"),
+            "latency_of": "tick",
+        },
+    )
+
+
+async def scenario_process(
+    router: RouterTransport, *, mailboxes: Callable[[], list[Mailbox]], max_items: int = 25, **_: Any
+) -> ScenarioResult:
+    from app.gmail_client import _extract_headers, extract_body_text, parse_from_email, parse_received_at
+    from app.processing import process_ingested_for_account
+    from app.supabase_rest import SupabaseRest
+    from bench import mock_supabase
+
+    _reset(router)
+    boxes = mailboxes()
+    seeded = _seed_accounts(boxes)
+
+    # Items as if already ingested: the backlog process_ingested_for_account drains.
+    for acc, mailbox in zip(seeded, boxes):
+        rows = []
+        for m in mailbox.messages:
+            headers = _extract_headers(m)
+            rows.append(
+                {
+                    "user_id": acc["user_id"],
+                    "gmail_account_id": acc["id"],
+                    "gmail_message_id": m["id"],
+                    "thread_id": m["threadId"],
+                    "from_email": parse_from_email(headers.get("from")),
+                    "subject": headers.get("subject"),
+                    "snippet": m.get("snippet"),
+                    "received_at": parse_received_at(m).isoformat(),
+                    "body_text": extract_body_text(m),
+                    "status": "ingested",
+                }
+            )
+        mock_supabase.STORE.seed("email_items", rows)
+
+    router.reset()
+    supabase = SupabaseRest()
+    latencies: list[float] = []
+    handled = 0
+    with Stopwatch() as sw:
+        for acc in seeded:
+            while True:
+                started = time.perf_counter()
+                res = await process_ingested_for_account(
+                    supabase=supabase, user_id=acc["user_id"], gmail_account_id=acc["id"], max_items=max_items
+                )
+                counts = res.get("counts") or {}
+                n = sum(int(counts.get(k) or 0) for k in ("processed", "failed", "superseded", "batch_queued"))
+                if n == 0:
+                    break
+                latencies.append((time.perf_counter() - started) / n)
+                handled += n
+
+    return ScenarioResult(
+        name="process",
+        ops=handled,
+        unit="item",
+        wall_s=sw.elapsed,
+        latencies_s=latencies,
+        round_trips=router.snapshot(),
+        extra={"max_items": max_items, "latency_of": "item (per-run mean)"},
+    )
+
+
+def _sample_messages(spec: CorpusSpec, corpus: Path | None, n: int) -> Iterator[dict[str, Any]]:
+    if corpus is not None:
+        return itertools.islice((m for p in sorted(corpus.glob("*.jsonl")) for m in read_jsonl(p)), n)
+    return generate_mailbox("sample", replace(spec, messages=n))
+
+
+def _sample_items(messages: Iterator[dict[str, Any]]) -> list[dict[str, Any]]:
+    from app.gmail_client import _extract_headers, extract_body_text, parse_from_email
+
+    out = []
+    for m in messages:
+        headers = _extract_headers(m)
+        out.append(
+            {
+                "from_email": parse_from_email(headers.get("from")),
+                "subject": headers.get("subject"),
+                "snippet": m.get("snippet"),
+                "body_text": extract_body_text(m),
+            }
+        )
+    return out
+
+
+async def scenario_route(
+    router: RouterTransport, *, samples: Callable[[], Iterator[dict[str, Any]]], **_: Any
+) -> ScenarioResult:
+    from app.buckets import DEFAULT_BUCKETS, route_to_bucket
+
+    samples_ = _sample_items(samples())
+    latencies: list[float] = []
+    with Stopwatch() as sw:
+        for s in samples_:
+            started = time.perf_counter()
+            route_to_bucket(buckets=DEFAULT_BUCKETS, **s)
+            latencies.append(time.perf_counter() - started)
+    return ScenarioResult(name="route", ops=len(samples_), unit="message", wall_s=sw.elapsed, latencies_s=latencies)
+
+
+async def scenario_extract(
+    router: RouterTransport, *, samples: Callable[[], Iterator[dict[str, Any]]], **_: Any
+) -> ScenarioResult:
+    from app.gmail_client import extract_body_text
+
+    # Streamed: only the message being parsed is held in memory, so --items can be 1M.
+    latencies: list[float] = []
+    body_bytes = 0
+    started_all = time.perf_counter()
+    parse_s = 0.0
+    for m in samples():
+        started = time.perf_counter()
+        body_bytes += len(extract_body_text(m))
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        parse_s += elapsed
+    return ScenarioResult(
+        name="extract",
+        ops=len(latencies),
+        unit="message",
+        wall_s=parse_s,
+        latencies_s=latencies,
+        extra={"body_chars": body_bytes, "generate_s": round(time.perf_counter() - started_all - parse_s, 3)},
+    )
+
+
+_DRIVERS: dict[str, Callable[..., Awaitable[ScenarioResult]]] = {
+    "cron": scenario_cron,
+    "poll_now": scenario_poll_now,
+    "push": scenario_push,
+    "backfill": scenario_backfill,
+    "process": scenario_process,
+    "route": scenario_route,
+    "extract": scenario_extract,
+}
+
+
+async def run(
+    names: list[str],
+    *,
+    accounts: int,
+    messages: int,
+    items: int,
+    concurrency: int,
+    rounds: int,
+    storm: int,
+    spec: CorpusSpec,
+    corpus: Path | None = None,
+) -> dict[str, dict[str, Any]]:
+    from bench.harness import install
+
+    router = install()
+    driver_params: dict[str, Any] = {
+        "mailboxes": lambda: _mailboxes(accounts=accounts, messages=messages, spec=spec, corpus=corpus),
+        "samples": lambda: _sample_messages(spec, corpus, items),
+        "concurrency": concurrency,
+        "rounds": rounds,
+        "storm": storm,
+    }
+    scenarios: dict[str, Any] = {}
+    for name in names:
+        result = await _DRIVERS[name](router, **driver_params)
+        scenarios[name] = result.report()
+    return scenarios
+
+
+def _print_report(report: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    print(f"revision={report['revision']} params={json.dumps(report['params'], sort_keys=True)}")
+    if baseline:
+        print(f"baseline={baseline.get('revision')}")
+    header = f"{'scenario':<10}{'ops':>8}{'unit':>9}{'ops/s':>12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'rt/op':>8}"
+    print(header + ("  Δops/s   Δrt/op" if baseline else ""))
+    for name, r in report["scenarios"].items():
+        lat = r["latency"]
+        line = (
+            f"{name:<10}{r['ops']:>8}{r['unit']:>9}{r['throughput_per_s']:>12,.1f}"
+            f"{lat['p50_ms']:>10.3f}{lat['p90_ms']:>10.3f}{lat['p99_ms']:>10.3f}{r['round_trips_per_op']:>8.2f}"
+        )
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base:
+            d_tput = (r["throughput_per_s"] / base["throughput_per_s"] - 1) * 100 if base["throughput_per_s"] else 0.0
+            line += f"  {d_tput:>+6.1f}%  {r['round_trips_per_op'] - base['round_trips_per_op']:>+6.2f}"
+        print(line)
+    for name, r in report["scenarios"].items():
+        for service, endpoints in r["round_trips"].items():
+            calls = ", ".join(f"{ep}={n}" for ep, n in endpoints.items())
+            print(f"  {name}/{service}: {calls}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", action="append", choices=SCENARIOS, help="Repeatable (default: all)")
+    ap.add_argument("--accounts", type=int, default=5, help="Gmail accounts (one user each)")
+    ap.add_argument("--messages", type=int, default=60, help="Messages per mailbox (cron/poll_now/process)")
+    ap.add_argument("--items", type=int, default=2000, help="Messages for the route/extract scenarios")
+    ap.add_argument("--concurrency", type=int, default=1, help="Concurrent /poll/now requests")
+    ap.add_argument("--rounds", type=int, default=5, help="push: live-mail rounds")
+    ap.add_argument("--storm", type=int, default=10, help="push: notifications per delivered message")
+    ap.add_argument("--push-debounce-ms", type=float, default=50.0, help="push: GMAIL_PUSH_DEBOUNCE_S")
+    ap.add_argument("--corpus", type=Path, help="Replay <account>.jsonl mailboxes from bench.corpus --out")
+    ap.add_argument("--seed", type=int, default=42, help="Corpus seed (generated mailboxes)")
+    ap.add_argument("--reply-rate", type=float, default=0.35)
+    ap.add_argument("--attachment-mode", choices=("id", "inline"), default="id")
+    ap.add_argument("--gmail-latency-ms", type=float, default=0.0)
+    ap.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    ap.add_argument("--llm-latency-ms", type=float, default=0.0)
+    ap.add_argument("--out", type=Path, help="Write the JSON report here")
+    ap.add_argument("--compare", type=Path, help="Earlier JSON report to diff against")
+    ap.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = ap.parse_args()
+
+    configure_env(
+        MOCK_GMAIL_LATENCY_MS=str(args.gmail_latency_ms),
+        MOCK_SUPABASE_LATENCY_MS=str(args.supabase_latency_ms),
+        MOCK_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        GMAIL_PUSH_DEBOUNCE_S=str(args.push_debounce_ms / 1000),
+    )
+    params = {
+        "accounts": args.accounts,
+        "messages": args.messages,
+        "items": args.items,
+        "concurrency": args.concurrency,
+        "rounds": args.rounds,
+        "storm": args.storm,
+        "push_debounce_ms": args.push_debounce_ms,
+        "corpus": str(args.corpus) if args.corpus else None,
+        "seed": args.seed,
+        "reply_rate": args.reply_rate,
+        "attachment_mode": args.attachment_mode,
+        "gmail_latency_ms": args.gmail_latency_ms,
+        "supabase_latency_ms": args.supabase_latency_ms,
+        "llm_latency_ms": args.llm_latency_ms,
+    }
+    spec = CorpusSpec(seed=args.seed, reply_rate=args.reply_rate, attachment_mode=args.attachment_mode)
+    scenarios = asyncio.run(
+        run(
+            args.scenario or list(SCENARIOS),
+            accounts=args.accounts,
+            messages=args.messages,
+            items=args.items,
+            concurrency=args.concurrency,
+            rounds=args.rounds,
+            storm=args.storm,
+            spec=spec,
+            corpus=args.corpus,
+        )
+    )
+    report = {"revision": git_revision(), "params": params, "scenarios": scenarios}
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+    baseline = json.loads(args.compare.read_text("utf-8")) if args.compare else None
+    _print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
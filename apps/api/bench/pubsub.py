@@ -0,0 +1,70 @@
+"""Local stand-in for the Pub/Sub push subscription that delivers Gmail watch notifications.
+
+Usage (from apps/api), against a locally running API with GMAIL_PUSH_TOKEN set:
+
+    python -m bench.pubsub --url "http://localhost:8001/webhooks/gmail?token=$GMAIL_PUSH_TOKEN" \\
+        --email you@example.com --history-id 123456
+    python -m bench.pubsub --url ... --email you@example.com --history-id 123456 --storm 50
+
+Posts the same envelope Pub/Sub does (`message.data` = base64 JSON `{"emailAddress", "historyId"}`).
+`--storm N` sends N notifications back to back with increasing historyIds, which the API should
+coalesce into one or two syncs. The `push` scenario in bench.pipeline runs the same flow in-process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+
+
+SUBSCRIPTION = "projects/bench/subscriptions/gmail-push"
+
+
+def envelope(email_address: str, history_id: int) -> dict[str, Any]:
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id}).encode("utf-8")
+    message_id = str(uuid.uuid4().int)[:16]
+    return {
+        "message": {
+            "data": base64.b64encode(data).decode("ascii"),
+            "messageId": message_id,
+            "message_id": message_id,
+            "publishTime": datetime.now(tz=timezone.utc).isoformat().replace("+00:00", "Z"),
+        },
+        "subscription": SUBSCRIPTION,
+    }
+
+
+async def publish(client: httpx.AsyncClient, url: str, email_address: str, history_id: int) -> int:
+    resp = await client.post(url, json=envelope(email_address, history_id))
+    return resp.status_code
+
+
+async def _storm(url: str, email_address: str, history_id: int, n: int) -> list[int]:
+    async with httpx.AsyncClient(timeout=30) as client:
+        return [await publish(client, url, email_address, history_id + i) for i in range(n)]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", required=True, help="Webhook URL including ?token=")
+    ap.add_argument("--email", required=True, help="Connected Gmail address (gmail_accounts.google_email)")
+    ap.add_argument("--history-id", type=int, default=int(time.time()), help="historyId of the first notification")
+    ap.add_argument("--storm", type=int, default=1, help="Notifications to send back to back")
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    statuses = asyncio.run(_storm(args.url, args.email, args.history_id, args.storm))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"sent={len(statuses)} statuses={dict((s, statuses.count(s)) for s in sorted(set(statuses)))} ms={elapsed_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+
+from bench.harness import configure_env
+
+configure_env()
+
+from app import processing  # noqa: E402
+from app.backfill import BackfillPipeline, backfill_account, start_backfill  # noqa: E402
+from app.body_store import get_body_store  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.crypto_utils import decrypt_text  # noqa: E402
+from app.google_oauth import refresh_access_token, reset_access_tokens  # noqa: E402
+from app.ingestion import IngestionPipeline, inbox_query  # noqa: E402
+from app.push_dispatch import PushDispatcher  # noqa: E402
+from app.supabase_rest import SupabaseRest  # noqa: E402
+from bench import mock_gmail, mock_supabase  # noqa: E402
+from bench.corpus import CorpusSpec  # noqa: E402
+from bench.harness import install  # noqa: E402
+from bench.pipeline import _mailboxes, _seed_accounts  # noqa: E402
+
+
+@pytest.fixture
+def account() -> dict[str, Any]:
+    """One connected account (bench mocks for Gmail, PostgREST and OpenAI) with a queued backfill."""
+    get_settings.cache_clear()
+    install()
+    mock_gmail.reset()
+    mock_supabase.STORE.reset()
+    reset_access_tokens()
+    acc = _seed_accounts(_mailboxes(accounts=1, messages=40, spec=CorpusSpec(), corpus=None))[0]
+    # Corpus mail ends at generation time; connect a moment later so all of it is history.
+    asyncio.run(start_backfill(supabase=SupabaseRest(), acc=acc, now=datetime.now(tz=timezone.utc) + timedelta(hours=2)))
+    return acc
+
+
+def run_backfill(acc: dict[str, Any], *, ticks: int = 10) -> list[dict[str, Any]]:
+    """Cron ticks over `acc` until its backfill stops; returns each tick's result."""
+
+    async def go() -> list[dict[str, Any]]:
+        supabase = SupabaseRest()
+        results = []
+        for _ in range(ticks):
+            row = mock_supabase.STORE.table("gmail_accounts")[0]
+            if row.get("backfill_status") not in ("pending", "running", "promoting"):
+                break
+            results.append(
+                await backfill_account(
+                    supabase=supabase,
+                    body_store=get_body_store(supabase=supabase),
+                    acc=dict(row),
+                    deadline=time.monotonic() + 60,
+                )
+            )
+        return results
+
+    return asyncio.run(go())
+
+
+def test_backfilled_mail_is_never_queued_for_review(account: dict[str, Any]) -> None:
+    run_backfill(account)
+
+    items = mock_supabase.STORE.table("email_items")
+    assert items
+    assert mock_supabase.STORE.table("gmail_accounts")[0]["backfill_status"] == "done"
+    assert {r["status"] for r in items} <= {"processed", "superseded"}
+    # Relevant history still gets its summary.
+    assert any(r.get("summary_json") for r in items)
+    assert not mock_supabase.STORE.table("reply_drafts")
+
+
+def test_backfill_leaves_live_mail_its_share_of_the_budget(account: dict[str, Any]) -> None:
+    user_id = account["user_id"]
+    mock_supabase.STORE.append("context_packs", {"user_id": user_id, "llm_daily_budget_usd": 1.0})
+    day = datetime.now(tz=timezone.utc).date().isoformat()
+    share = get_settings().backfill_budget_share
+    mock_supabase.STORE.append("llm_usage_daily", {"user_id": user_id, "day": day, "cost_usd": share})
+
+    run_backfill(account, ticks=3)
+
+    items = mock_supabase.STORE.table("email_items")
+    assert items
+    assert {r["status"] for r in items} == {"backfilled"}
+    assert mock_supabase.STORE.table("gmail_accounts")[0]["backfill_status"] == "promoting"
+
+
+def test_backfill_fails_when_results_cannot_be_written(
+    account: dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def flush(self: processing._ResultWriter) -> list[tuple[str, str]]:
+        patches, self._patches = self._patches, {}
+        return [(email_item_id, "write failed") for email_item_id in patches]
+
+    monkeypatch.setattr(processing._ResultWriter, "flush", flush)
+
+    results = run_backfill(account)
+
+    row = mock_supabase.STORE.table("gmail_accounts")[0]
+    assert row["backfill_status"] == "failed"
+    assert row["backfill_error"]
+    assert results[-1]["promoted"] == 0
+    assert {r["status"] for r in mock_supabase.STORE.table("email_items")} == {"backfilled"}
+
+
+def test_live_poll_takes_over_overlapping_backfilled_mail(account: dict[str, Any]) -> None:
+    async def go() -> IngestionPipeline:
+        supabase = SupabaseRest()
+        acc = dict(mock_supabase.STORE.table("gmail_accounts")[0])
+        access_token = await refresh_access_token(refresh_token=decrypt_text(acc["refresh_token_encrypted"]))
+        kwargs: dict[str, Any] = {
+            "supabase": supabase,
+            "body_store": get_body_store(supabase=supabase),
+            "acc": acc,
+            "access_token": access_token,
+            "now": datetime.now(tz=timezone.utc),
+        }
+        await BackfillPipeline(push_dispatcher=None, page_token=None, **kwargs).run(acc["backfill_query"])
+        assert {r["status"] for r in mock_supabase.STORE.table("email_items")} == {"backfilled"}
+
+        # The first live poll's window overlaps the backfill's.
+        live = IngestionPipeline(push_dispatcher=PushDispatcher(supabase=supabase), **kwargs)
+        await live.run(inbox_query(after=kwargs["now"] - timedelta(days=30)))
+        return live
+
+    live = asyncio.run(go())
+
+    items = mock_supabase.STORE.table("email_items")
+    assert live.inserted == len(items)
+    assert "backfilled" not in {r["status"] for r in items}
+    assert all(r.get("body_hash") or r.get("body_text") for r in items)
+    assert mock_supabase.STORE.table("reply_drafts")
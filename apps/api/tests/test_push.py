@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import base64
+import json
+import time
+
+import pytest
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from app import push
+
+
+def _b64url(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _to_b64url(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).decode("ascii").rstrip("=")
+
+
+def _raw_public(key: ec.EllipticCurvePrivateKey) -> bytes:
+    return key.public_key().public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+
+
+def _private_from_d(d: str) -> ec.EllipticCurvePrivateKey:
+    return ec.derive_private_key(int.from_bytes(_b64url(d), "big"), ec.SECP256R1())
+
+
+def _hkdf(*, salt: bytes, ikm: bytes, info: bytes, length: int) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(ikm)
+
+
+def _decrypt(body: bytes, *, ua_private: ec.EllipticCurvePrivateKey, auth_secret: bytes) -> bytes:
+    """User-agent side of RFC 8291 (aes128gcm, single record), written from the RFC, not from push.py."""
+    salt, rs, idlen = body[:16], int.from_bytes(body[16:20], "big"), body[20]
+    as_public, ciphertext = body[21 : 21 + idlen], body[21 + idlen :]
+    assert len(ciphertext) <= rs
+
+    as_key = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), as_public)
+    ecdh_secret = ua_private.exchange(ec.ECDH(), as_key)
+    ikm = _hkdf(
+        salt=auth_secret,
+        ikm=ecdh_secret,
+        info=b"WebPush: info\x00" + _raw_public(ua_private) + as_public,
+        length=32,
+    )
+    cek = _hkdf(salt=salt, ikm=ikm, info=b"Content-Encoding: aes128gcm\x00", length=16)
+    nonce = _hkdf(salt=salt, ikm=ikm, info=b"Content-Encoding: nonce\x00", length=12)
+    padded = AESGCM(cek).decrypt(nonce, ciphertext, None)
+    # Last record: the plaintext is followed by 0x02 and optional zero padding.
+    unpadded = padded.rstrip(b"\x00")
+    assert unpadded.endswith(b"\x02")
+    return unpadded[:-1]
+
+
+def test_encrypt_payload_round_trip() -> None:
+    ua_private = ec.generate_private_key(ec.SECP256R1())
+    auth_secret = b"0123456789abcdef"
+    plaintext = json.dumps({"title": "a@example.com", "body": "Invoice overdue", "url": "/inbox/1"}).encode()
+
+    body = push.encrypt_payload(
+        plaintext=plaintext, p256dh=_to_b64url(_raw_public(ua_private)), auth=_to_b64url(auth_secret)
+    )
+
+    assert _decrypt(body, ua_private=ua_private, auth_secret=auth_secret) == plaintext
+
+
+def test_encrypt_payload_matches_rfc8291_example(monkeypatch: pytest.MonkeyPatch) -> None:
+    # RFC 8291 appendix A, with its ephemeral key and salt pinned.
+    as_private = _private_from_d("yfWPiYE-n46HLnH0KqZOF1fJJU3MYrct3AELtAQ-oRw")
+    monkeypatch.setattr(push.ec, "generate_private_key", lambda curve: as_private)
+    monkeypatch.setattr(push.os, "urandom", lambda n: _b64url("DGv6ra1nlYgDCS1FRnbzlw"))
+
+    body = push.encrypt_payload(
+        plaintext=b"When I grow up, I want to be a watermelon",
+        p256dh="BCVxsr7N_eNgVRqvHtD0zTZsEc6-VV-JvLexhqUzORcxaOzi6-AYWXvTBHm4bjyPjs7Vd8pZGH6SRpkNtoIAiw4",
+        auth="BTBZMqHH6r4Tts7J_aSIgg",
+    )
+
+    assert _to_b64url(body) == (
+        "DGv6ra1nlYgDCS1FRnbzlwAAEABBBP4z9KsN6nGRTbVYI_c7VJSPQTBtkgcy27mlmlMoZIIgDll6e3vCYLocInmYWAmS6Tlz"
+        "AC8wEqKK6PBru3jl7A_yl95bQpu6cVPTpK4Mqgkf1CXztLVBSt2Ks3oZwbuwXPXLWyouBWLVWGNWQexSgSxsj_Qulcy4a-fN"
+    )
+
+
+def test_encrypt_payload_rejects_bad_keys() -> None:
+    with pytest.raises(push.WebPushError):
+        push.encrypt_payload(plaintext=b"x", p256dh=_to_b64url(b"\x04" * 10), auth=_to_b64url(b"a" * 16))
+
+
+@pytest.fixture
+def vapid_key() -> str:
+    push._vapid_jwt_cache.clear()
+    d = ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value
+    return _to_b64url(d.to_bytes(32, "big"))
+
+
+def _parse_authorization(value: str) -> tuple[str, str]:
+    scheme, _, params = value.partition(" ")
+    assert scheme == "vapid"
+    fields = dict(p.strip().split("=", 1) for p in params.split(","))
+    return fields["t"], fields["k"]
+
+
+def test_vapid_jwt_verifies_against_advertised_key(vapid_key: str) -> None:
+    endpoint = "https://fcm.googleapis.com/fcm/send/abc123"
+    token, k = _parse_authorization(
+        push._vapid_authorization(endpoint=endpoint, vapid_private_key=vapid_key, vapid_subject="mailto:ops@example.com")
+    )
+
+    header_b64, claims_b64, sig_b64 = token.split(".")
+    assert json.loads(_b64url(header_b64)) == {"typ": "JWT", "alg": "ES256"}
+    claims = json.loads(_b64url(claims_b64))
+    assert claims["aud"] == "https://fcm.googleapis.com"
+    assert claims["sub"] == "mailto:ops@example.com"
+    assert time.time() < claims["exp"] <= time.time() + 24 * 3600
+
+    # ES256: raw 64-byte r || s, checked with the `k` public key the push service is given.
+    sig = _b64url(sig_b64)
+    assert len(sig) == 64
+    public = ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), _b64url(k))
+    der = encode_dss_signature(int.from_bytes(sig[:32], "big"), int.from_bytes(sig[32:], "big"))
+    public.verify(der, f"{header_b64}.{claims_b64}".encode("ascii"), ec.ECDSA(hashes.SHA256()))
+    with pytest.raises(InvalidSignature):
+        public.verify(der, f"{header_b64}.{claims_b64}x".encode("ascii"), ec.ECDSA(hashes.SHA256()))
+
+
+def test_vapid_jwt_cache_is_per_origin_key_and_subject(vapid_key: str) -> None:
+    def token(endpoint: str, key: str, subject: str) -> str:
+        return _parse_authorization(
+            push._vapid_authorization(endpoint=endpoint, vapid_private_key=key, vapid_subject=subject)
+        )[0]
+
+    first = token("https://push.example/a", vapid_key, "mailto:a@example.com")
+    assert token("https://push.example/b", vapid_key, "mailto:a@example.com") == first
+    assert token("https://other.example/a", vapid_key, "mailto:a@example.com") != first
+    assert token("https://push.example/a", vapid_key, "mailto:b@example.com") != first
+
+    rotated = _to_b64url(ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value.to_bytes(32, "big"))
+    rotated_token = token("https://push.example/a", rotated, "mailto:a@example.com")
+    assert rotated_token != first
+    claims = json.loads(_b64url(rotated_token.split(".")[1]))
+    assert claims["sub"] == "mailto:a@example.com"
@@ -8,7 +8,7 @@ self.addEventListener("activate", (event) => {
   event.waitUntil(self.clients.claim());
 });
 
-// Expect a JSON payload: { title, body, url, email_item_id }
+// Expect a JSON payload: { title, body, url, email_item_id } (digests: email_item_id=null, count)
 self.addEventListener("push", (event) => {
   let data = null;
   try {
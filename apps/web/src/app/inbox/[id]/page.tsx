@@ -23,6 +23,7 @@ type EmailItemRow = {
   from_email: string | null;
   subject: string | null;
   body_text: string | null;
+  body_hash: string | null;
   summary_json: unknown;
   status: string;
   is_relevant: boolean | null;
@@ -74,7 +75,7 @@ export default function EmailDetailPage({
       const { data, error: qErr } = await supabase
         .from("email_items")
         .select(
-          "id,from_email,subject,body_text,summary_json,status,is_relevant,bucket_id",
+          "id,from_email,subject,body_text,body_hash,summary_json,status,is_relevant,bucket_id",
         )
         .eq("id", params.id)
         .maybeSingle();
@@ -87,6 +88,13 @@ export default function EmailDetailPage({
 
       const it = (data as EmailItemRow) || null;
       setItem(it);
+
+      // Bodies live in the API's body store; legacy rows still carry body_text inline.
+      if (it && it.body_text == null && it.body_hash) {
+        const body = await fetchEmailBody(session.access_token, it.id);
+        if (!alive) return;
+        if (body != null) setItem({ ...it, body_text: body });
+      }
       setBucketName(null);
       if (it?.bucket_id) {
         const { data: bData } = await supabase
@@ -406,6 +414,19 @@ async function reviseDraft(
   }
 }
 
+async function fetchEmailBody(token: string, emailItemId: string) {
+  const apiBase = process.env.NEXT_PUBLIC_API_BASE_URL;
+  if (!apiBase) return null;
+
+  const res = await fetch(
+    `${apiBase.replace(/\/$/, "")}/email-items/${emailItemId}/body`,
+    { headers: { authorization: `Bearer ${token}` } },
+  );
+  if (!res.ok) return null;
+  const json = (await res.json()) as { body_text?: unknown };
+  return typeof json?.body_text === "string" ? json.body_text : null;
+}
+
 async function sendReply(
   emailItemId: string,
   finalDraftText: string,
@@ -8,6 +8,7 @@ import { PollNowButton } from "@/components/PollNowButton";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/Card";
 import { TabsList, TabsTrigger } from "@/components/ui/Tabs";
 import { Badge } from "@/components/ui/Badge";
+import { Button } from "@/components/ui/Button";
 import { ButtonLink } from "@/components/ui/ButtonLink";
 
 type BucketRow = {
@@ -30,6 +31,17 @@ type EmailItemRow = {
 
 type ViewKey = "needs_review" | "sent" | "all";
 
+type InboxCounts = {
+  views: Record<ViewKey, number>;
+  by_bucket: Record<string, number>;
+};
+
+type InboxPage = {
+  items: EmailItemRow[];
+  next_cursor: string | null;
+  counts: InboxCounts | null;
+};
+
 export default function InboxPage() {
   const { supabase, session } = useSupabaseSession();
 
@@ -38,10 +50,36 @@ export default function InboxPage() {
 
   const [buckets, setBuckets] = useState<BucketRow[]>([]);
   const [items, setItems] = useState<EmailItemRow[]>([]);
+  const [counts, setCounts] = useState<InboxCounts | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [reloadTick, setReloadTick] = useState(0);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
+  useEffect(() => {
+    let alive = true;
+
+    (async () => {
+      if (!session) {
+        setBuckets([]);
+        return;
+      }
+      const { data, error: bErr } = await supabase
+        .from("email_buckets")
+        .select("id,slug,name,priority")
+        .order("priority", { ascending: true })
+        .limit(100);
+      if (!alive) return;
+      if (bErr) setError(bErr.message);
+      else setBuckets(((data as any[]) || []) as BucketRow[]);
+    })();
+
+    return () => {
+      alive = false;
+    };
+  }, [session, supabase, reloadTick]);
+
   useEffect(() => {
     let alive = true;
 
@@ -51,43 +89,56 @@ export default function InboxPage() {
 
       if (!session) {
         if (!alive) return;
-        setBuckets([]);
         setItems([]);
+        setCounts(null);
+        setNextCursor(null);
         setLoading(false);
         return;
       }
 
-      const [{ data: bData, error: bErr }, { data: iData, error: iErr }] =
-        await Promise.all([
-          supabase
-            .from("email_buckets")
-            .select("id,slug,name,priority")
-            .order("priority", { ascending: true })
-            .limit(100),
-          supabase
-            .from("email_items")
-            .select(
-              "id,from_email,subject,snippet,received_at,is_relevant,status,bucket_id",
-            )
-            .order("received_at", { ascending: false })
-            .limit(200),
-        ]);
-
-      if (!alive) return;
-
-      if (bErr) setError(bErr.message);
-      else setBuckets(((bData as any[]) || []) as BucketRow[]);
-
-      if (iErr) setError(iErr.message);
-      else setItems(((iData as any[]) || []) as EmailItemRow[]);
-
-      setLoading(false);
+      try {
+        const page = await fetchInboxPage(session.access_token, {
+          view,
+          bucketId,
+          cursor: null,
+          includeCounts: true,
+        });
+        if (!alive) return;
+        setItems(page.items);
+        setCounts(page.counts);
+        setNextCursor(page.next_cursor);
+      } catch (e: unknown) {
+        if (!alive) return;
+        setError(e instanceof Error ? e.message : "Failed to load inbox.");
+      } finally {
+        if (alive) setLoading(false);
+      }
     })();
 
     return () => {
       alive = false;
     };
-  }, [session, supabase, reloadTick]);
+  }, [session, view, bucketId, reloadTick]);
+
+  async function loadMore() {
+    if (!session || !nextCursor) return;
+    setLoadingMore(true);
+    setError(null);
+    try {
+      const page = await fetchInboxPage(session.access_token, {
+        view,
+        bucketId,
+        cursor: nextCursor,
+        includeCounts: false,
+      });
+      setItems((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (e: unknown) {
+      setError(e instanceof Error ? e.message : "Failed to load more.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
 
   const bucketById = useMemo(() => {
     const m = new Map<string, BucketRow>();
@@ -95,23 +146,11 @@ export default function InboxPage() {
     return m;
   }, [buckets]);
 
-  const filtered = useMemo(() => {
-    let list = items;
-
-    if (view === "needs_review") {
-      list = list.filter(
-        (i) => i.status === "needs_review" || i.status === "failed",
-      );
-    } else if (view === "sent") {
-      list = list.filter((i) => i.status === "sent");
-    }
-
-    if (bucketId !== "all") {
-      list = list.filter((i) => i.bucket_id === bucketId);
-    }
-
-    return list;
-  }, [items, view, bucketId]);
+  const viewTotal = counts
+    ? bucketId === "all"
+      ? counts.views[view]
+      : (counts.by_bucket[bucketId] ?? 0)
+    : null;
 
   return (
     <div className="space-y-8">
@@ -152,6 +191,7 @@ export default function InboxPage() {
               {buckets.map((b) => (
                 <option key={b.id} value={b.id}>
                   {b.name}
+                  {counts ? ` (${counts.by_bucket[b.id] ?? 0})` : ""}
                 </option>
               ))}
             </select>
@@ -165,18 +205,21 @@ export default function InboxPage() {
                 onClick={() => setView("needs_review")}
               >
                 Needs review
+                {counts ? ` ${counts.views.needs_review}` : ""}
               </TabsTrigger>
               <TabsTrigger
                 active={view === "sent"}
                 onClick={() => setView("sent")}
               >
                 Sent
+                {counts ? ` ${counts.views.sent}` : ""}
               </TabsTrigger>
               <TabsTrigger
                 active={view === "all"}
                 onClick={() => setView("all")}
               >
                 All
+                {counts ? ` ${counts.views.all}` : ""}
               </TabsTrigger>
             </TabsList>
           </div>
@@ -188,7 +231,8 @@ export default function InboxPage() {
           <CardHeader className="flex flex-row items-center justify-between">
             <CardTitle>Messages</CardTitle>
             <div className="text-xs text-black/50">
-              Showing {filtered.length}
+              Showing {items.length}
+              {viewTotal != null ? ` of ${viewTotal}` : ""}
             </div>
           </CardHeader>
           <CardContent className="p-0">
@@ -201,14 +245,14 @@ export default function InboxPage() {
               </div>
             ) : null}
 
-            {!loading && !error && filtered.length === 0 ? (
+            {!loading && !error && items.length === 0 ? (
               <div className="px-5 pb-5 text-sm text-black/60">
                 No items yet.
               </div>
             ) : null}
 
             <ul className="divide-y divide-black/5">
-              {filtered.map((item) => {
+              {items.map((item) => {
                 const bucketName = item.bucket_id
                   ? bucketById.get(item.bucket_id)?.name
                   : null;
@@ -257,6 +301,20 @@ export default function InboxPage() {
                 );
               })}
             </ul>
+
+            {nextCursor ? (
+              <div className="px-5 py-4">
+                <Button
+                  type="button"
+                  variant="secondary"
+                  size="sm"
+                  loading={loadingMore}
+                  onClick={() => loadMore()}
+                >
+                  Load more
+                </Button>
+              </div>
+            ) : null}
           </CardContent>
         </Card>
       ) : null}
@@ -264,6 +322,33 @@ export default function InboxPage() {
   );
 }
 
+async function fetchInboxPage(
+  token: string,
+  opts: {
+    view: ViewKey;
+    bucketId: string;
+    cursor: string | null;
+    includeCounts: boolean;
+  },
+): Promise<InboxPage> {
+  const apiBase = process.env.NEXT_PUBLIC_API_BASE_URL;
+  if (!apiBase) throw new Error("Missing NEXT_PUBLIC_API_BASE_URL");
+
+  const params = new URLSearchParams({
+    view: opts.view,
+    limit: "50",
+    include_counts: String(opts.includeCounts),
+  });
+  if (opts.bucketId !== "all") params.set("bucket_id", opts.bucketId);
+  if (opts.cursor) params.set("cursor", opts.cursor);
+
+  const res = await fetch(`${apiBase.replace(/\/$/, "")}/inbox?${params}`, {
+    headers: { authorization: `Bearer ${token}` },
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return (await res.json()) as InboxPage;
+}
+
 function badgeVariantForStatus(status: string) {
   if (status === "sent") return "good" as const;
   if (status === "needs_review") return "warn" as const;
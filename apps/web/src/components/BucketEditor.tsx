@@ -49,9 +49,11 @@ export function BucketEditor() {
   const [enabled, setEnabled] = useState(true);
   const [ignore, setIgnore] = useState(false);
   const [push, setPush] = useState(true);
+  const [digest, setDigest] = useState(false);
   const [summarize, setSummarize] = useState(true);
   const [draft, setDraft] = useState(true);
   const [classify, setClassify] = useState(true);
+  const [escalate, setEscalate] = useState(false);
 
   const [keywords, setKeywords] = useState("");
   const [senderDomains, setSenderDomains] = useState("");
@@ -123,9 +125,11 @@ export function BucketEditor() {
 
     setIgnore(Boolean(a.ignore));
     setPush(Boolean(a.push ?? true));
+    setDigest(Boolean(a.push_digest ?? false));
     setSummarize(Boolean(a.llm_summarize ?? true));
     setDraft(Boolean(a.llm_draft ?? true));
     setClassify(Boolean(a.llm_classify ?? true));
+    setEscalate(Boolean(a.llm_escalate ?? false));
 
     setKeywords(listToCsv(m.keywords));
     setSenderDomains(listToCsv(m.sender_domains));
@@ -195,6 +199,12 @@ export function BucketEditor() {
               onChange={setPush}
               disabled={ignore}
             />
+            <Toggle
+              label="Digest"
+              checked={digest}
+              onChange={setDigest}
+              disabled={ignore || !push}
+            />
             <Toggle
               label="Summary"
               checked={summarize}
@@ -213,9 +223,16 @@ export function BucketEditor() {
               onChange={setClassify}
               disabled={ignore}
             />
+            <Toggle
+              label="Strong model"
+              checked={escalate}
+              onChange={setEscalate}
+              disabled={ignore}
+            />
           </div>
           <div className="text-xs text-black/50">
             Recommended defaults are prefilled. Ignore is best for newsletters.
+            Strong model summarizes and drafts with the escalation model.
           </div>
         </div>
 
@@ -328,12 +345,16 @@ export function BucketEditor() {
                 exclude_sender_emails: csvToList(excludeSenderEmails),
               };
 
+              // Keep action keys this form doesn't edit (set by the API or other tools).
               const actions: any = {
+                ...((selected.actions || {}) as any),
                 ignore,
                 push,
+                push_digest: digest,
                 llm_summarize: summarize,
                 llm_draft: draft,
                 llm_classify: classify,
+                llm_escalate: escalate,
               };
 
               if (pushMinConf.trim())
@@ -5,32 +5,61 @@ import { useMemo, useState } from "react";
 import { getSupabaseBrowserClient } from "@/lib/supabaseBrowser";
 import { Button } from "@/components/ui/Button";
 
-type PollNowAccount = {
-  gmail_account_id: string;
-  user_id: string;
-  new: number;
+type PollRunCounts = {
+  fetched: number;
+  inserted: number;
+  known: number;
   processed: number;
   relevant: number;
+  push_queued: number;
   pushed: number;
   failed: number;
-  skipped?: boolean;
-  skip_reason?: string;
-  errors?: string[];
+};
+
+type PollRunAccount = {
+  gmail_account_id: string;
+  status: "running" | "done" | "failed" | "expired";
+  started_at: string | null;
+  finished_at: string | null;
+  counts: PollRunCounts;
+};
+
+type PollRun = {
+  run_id: string;
+  status: "running" | "done" | "failed";
+  totals: PollRunCounts;
+  accounts: PollRunAccount[];
 };
 
 type PollNowResponse = {
   ok: boolean;
-  total_new: number;
-  per_account: PollNowAccount[];
+  run_id: string | null;
+  status: "running" | "throttled" | "done";
+  accounts?: number;
+  skipped?: number;
+  coalesced: boolean;
 };
 
+const PROGRESS_INTERVAL_MS = 1500;
+// Give up watching (the poll itself keeps running server-side).
+const PROGRESS_TIMEOUT_MS = 10 * 60 * 1000;
+
+function sleep(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+function describe(totals: PollRunCounts) {
+  if (totals.inserted === 0 && totals.processed === 0) return "No new mail.";
+  return `Found ${totals.inserted} new, processed ${totals.processed}, relevant ${totals.relevant}.`;
+}
+
 export function PollNowButton({
   onComplete,
   size = "sm",
   variant = "secondary",
   label = "Check now",
 }: {
-  onComplete?: (res: PollNowResponse | null) => void;
+  onComplete?: (res: PollRun | null) => void;
   size?: "sm" | "md" | "lg";
   variant?: "primary" | "secondary" | "ghost" | "danger";
   label?: string;
@@ -56,45 +85,63 @@ export function PollNowButton({
             const sessionRes = await supabase.auth.getSession();
             const token = sessionRes.data.session?.access_token;
             if (!token) throw new Error("Sign in first.");
+            const headers = { authorization: `Bearer ${token}` };
 
-            const resp = await fetch("/api/poll/now", {
-              method: "POST",
-              headers: {
-                authorization: `Bearer ${token}`,
-              },
-            });
+            // The API enqueues the poll and answers right away; a click while one is running joins it.
+            let started: PollNowResponse | null = null;
+            for (let attempt = 0; attempt < 3; attempt++) {
+              const resp = await fetch("/api/poll/now", {
+                method: "POST",
+                headers,
+              });
+              if (!resp.ok) {
+                const txt = await resp.text();
+                throw new Error(txt || "Poll failed.");
+              }
+              started = (await resp.json()) as PollNowResponse;
+              // Coalesced into a run that is still starting: ask again for its id.
+              if (started.run_id || started.status !== "running") break;
+              await sleep(500);
+            }
 
-            if (!resp.ok) {
-              const txt = await resp.text();
-              throw new Error(txt || "Poll failed.");
+            if (!started?.run_id) {
+              setNote(
+                started?.status === "throttled"
+                  ? "Just checked a moment ago."
+                  : "No new mail.",
+              );
+              onComplete?.(null);
+              return;
             }
 
-            const json = (await resp.json()) as PollNowResponse;
-            const accounts = Array.isArray(json.per_account)
-              ? json.per_account
-              : [];
-
-            const skipped = accounts.filter((a) => Boolean(a.skipped)).length;
-            const processed = accounts.reduce(
-              (sum, a) => sum + (Number(a.processed) || 0),
-              0,
-            );
-            const relevant = accounts.reduce(
-              (sum, a) => sum + (Number(a.relevant) || 0),
-              0,
-            );
-
-            if (skipped > 0 && json.total_new === 0 && processed === 0) {
-              setNote("Just checked a moment ago.");
-            } else if (json.total_new === 0 && processed === 0) {
-              setNote("No new mail.");
-            } else {
+            setNote(started.coalesced ? "Already checking…" : "Checking…");
+            const deadline = Date.now() + PROGRESS_TIMEOUT_MS;
+            let run: PollRun | null = null;
+            while (Date.now() < deadline) {
+              await sleep(PROGRESS_INTERVAL_MS);
+              const resp = await fetch(`/api/poll/runs/${started.run_id}`, {
+                headers,
+                cache: "no-store",
+              });
+              if (!resp.ok) {
+                const txt = await resp.text();
+                throw new Error(txt || "Poll failed.");
+              }
+              run = (await resp.json()) as PollRun;
+              if (run.status !== "running") break;
               setNote(
-                `Found ${json.total_new} new, processed ${processed}, relevant ${relevant}.`,
+                `Checking… fetched ${run.totals.fetched}, new ${run.totals.inserted}, processed ${run.totals.processed}.`,
               );
             }
 
-            onComplete?.(json);
+            if (!run || run.status === "running") {
+              setNote("Still checking in the background.");
+            } else if (run.status === "failed") {
+              throw new Error("Poll failed.");
+            } else {
+              setNote(describe(run.totals));
+            }
+            onComplete?.(run);
           } catch (e: unknown) {
             setError(e instanceof Error ? e.message : "Poll failed.");
             onComplete?.(null);
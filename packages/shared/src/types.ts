@@ -22,9 +22,10 @@ export type ReviseResult = {
 };
 
 export type PushPayload = {
-  email_item_id: string;
+  email_item_id: string | null; // null for digest notifications
   title: string;
   body: string;
   url: string; // absolute or relative
+  count?: number; // digest: number of emails folded into this notification
 };
 
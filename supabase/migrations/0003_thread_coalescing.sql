@@ -0,0 +1,13 @@
+-- Thread-aware processing
+
+-- Status now also includes `superseded`: an older message in a thread whose newer reply
+-- was processed in the same cycle (the older message was fed in as context instead).
+comment on column public.email_items.status is
+  'ingested|processed|needs_review|sent|failed|superseded';
+
+-- Processor pulls ingested items per account (oldest first) and groups them by thread.
+create index if not exists email_items_account_status_received_at_idx
+on public.email_items (gmail_account_id, status, received_at);
+
+create index if not exists email_items_account_thread_idx
+on public.email_items (gmail_account_id, thread_id);
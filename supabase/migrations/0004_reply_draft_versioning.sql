@@ -0,0 +1,47 @@
+-- Atomic draft versioning
+
+-- Assigns the next version for an email item and inserts in one statement. A per-item
+-- transaction-scoped advisory lock serializes concurrent revisions, so they no longer race
+-- on unique (email_item_id, version).
+create or replace function public.insert_reply_draft(
+  p_email_item_id uuid,
+  p_draft_text text,
+  p_instruction text default null
+)
+returns public.reply_drafts
+language plpgsql
+as $$
+declare
+  r public.reply_drafts;
+begin
+  perform pg_advisory_xact_lock(hashtext('reply_drafts:' || p_email_item_id::text));
+
+  insert into public.reply_drafts (email_item_id, version, draft_text, instruction)
+  select p_email_item_id, coalesce(max(d.version), 0) + 1, p_draft_text, p_instruction
+  from public.reply_drafts d
+  where d.email_item_id = p_email_item_id
+  returning * into r;
+
+  return r;
+end;
+$$;
+
+-- Bulk variant for pipeline-created drafts.
+-- p_drafts: [{"email_item_id": uuid, "draft_text": text, "instruction": text|null}, ...]
+create or replace function public.insert_reply_drafts(p_drafts jsonb)
+returns setof public.reply_drafts
+language plpgsql
+as $$
+declare
+  d jsonb;
+begin
+  for d in select * from jsonb_array_elements(coalesce(p_drafts, '[]'::jsonb))
+  loop
+    return next public.insert_reply_draft(
+      (d->>'email_item_id')::uuid,
+      d->>'draft_text',
+      d->>'instruction'
+    );
+  end loop;
+end;
+$$;
@@ -0,0 +1,14 @@
+-- Inbox counts for the paginated inbox API
+
+-- One aggregate per (bucket, status) for a user; served from email_items_user_status_idx /
+-- email_items_user_bucket_received_at_idx. Security invoker: RLS still applies to user callers.
+create or replace function public.inbox_counts(p_user_id uuid)
+returns table (bucket_id uuid, status text, n bigint)
+language sql
+stable
+as $$
+  select ei.bucket_id, ei.status, count(*)::bigint as n
+  from public.email_items ei
+  where ei.user_id = p_user_id
+  group by ei.bucket_id, ei.status;
+$$;
@@ -0,0 +1,44 @@
+-- Content-addressed email bodies
+
+-- Bodies move out of the hot email_items row. Keyed by sha256(body_text) (hex), so identical
+-- bodies (bulk mail) are stored once.
+create table if not exists public.email_bodies (
+  hash text primary key,
+  body_text text not null,
+  size_bytes integer,
+  created_at timestamptz not null default now()
+);
+
+alter table public.email_items
+  add column if not exists body_hash text;
+
+create index if not exists email_items_body_hash_idx
+on public.email_items (body_hash);
+
+-- Move existing inline bodies into the store.
+insert into public.email_bodies (hash, body_text, size_bytes)
+select distinct on (h.hash) h.hash, h.body_text, octet_length(h.body_text)
+from (
+  select encode(digest(ei.body_text, 'sha256'), 'hex') as hash, ei.body_text
+  from public.email_items ei
+  where ei.body_text is not null and ei.body_hash is null
+) h
+on conflict (hash) do nothing;
+
+update public.email_items
+set body_hash = encode(digest(body_text, 'sha256'), 'hex'),
+    body_text = null
+where body_text is not null and body_hash is null;
+
+-- RLS: a body is readable by any user owning an email item that references it.
+alter table public.email_bodies enable row level security;
+
+drop policy if exists email_bodies_select_own on public.email_bodies;
+create policy email_bodies_select_own on public.email_bodies
+for select using (
+  exists (
+    select 1 from public.email_items ei
+    where ei.body_hash = email_bodies.hash
+      and ei.user_id = auth.uid()
+  )
+);
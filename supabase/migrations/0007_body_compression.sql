@@ -0,0 +1,6 @@
+-- Compressed email bodies
+
+-- null = body_text is plain text; otherwise body_text holds base64 of the compressed body and
+-- codec names the codec + dictionary (e.g. `zlib:1a2b3c4d`).
+alter table public.email_bodies
+  add column if not exists codec text;
@@ -0,0 +1,36 @@
+-- Bulk result writes for the processor
+
+-- p_patches: [{"id": uuid, "patch": {<column>: <value>, ...}}, ...]
+-- Only keys present in a patch are written (a present key with JSON null sets NULL), so
+-- heterogeneous per-item patches can be applied in one round trip. Returns rows updated.
+create or replace function public.apply_email_item_patches(p_patches jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  with p as (
+    select (e->>'id')::uuid as id, coalesce(e->'patch', '{}'::jsonb) as patch
+    from jsonb_array_elements(coalesce(p_patches, '[]'::jsonb)) e
+  )
+  update public.email_items ei
+  set
+    bucket_id = case when p.patch ? 'bucket_id' then (p.patch->>'bucket_id')::uuid else ei.bucket_id end,
+    is_relevant = case when p.patch ? 'is_relevant' then (p.patch->>'is_relevant')::boolean else ei.is_relevant end,
+    confidence = case when p.patch ? 'confidence' then (p.patch->>'confidence')::real else ei.confidence end,
+    category = case when p.patch ? 'category' then p.patch->>'category' else ei.category end,
+    reason = case when p.patch ? 'reason' then p.patch->>'reason' else ei.reason end,
+    summary_json = case
+      when p.patch ? 'summary_json' then nullif(p.patch->'summary_json', 'null'::jsonb)
+      else ei.summary_json
+    end,
+    status = case when p.patch ? 'status' then p.patch->>'status' else ei.status end,
+    error_message = case when p.patch ? 'error_message' then p.patch->>'error_message' else ei.error_message end
+  from p
+  where ei.id = p.id;
+
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
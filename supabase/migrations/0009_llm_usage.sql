@@ -0,0 +1,84 @@
+-- LLM token and cost accounting
+
+-- Daily rollup per (user, bucket, stage, provider, model). bucket_id is null for calls not tied
+-- to a bucket; no FK so deleting a bucket keeps its spend history.
+create table if not exists public.llm_usage_daily (
+  user_id uuid not null references auth.users(id) on delete cascade,
+  day date not null,
+  bucket_id uuid,
+  stage text not null,
+  provider text not null,
+  model text not null,
+  calls integer not null default 0,
+  prompt_tokens bigint not null default 0,
+  completion_tokens bigint not null default 0,
+  cached_tokens bigint not null default 0,
+  cost_usd numeric(14, 6) not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+create unique index if not exists llm_usage_daily_key_idx
+on public.llm_usage_daily (
+  user_id,
+  day,
+  (coalesce(bucket_id, '00000000-0000-0000-0000-000000000000'::uuid)),
+  stage,
+  provider,
+  model
+);
+
+-- Optional per-user daily budget (USD). Null = use the server default (LLM_DAILY_BUDGET_USD).
+alter table public.context_packs
+  add column if not exists llm_daily_budget_usd numeric(10, 4);
+
+-- p_rows: [{"user_id", "day", "bucket_id", "stage", "provider", "model", "calls",
+--           "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"}, ...]
+-- Adds the deltas onto the rollup (concurrent runs for the same key are safe). Returns rows written.
+create or replace function public.record_llm_usage(p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  insert into public.llm_usage_daily as u (
+    user_id, day, bucket_id, stage, provider, model,
+    calls, prompt_tokens, completion_tokens, cached_tokens, cost_usd
+  )
+  select
+    r.user_id, r.day, r.bucket_id, r.stage, r.provider, r.model,
+    coalesce(r.calls, 0), coalesce(r.prompt_tokens, 0), coalesce(r.completion_tokens, 0),
+    coalesce(r.cached_tokens, 0), coalesce(r.cost_usd, 0)
+  from jsonb_to_recordset(coalesce(p_rows, '[]'::jsonb)) as r(
+    user_id uuid,
+    day date,
+    bucket_id uuid,
+    stage text,
+    provider text,
+    model text,
+    calls integer,
+    prompt_tokens bigint,
+    completion_tokens bigint,
+    cached_tokens bigint,
+    cost_usd numeric
+  )
+  on conflict (user_id, day, (coalesce(bucket_id, '00000000-0000-0000-0000-000000000000'::uuid)), stage, provider, model)
+  do update set
+    calls = u.calls + excluded.calls,
+    prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = u.completion_tokens + excluded.completion_tokens,
+    cached_tokens = u.cached_tokens + excluded.cached_tokens,
+    cost_usd = u.cost_usd + excluded.cost_usd,
+    updated_at = now();
+
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+-- RLS: users can read their own usage.
+alter table public.llm_usage_daily enable row level security;
+
+drop policy if exists llm_usage_daily_select_own on public.llm_usage_daily;
+create policy llm_usage_daily_select_own on public.llm_usage_daily
+for select using (user_id = auth.uid());
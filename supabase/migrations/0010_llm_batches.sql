@@ -0,0 +1,29 @@
+-- Provider batch jobs for non-urgent buckets
+
+-- Items submitted in a batch wait in `batch_pending` until a later poll applies the results.
+comment on column public.email_items.status is
+  'ingested|batch_pending|processed|needs_review|sent|failed|superseded';
+
+create table if not exists public.llm_batches (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid not null references auth.users(id) on delete cascade,
+  gmail_account_id uuid not null references public.gmail_accounts(id) on delete cascade,
+  provider text not null,
+  provider_batch_id text not null,
+  status text not null default 'submitted', -- submitted|applied|failed|expired|cancelled
+  request_count integer not null default 0,
+  -- [{"email_item_id": uuid, "earlier_ids": [uuid, ...]}] (earlier thread messages used as context)
+  items jsonb not null default '[]'::jsonb,
+  created_at timestamptz not null default now(),
+  completed_at timestamptz
+);
+
+create index if not exists llm_batches_account_status_idx
+on public.llm_batches (gmail_account_id, status, created_at);
+
+-- RLS: users can see their own batches.
+alter table public.llm_batches enable row level security;
+
+drop policy if exists llm_batches_select_own on public.llm_batches;
+create policy llm_batches_select_own on public.llm_batches
+for select using (user_id = auth.uid());
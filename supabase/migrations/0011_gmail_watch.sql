@@ -0,0 +1,17 @@
+-- Gmail push notifications (users.watch -> Pub/Sub -> webhook)
+
+-- watch_history_id: newest Gmail historyId already synced (from the watch response or a handled
+-- notification); notifications at or below it are duplicates. watch_expires_at: when the current
+-- watch lapses (Gmail caps it at 7 days); the cron renews it ahead of time.
+alter table public.gmail_accounts
+  add column if not exists watch_history_id bigint,
+  add column if not exists watch_expires_at timestamptz,
+  add column if not exists watch_error text;
+
+-- Renewal scan: active accounts whose watch is missing or about to lapse.
+create index if not exists gmail_accounts_watch_expires_idx
+on public.gmail_accounts (status, watch_expires_at);
+
+-- Notifications identify the mailbox by address only.
+create index if not exists gmail_accounts_google_email_idx
+on public.gmail_accounts (google_email);
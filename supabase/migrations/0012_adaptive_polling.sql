@@ -0,0 +1,20 @@
+-- Adaptive per-account polling
+
+-- The cron polls only accounts whose next_poll_at has passed. After each poll the API updates
+-- arrival_rate_per_h (a time-decayed average of new mail per hour) and derives the next interval
+-- from it: busy inboxes are polled every few minutes, dormant ones every few hours.
+alter table public.gmail_accounts
+  add column if not exists next_poll_at timestamptz,
+  add column if not exists poll_interval_s integer,
+  add column if not exists arrival_rate_per_h real;
+
+update public.gmail_accounts set next_poll_at = now() where next_poll_at is null;
+
+alter table public.gmail_accounts
+  alter column next_poll_at set default now(),
+  alter column next_poll_at set not null;
+
+-- Due-account scan per cron tick.
+create index if not exists gmail_accounts_active_next_poll_idx
+on public.gmail_accounts (next_poll_at)
+where status = 'active';
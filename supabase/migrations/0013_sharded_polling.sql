@@ -0,0 +1,48 @@
+-- Sharded, lease-based cron polling across API replicas
+
+-- shard_key: stable hash bucket of the account id in [0, 1024). Shard i of n owns the contiguous
+-- range [i * 1024 / n, (i + 1) * 1024 / n), so changing n only moves whole ranges between shards.
+alter table public.gmail_accounts
+  add column if not exists shard_key smallint generated always as ((hashtext(id::text) & 1023)::smallint) stored,
+  add column if not exists poll_lease_until timestamptz,
+  add column if not exists poll_lease_owner text;
+
+create index if not exists gmail_accounts_shard_next_poll_idx
+on public.gmail_accounts (shard_key, next_poll_at)
+where status = 'active';
+
+-- Claim up to p_limit due accounts in [p_shard_lo, p_shard_hi) for p_lease_s seconds.
+-- Row locks taken with SKIP LOCKED make concurrent claims disjoint, and the lease keeps the account
+-- away from other replicas while it is polled (the poll clears it). A replica that dies mid-poll
+-- only holds its accounts until the lease runs out.
+create or replace function public.claim_gmail_accounts(
+  p_shard_lo integer,
+  p_shard_hi integer,
+  p_limit integer,
+  p_lease_s integer,
+  p_owner text
+)
+returns setof public.gmail_accounts
+language sql
+as $$
+  update public.gmail_accounts a
+  set poll_lease_until = now() + make_interval(secs => p_lease_s),
+      poll_lease_owner = p_owner
+  where a.id in (
+    select g.id
+    from public.gmail_accounts g
+    where g.status = 'active'
+      and g.next_poll_at <= now()
+      and g.shard_key >= p_shard_lo
+      and g.shard_key < p_shard_hi
+      and (g.poll_lease_until is null or g.poll_lease_until < now())
+    order by g.next_poll_at
+    limit p_limit
+    for update skip locked
+  )
+  returning a.*;
+$$;
+
+-- Returns encrypted refresh tokens: service role only.
+revoke execute on function public.claim_gmail_accounts(integer, integer, integer, integer, text)
+from public, anon, authenticated;
@@ -0,0 +1,27 @@
+-- Resumable history backfill for newly connected accounts
+
+-- backfill_status: null (never requested) | pending | running | promoting | done | failed.
+-- failed: a batch of backfilled mail could not be processed at all (see backfill_error).
+-- backfill_query is fixed when the backfill starts (`after:` / `before:` epochs), because a Gmail
+-- page token is only valid for the query it came from; backfill_page_token is the checkpoint.
+-- backfill_next_at doubles as the lease: a worker claims an account by moving it forward.
+alter table public.gmail_accounts
+  add column if not exists backfill_status text,
+  add column if not exists backfill_query text,
+  add column if not exists backfill_page_token text,
+  add column if not exists backfill_listed integer not null default 0,
+  add column if not exists backfill_next_at timestamptz,
+  add column if not exists backfill_error text;
+
+create index if not exists gmail_accounts_backfill_idx
+on public.gmail_accounts (backfill_next_at)
+where backfill_status in ('pending', 'running', 'promoting');
+
+-- Backfilled mail lands metadata-only with status 'backfilled' and is promoted to 'ingested' (body
+-- fetched) only while the account has no fresh mail waiting, so it never delays live processing.
+comment on column public.email_items.status is
+  'ingested|backfilled|batch_pending|processed|needs_review|sent|failed|superseded';
+
+create index if not exists email_items_account_backfilled_idx
+on public.email_items (gmail_account_id, received_at desc)
+where status = 'backfilled';
@@ -0,0 +1,18 @@
+-- Background manual polls with a progress channel
+
+-- POST /poll/now enqueues one processing_runs row per account, all sharing a run_id, and returns
+-- that id immediately; the rows are updated with counts as the poll advances and GET
+-- /poll/runs/{run_id} aggregates them. Rows from cron/push polls keep run_id null.
+alter table public.processing_runs
+  add column if not exists run_id uuid,
+  add column if not exists trigger text,
+  add column if not exists status text not null default 'done'; -- running|done|failed
+
+create index if not exists processing_runs_run_idx
+on public.processing_runs (run_id)
+where run_id is not null;
+
+-- In-flight manual poll per user (duplicate clicks join it instead of starting another).
+create index if not exists processing_runs_user_running_idx
+on public.processing_runs (user_id, started_at desc)
+where status = 'running';
@@ -0,0 +1,9 @@
+-- RFC 5322 threading headers captured at ingest
+
+-- /gmail/send-reply builds In-Reply-To / References from these instead of fetching the original
+-- message again. Rows ingested before this migration have them null; the send path then reads
+-- just the headers from Gmail (format=metadata).
+alter table public.email_items
+  add column if not exists header_message_id text,
+  add column if not exists header_in_reply_to text,
+  add column if not exists header_references text;
@@ -0,0 +1,26 @@
+-- Lease a single account for an out-of-schedule poll (/poll/now, Gmail push syncs)
+
+-- Same lease as claim_gmail_accounts, for one account regardless of next_poll_at. Returns false
+-- while another poll (cron or otherwise) holds it, so the caller skips the account. Polls release
+-- their lease with `poll_lease_owner = <owner>` in the filter, never another poll's.
+create or replace function public.lease_gmail_account(
+  p_id uuid,
+  p_lease_s integer,
+  p_owner text
+)
+returns boolean
+language sql
+as $$
+  with leased as (
+    update public.gmail_accounts
+    set poll_lease_until = now() + make_interval(secs => p_lease_s),
+        poll_lease_owner = p_owner
+    where id = p_id
+      and (poll_lease_until is null or poll_lease_until < now())
+    returning id
+  )
+  select exists (select 1 from leased);
+$$;
+
+revoke execute on function public.lease_gmail_account(uuid, integer, text)
+from public, anon, authenticated;
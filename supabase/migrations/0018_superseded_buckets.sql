@@ -0,0 +1,19 @@
+-- Superseded thread messages keep their thread's bucket
+
+-- Processing now files a superseded message under the bucket of the message that replaced it, so
+-- bucket views and inbox_counts cover whole threads. Give existing superseded rows the bucket of
+-- the latest non-superseded message in their thread.
+update public.email_items s
+set bucket_id = latest.bucket_id
+from (
+  select distinct on (gmail_account_id, thread_id) gmail_account_id, thread_id, bucket_id
+  from public.email_items
+  where status <> 'superseded'
+    and bucket_id is not null
+    and thread_id is not null
+  order by gmail_account_id, thread_id, received_at desc nulls last
+) latest
+where s.status = 'superseded'
+  and s.bucket_id is null
+  and s.gmail_account_id = latest.gmail_account_id
+  and s.thread_id = latest.thread_id;
@@ -0,0 +1,12 @@
+-- email_items.received_at is always set
+
+-- The inbox pages by keyset on (received_at desc, id desc), which cannot place rows without a
+-- received_at. Ingestion always sets it (falling back to the poll time), but older rows may not:
+-- give them their ingest time, and make the column required so none appear again.
+update public.email_items
+set received_at = created_at
+where received_at is null;
+
+alter table public.email_items
+  alter column received_at set default now(),
+  alter column received_at set not null;
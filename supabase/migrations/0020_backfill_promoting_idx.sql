@@ -0,0 +1,9 @@
+-- Claimable backfills include 'promoting'
+
+-- The cron claims backfills in pending | running | promoting; 0014 indexed only the first two, so
+-- accounts fetching bodies were found by a scan. Fresh installs get the corrected index from 0014.
+drop index if exists public.gmail_accounts_backfill_idx;
+
+create index if not exists gmail_accounts_backfill_idx
+on public.gmail_accounts (backfill_next_at)
+where backfill_status in ('pending', 'running', 'promoting');